@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: chọn `threshold` điểm giữ được hình dạng
+    đường (đỉnh / đáy) để vẽ chuỗi dài.
+    -> mảng index các điểm được giữ (luôn gồm điểm đầu và cuối).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    idx = np.empty(threshold, dtype=np.int64)
+    idx[0] = 0
+    a = 0
+
+    for i in range(threshold - 2):
+        # trung bình của bucket kế tiếp
+        avg_start = int(np.floor((i + 1) * every)) + 1
+        avg_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        # điểm trong bucket hiện tại tạo tam giác lớn nhất với a và điểm trung bình
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        idx[i + 1] = a
+
+    idx[-1] = n - 1
+    return idx
@@ -1,12 +1,33 @@
 import os
-import pandas as pd
 from backend.analysis.stats import compute_stats
+from backend.storage.log_writer import find_log, load_log, load_summary, save_summary, is_live
+from backend.storage.catalog import safe_call
 
-def generate_report(session_id):
-    log_path = f"output/logs/{session_id}.csv"
+def generate_report(session_id, timeline=True):
+    """
+    Summary luôn lấy từ thống kê đang chạy / sidecar / catalog (O(1)); log chỉ
+    được đọc để lấy chuỗi timeline / emotions, hoặc khi chưa có sidecar.
+    timeline=False: chỉ trả summary.
+    """
+    summary = load_summary(session_id)
+    if not timeline and summary is not None:
+        return {"session_id": session_id, "summary": summary}
+
+    log_path, log_format = find_log(session_id)
 
     # File không tồn tại
-    if not os.path.exists(log_path):
+    if log_path is None:
+        # log thô đã nén vào archive (catalog compact): summary vẫn còn ở sidecar / catalog
+        if summary is not None:
+            item = safe_call("get", session_id) or {}
+            return {
+                "session_id": session_id,
+                "archived": True,
+                "archive_path": item.get("archive_path"),
+                "summary": summary,
+                "timeline": [],
+                "emotions": []
+            }
         return {
             "session_id": session_id,
             "error": "log_not_found",
@@ -16,7 +37,7 @@ def generate_report(session_id):
         }
 
     # File tồn tại nhưng size = 0 → không có data (webcam không detect được mặt)
-    if os.path.getsize(log_path) == 0:
+    if log_format == "csv" and os.path.getsize(log_path) == 0:
         return {
             "session_id": session_id,
             "warning": "empty_log",
@@ -30,9 +51,9 @@ def generate_report(session_id):
             "emotions": []
         }
 
-    # Đọc file CSV – file có thể hợp lệ hoặc chỉ có 1 dòng header
+    # Đọc log – file có thể hợp lệ hoặc chỉ có 1 dòng header
     try:
-        df = pd.read_csv(log_path)
+        df = load_log(session_id)
     except Exception:
         # Lỗi pandas khi file hỏng hoặc chỉ có header
         return {
@@ -63,12 +84,17 @@ def generate_report(session_id):
             "emotions": []
         }
 
-    # Compute stats bình thường
-    stats = compute_stats(log_path)
+    # log cũ / session bị ngắt giữa chừng: chưa có sidecar -> tính 1 lần rồi lưu lại
+    if summary is None:
+        summary = compute_stats(df)
+        if not is_live(session_id):
+            save_summary(session_id, summary)
 
-    return {
+    report = {
         "session_id": session_id,
-        "summary": stats,
-        "timeline": df["eng_smooth"].tolist(),
-        "emotions": df["emotion"].tolist(),
+        "summary": summary,
     }
+    if timeline:
+        report["timeline"] = df["eng_smooth"].tolist()
+        report["emotions"] = df["emotion"].tolist()
+    return report
@@ -0,0 +1,258 @@
+"""
+Tính lại engagement từ vector xác suất đã lưu (face store), không cần chạy lại
+CNN: đổi EMOTION_WEIGHTS / bộ lọc làm mượt rồi áp cho cả session (hoặc nhiều
+session) bằng NumPy trong 1 lần.
+
+    engagement frame = mean_mặt(probs · w) = (mean_mặt probs) · w
+
+nên chỉ cần vector xác suất trung bình của mỗi frame, 1 phép nhân ma trận là
+ra engagement của mọi frame.
+
+    python -m backend.analysis.rescoring s1 s2 --weights happy=1,neutral=0.5 --filter median --window 15
+"""
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from backend.core.config import EMOTION_WEIGHTS, SMOOTHING_ALPHA
+from backend.models.emotion_labels import EMOTION_LABELS
+from backend.storage.column_log import load_columns
+from backend.storage.face_store import face_store_path
+from backend.analysis.running_stats import RunningStats
+from backend.analysis.downsampling import lttb
+
+FILTERS = ("ema", "median", "mean", "none")
+
+
+# ==========================
+#   TRỌNG SỐ
+# ==========================
+def parse_weights(text):
+    """
+    "happy=1,neutral:0.5" hoặc JSON '{"happy": 1}' -> dict.
+    Emotion không có trong chuỗi giữ trọng số trong config.
+    """
+    if not text:
+        return dict(EMOTION_WEIGHTS)
+
+    text = text.strip()
+    if text.startswith("{"):
+        overrides = json.loads(text)
+    else:
+        overrides = {}
+        for part in text.split(","):
+            if not part.strip():
+                continue
+            key, sep, value = part.replace(":", "=").partition("=")
+            if not sep:
+                raise ValueError(f"trọng số không hợp lệ: {part!r}")
+            overrides[key.strip()] = value
+
+    unknown = set(overrides) - set(EMOTION_LABELS)
+    if unknown:
+        raise ValueError(f"emotion không tồn tại: {sorted(unknown)}")
+    return {**EMOTION_WEIGHTS, **{k: float(v) for k, v in overrides.items()}}
+
+
+def weight_vector(weights=None):
+    """dict trọng số -> vector theo thứ tự EMOTION_LABELS (emotion thiếu = 0)."""
+    weights = EMOTION_WEIGHTS if weights is None else weights
+    return np.array([weights.get(label, 0.0) for label in EMOTION_LABELS], dtype=np.float64)
+
+
+# ==========================
+#   BỘ LỌC (vectorized)
+# ==========================
+def smooth(values, filter="ema", alpha=SMOOTHING_ALPHA, window=15):
+    """
+    values: 1-D array engagement thô theo thời gian.
+
+    "ema"   : giống EngagementSmoother (trạng thái đầu = 0)
+    "median": trung vị trượt `window` frame gần nhất
+    "mean"  : trung bình trượt `window` frame gần nhất
+    "none"  : giữ nguyên
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if filter == "none" or len(values) == 0:
+        return values.copy()
+
+    series = pd.Series(values)
+    if filter == "ema":
+        # ewm(adjust=False) bắt đầu từ x0, smoother bắt đầu từ 0:
+        # chênh lệch ở bước t là (1 - alpha)^(t+1) * x0
+        out = series.ewm(alpha=alpha, adjust=False).mean().to_numpy()
+        return out - (1.0 - alpha) ** np.arange(1, len(values) + 1) * values[0]
+    if filter == "median":
+        return series.rolling(max(1, window), min_periods=1).median().to_numpy()
+    if filter == "mean":
+        return series.rolling(max(1, window), min_periods=1).mean().to_numpy()
+    raise ValueError(f"filter không hợp lệ: {filter} (chọn {FILTERS})")
+
+
+# ==========================
+#   DỮ LIỆU
+# ==========================
+def load_frame_probs(session_id):
+    """
+    Vector xác suất trung bình mỗi frame từ face store của session.
+    -> (timestamps[n], probs[n, E], faces[n], dominant[n]); FileNotFoundError nếu không có.
+    dominant: index (theo EMOTION_LABELS) emotion của frame, giống cột emotion
+    của log (xem frame_dominant).
+
+    Các mặt của 1 frame được ghi liền nhau với cùng timestamp, nên gom theo
+    điểm đổi timestamp (np.add.reduceat), không cần sort.
+    """
+    columns, _ = load_columns(face_store_path(session_id), mmap=True)
+    ts = np.asarray(columns["timestamp"])
+    if len(ts) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return ts, np.empty((0, len(EMOTION_LABELS))), empty, empty
+
+    probs = np.asarray(columns["probs"], dtype=np.float64)
+    starts = np.flatnonzero(np.r_[True, ts[1:] != ts[:-1]])
+    faces = np.diff(np.r_[starts, len(ts)])
+    mean_probs = np.add.reduceat(probs, starts, axis=0) / faces[:, None]
+    return ts[starts], mean_probs, faces, frame_dominant(probs.argmax(axis=1), starts)
+
+
+def frame_dominant(face_labels, starts):
+    """
+    Emotion mỗi frame từ nhãn từng mặt, cùng quy tắc với summarize_faces:
+    nhãn xuất hiện nhiều nhất, hoà thì lấy nhãn gặp trước trong frame.
+    face_labels[m]: index nhãn từng mặt; starts[n]: vị trí mặt đầu tiên mỗi frame.
+    """
+    n_faces, n_labels = len(face_labels), len(EMOTION_LABELS)
+    onehot = np.zeros((n_faces, n_labels), dtype=np.int64)
+    onehot[np.arange(n_faces), face_labels] = 1
+    counts = np.add.reduceat(onehot, starts, axis=0)
+
+    # vị trí gặp đầu tiên của mỗi nhãn trong frame (n_faces nếu không có)
+    pos = np.arange(n_faces)[:, None]
+    first = np.minimum.reduceat(np.where(onehot == 1, pos, n_faces), starts, axis=0)
+    return np.argmax(counts * (n_faces + 1) - first, axis=1)
+
+
+# ==========================
+#   RE-SCORE
+# ==========================
+def rescore_arrays(probs, weights=None, filter="ema", alpha=SMOOTHING_ALPHA, window=15, segments=None):
+    """
+    probs[n, E] -> (eng_raw[n], eng_smooth[n]).
+    segments: độ dài từng session khi probs là nhiều session nối liền,
+    bộ lọc chạy riêng từng đoạn (nhân trọng số vẫn 1 lần cho tất cả).
+    """
+    raw = probs @ weight_vector(weights)
+    if segments is None:
+        return raw, smooth(raw, filter, alpha, window)
+
+    smoothed = np.empty_like(raw)
+    start = 0
+    for length in segments:
+        smoothed[start:start + length] = smooth(raw[start:start + length], filter, alpha, window)
+        start += length
+    return raw, smoothed
+
+
+def _summary(eng_smooth, emotions):
+    df = pd.DataFrame({"eng_smooth": eng_smooth, "emotion": emotions})
+    return RunningStats.from_frame(df).summary()
+
+
+def rescore_sessions(session_ids, weights=None, filter="ema", alpha=SMOOTHING_ALPHA,
+                     window=15, points=500, timeline=True):
+    """
+    Tính lại engagement của nhiều session trong 1 lần.
+    -> {"params", "sessions": [{session_id, frames, summary, timeline}, ...]}
+    (session không có face store: {"session_id", "error"}).
+    timeline rút gọn bằng LTTB còn tối đa `points` điểm.
+
+    emotion mỗi frame = emotion xuất hiện nhiều nhất giữa các mặt, giống log /
+    analytics (không đổi theo trọng số).
+    """
+    if filter not in FILTERS:
+        raise ValueError(f"filter không hợp lệ: {filter} (chọn {FILTERS})")
+    weights = dict(EMOTION_WEIGHTS) if weights is None else weights
+
+    loaded, results = [], {}
+    for session_id in session_ids:
+        try:
+            ts, probs, faces, dominant = load_frame_probs(session_id)
+        except FileNotFoundError:
+            results[session_id] = {"session_id": session_id, "error": "face_store_not_found"}
+            continue
+        loaded.append((session_id, ts, probs, dominant))
+
+    if loaded:
+        all_probs = np.concatenate([p for _, _, p, _ in loaded])
+        raw, smoothed = rescore_arrays(all_probs, weights, filter, alpha, window,
+                                       segments=[len(p) for _, _, p, _ in loaded])
+        dominant = np.asarray(EMOTION_LABELS)[np.concatenate([d for _, _, _, d in loaded])]
+
+        start = 0
+        for session_id, ts, probs, _ in loaded:
+            end = start + len(probs)
+            eng = smoothed[start:end]
+            item = {
+                "session_id": session_id,
+                "frames": len(probs),
+                "summary": _summary(eng, dominant[start:end]),
+            }
+            if timeline:
+                keep = lttb(ts, eng, points)
+                item["timeline"] = {
+                    "t": ts[keep].tolist(),
+                    "eng_raw": raw[start:end][keep].tolist(),
+                    "eng_smooth": eng[keep].tolist(),
+                }
+            results[session_id] = item
+            start = end
+
+    params = {"weights": weights, "filter": filter, "alpha": alpha, "window": window}
+    return {"params": params, "sessions": [results[s] for s in session_ids]}
+
+
+def rescore_frame(session_id, weights=None, filter="ema", alpha=SMOOTHING_ALPHA, window=15):
+    """Kết quả đầy đủ từng frame của 1 session dạng DataFrame (cùng cột với log)."""
+    ts, probs, faces, dominant = load_frame_probs(session_id)
+    raw, smoothed = rescore_arrays(probs, weights, filter, alpha, window)
+    return pd.DataFrame({
+        "timestamp": ts,
+        "emotion": np.asarray(EMOTION_LABELS)[dominant],
+        "eng_raw": raw,
+        "eng_smooth": smoothed,
+        "faces": faces,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tính lại engagement từ xác suất đã lưu")
+    parser.add_argument("session_ids", nargs="+")
+    parser.add_argument("--weights", default=None, help='vd. "happy=1,neutral=0.5" hoặc JSON')
+    parser.add_argument("--filter", choices=FILTERS, default="ema")
+    parser.add_argument("--alpha", type=float, default=SMOOTHING_ALPHA, help="hệ số EMA")
+    parser.add_argument("--window", type=int, default=15, help="cửa sổ median / mean (frame)")
+    parser.add_argument("--out", default=None,
+                        help="ghi kết quả từng frame ra CSV (cột session_id đầu tiên)")
+    args = parser.parse_args()
+
+    weights = parse_weights(args.weights)
+
+    if args.out:
+        frames = []
+        for session_id in args.session_ids:
+            df = rescore_frame(session_id, weights, args.filter, args.alpha, args.window)
+            df.insert(0, "session_id", session_id)
+            frames.append(df)
+        pd.concat(frames).to_csv(args.out, index=False)
+        print(f"Đã ghi {sum(len(f) for f in frames)} frame -> {args.out}")
+        return
+
+    result = rescore_sessions(args.session_ids, weights, args.filter, args.alpha, args.window,
+                              timeline=False)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
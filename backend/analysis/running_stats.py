@@ -0,0 +1,138 @@
+"""
+Thống kê cập nhật dần theo từng dòng log (O(1) mỗi dòng, O(1) bộ nhớ):
+mean/std (Welford), min, max, đếm emotion, quantile xấp xỉ (P²).
+"""
+import math
+from collections import Counter
+
+import numpy as np
+
+from backend.core.config import STATS_QUANTILES
+
+
+class P2Quantile:
+    """Ước lượng quantile p theo thuật toán P² (Jain & Chlamtac), không lưu dữ liệu."""
+
+    def __init__(self, p):
+        self.p = p
+        self.q = []                         # chiều cao 5 marker
+        self.n = [0, 1, 2, 3, 4]            # vị trí thực
+        self.np = [0, 2 * p, 4 * p, 2 + 2 * p, 4]   # vị trí mong muốn
+        self.dn = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        q, n = self.q, self.n
+
+        # 5 giá trị đầu: lưu nguyên
+        if len(q) < 5:
+            q.append(x)
+            if len(q) == 5:
+                q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(1, 5) if x < q[i]) - 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+
+        # chỉnh 3 marker giữa về gần vị trí mong muốn
+        for i in range(1, 4):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = self._parabolic(i, d)
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.q, self.n
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self):
+        if not self.q:
+            return None
+        if len(self.q) < 5:
+            return float(np.quantile(self.q, self.p))
+        return float(self.q[2])
+
+
+class RunningStats:
+    """Tổng hợp engagement (eng_smooth) + phân bố emotion của 1 session."""
+
+    def __init__(self, quantiles=STATS_QUANTILES):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.emotions = Counter()
+        self.quantiles = {p: P2Quantile(p) for p in quantiles or ()}
+        self._exact = None   # quantile chính xác khi dựng lại từ log
+
+    def update(self, emotion, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        self.emotions[emotion] += 1
+        for est in self.quantiles.values():
+            est.add(value)
+
+    @classmethod
+    def from_frame(cls, df, quantiles=STATS_QUANTILES):
+        """Dựng lại từ DataFrame log (vectorized, quantile chính xác)."""
+        stats = cls(quantiles=())
+        values = df["eng_smooth"].to_numpy(dtype=np.float64)
+        stats.count = len(values)
+        if stats.count:
+            stats.mean = float(values.mean())
+            stats._m2 = float(((values - stats.mean) ** 2).sum())
+            stats.min = float(values.min())
+            stats.max = float(values.max())
+        stats.emotions = Counter(df["emotion"].value_counts().to_dict())
+        stats._exact = {p: float(np.quantile(values, p)) for p in quantiles or ()} if stats.count else {}
+        return stats
+
+    def std(self):
+        return math.sqrt(self._m2 / self.count) if self.count else 0.0
+
+    def summary(self):
+        """Giữ các key cũ (avg/max/min/emotion_distribution), thêm count/std/quantiles."""
+        if not self.count:
+            return {"avg": 0, "max": 0, "min": 0, "emotion_distribution": {},
+                    "count": 0, "std": 0.0, "quantiles": {}}
+
+        if self._exact is not None:
+            quantiles = self._exact
+        else:
+            quantiles = {p: est.value() for p, est in self.quantiles.items()}
+
+        return {
+            "avg": float(self.mean),
+            "max": float(self.max),
+            "min": float(self.min),
+            "emotion_distribution": dict(self.emotions.most_common()),
+            "count": self.count,
+            "std": self.std(),
+            "quantiles": {f"p{round(p * 100)}": v for p, v in quantiles.items()},
+        }
@@ -1,10 +1,5 @@
-import pandas as pd
+from backend.analysis.running_stats import RunningStats
 
-def compute_stats(log_path):
-    df = pd.read_csv(log_path)
-    return {
-        "avg": float(df["eng_smooth"].mean()),
-        "max": float(df["eng_smooth"].max()),
-        "min": float(df["eng_smooth"].min()),
-        "emotion_distribution": df["emotion"].value_counts().to_dict()
-    }
+def compute_stats(df):
+    """df: DataFrame log của session (xem storage.log_writer.load_log)."""
+    return RunningStats.from_frame(df).summary()
@@ -0,0 +1,298 @@
+"""
+Truy vấn timeline theo khoảng thời gian + độ phân giải, không quét cả log.
+
+Mỗi session có các tầng rollup (sidecar <session_id>.timeline.npz):
+tầng 0 = từng dòng log, tầng k gộp TIMELINE_ROLLUP_FACTOR bucket của tầng k-1.
+Mỗi bucket lưu: thời điểm bắt đầu, count, sum/min/max eng_smooth, số lần mỗi emotion.
+
+Truy vấn [start, end] chọn tầng mịn nhất có không quá ~4 * points bucket trong
+khoảng (tìm bằng searchsorted), rồi gộp tiếp xuống còn `points` điểm.
+Ở tầng thô, bucket ở 2 đầu khoảng có thể lấn ra ngoài [start, end] một chút.
+
+Session đang ghi: mỗi lần log đổi chỉ đọc phần ghi thêm (load_log_since) và
+tính lại bucket cuối của mỗi tầng; sidecar chỉ ghi khi session đã đóng.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.core.config import OUTPUT_LOG_DIR, TIMELINE_ROLLUP_FACTOR
+from backend.storage.log_writer import load_log_since, log_version, is_live
+
+logger = logging.getLogger(__name__)
+
+AGGREGATIONS = ("mean", "min", "max")
+
+# giữ index của các session truy vấn gần nhất
+MAX_CACHED = 32
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def index_path(session_id):
+    return os.path.join(OUTPUT_LOG_DIR, f"{session_id}.timeline.npz")
+
+
+class TimelineIndex:
+    def __init__(self, levels, emotions, t0, version, offset=0):
+        self.levels = levels        # list dict: t, count, sum, min, max, emo
+        self.emotions = emotions    # tên emotion theo cột của emo
+        self.t0 = t0                # timestamp dòng đầu tiên
+        self.version = version
+        self.offset = offset        # vị trí đã đọc tới trong log (xem load_log_since)
+        self.lock = threading.Lock()  # extend() / query() trên cùng index
+
+    @classmethod
+    def build(cls, df, version, offset=0, factor=TIMELINE_ROLLUP_FACTOR):
+        index = cls([], [], None, version, offset)
+        index._append(df, factor)
+        return index
+
+    def extend(self, df, version, offset, factor=TIMELINE_ROLLUP_FACTOR):
+        """
+        Thêm các dòng log mới (session đang ghi): chỉ tính lại bucket cuối
+        của mỗi tầng, không dựng lại từ đầu.
+        """
+        self._append(df, factor)
+        self.version = version
+        self.offset = offset
+
+    def _append(self, df, factor):
+        ts = df["timestamp"].to_numpy(dtype=np.float64)
+        if self.t0 is None and len(ts):
+            self.t0 = float(ts[0])
+        values = df["eng_smooth"].to_numpy(dtype=np.float64)
+        codes = self._codes(df["emotion"].to_numpy())
+
+        onehot = np.zeros((len(codes), len(self.emotions)), dtype=np.uint32)
+        onehot[np.arange(len(codes)), codes] = 1
+        new = {
+            "t": ts - (self.t0 if self.t0 is not None else 0.0),
+            "count": np.ones(len(ts), dtype=np.uint32),
+            "sum": values,
+            "min": values,
+            "max": values,
+            "emo": onehot,
+        }
+
+        if not self.levels:
+            self.levels = [new]
+            changed = 0
+        else:
+            base = self.levels[0]
+            changed = len(base["t"])
+            self.levels[0] = {key: np.concatenate([base[key], new[key]]) for key in base}
+
+        # gộp dần tới khi chỉ còn 1 bucket; mỗi tầng chỉ tính lại từ bucket
+        # chứa phần tử đầu tiên bị đổi ở tầng dưới
+        k = 1
+        while len(self.levels[k - 1]["t"]) > 1:
+            lower = self.levels[k - 1]
+            first = changed // factor
+            starts = np.arange(first * factor, len(lower["t"]), factor)
+            rolled = {
+                "t": lower["t"][starts],
+                "count": np.add.reduceat(lower["count"], starts),
+                "sum": np.add.reduceat(lower["sum"], starts),
+                "min": np.minimum.reduceat(lower["min"], starts),
+                "max": np.maximum.reduceat(lower["max"], starts),
+                "emo": np.add.reduceat(lower["emo"], starts, axis=0),
+            }
+            if k < len(self.levels):
+                kept = self.levels[k]
+                rolled = {key: np.concatenate([kept[key][:first], rolled[key]]) for key in kept}
+                self.levels[k] = rolled
+            else:
+                self.levels.append(rolled)
+            changed = first
+            k += 1
+
+    def _codes(self, values):
+        """
+        Mã emotion theo cột của emo. Cột luôn theo thứ tự tên (giống dựng
+        từ đầu), emotion mới -> chèn cột 0 vào mọi tầng.
+        """
+        names, codes = np.unique(values.astype(str), return_inverse=True)
+        emotions = sorted(set(self.emotions) | set(names.tolist()))
+        if emotions != self.emotions:
+            keep = [emotions.index(name) for name in self.emotions]
+            for level in self.levels:
+                emo = np.zeros((len(level["emo"]), len(emotions)), dtype=np.uint32)
+                emo[:, keep] = level["emo"]
+                level["emo"] = emo
+            self.emotions = emotions
+        mapping = np.array([emotions.index(name) for name in names.tolist()], dtype=np.int64)
+        return mapping[codes] if len(codes) else codes.astype(np.int64)
+
+    # ==========================
+    #   LƯU / ĐỌC SIDECAR
+    # ==========================
+    def save(self, path):
+        arrays = {"version": np.asarray(self.version, dtype=np.int64),
+                  "offset": np.int64(self.offset),
+                  "t0": np.float64(np.nan if self.t0 is None else self.t0),
+                  "emotions": np.asarray(self.emotions, dtype=str)}
+        for i, level in enumerate(self.levels):
+            for key, arr in level.items():
+                arrays[f"l{i}_{key}"] = arr
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            n_levels = sum(1 for k in data.files if k.endswith("_t"))
+            levels = [
+                {key: data[f"l{i}_{key}"] for key in ("t", "count", "sum", "min", "max", "emo")}
+                for i in range(n_levels)
+            ]
+            t0 = float(data["t0"])
+            return cls(levels, data["emotions"].tolist(), None if np.isnan(t0) else t0,
+                       data["version"].tolist(), int(data["offset"]))
+
+    # ==========================
+    #   TRUY VẤN
+    # ==========================
+    def query(self, start=None, end=None, points=500, agg="mean"):
+        """
+        start / end: giây tính từ dòng đầu tiên của session (None = đầu / cuối).
+        -> dict các cột t, value, count, emotion (mỗi phần tử 1 điểm).
+        """
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"agg phải là một trong {AGGREGATIONS}")
+        points = max(1, int(points))
+
+        with self.lock:
+            return self._query(start, end, points, agg)
+
+    def _query(self, start, end, points, agg):
+        start = -np.inf if start is None else start
+        end = np.inf if end is None else end
+
+        # tầng mịn nhất mà số bucket trong khoảng không quá 4 * points
+        chosen = None
+        for size_level, level in enumerate(self.levels):
+            i0 = int(np.searchsorted(level["t"], start, side="left"))
+            i1 = int(np.searchsorted(level["t"], end, side="right"))
+            if size_level and i0 > 0:
+                i0 -= 1   # bucket liền trước có thể chứa `start`
+            chosen = (size_level, level, i0, i1)
+            if i1 - i0 <= 4 * points:
+                break
+
+        size_level, level, i0, i1 = chosen
+        result = {"t0": self.t0, "level": size_level,
+                  "bucket_rows": TIMELINE_ROLLUP_FACTOR ** size_level,
+                  "t": [], "value": [], "count": [], "emotion": []}
+        if i1 <= i0:
+            return result
+
+        # gộp các bucket liên tiếp thành `points` nhóm
+        n = i1 - i0
+        groups = np.unique(np.linspace(0, n, num=min(points, n), endpoint=False).astype(np.int64))
+        sl = slice(i0, i1)
+
+        count = np.add.reduceat(level["count"][sl], groups)
+        if agg == "mean":
+            value = np.add.reduceat(level["sum"][sl], groups) / count
+        elif agg == "min":
+            value = np.minimum.reduceat(level["min"][sl], groups)
+        else:
+            value = np.maximum.reduceat(level["max"][sl], groups)
+        emo = np.add.reduceat(level["emo"][sl], groups, axis=0)
+
+        names = np.asarray(self.emotions, dtype=object)
+        result.update({
+            "t": level["t"][sl][groups].tolist(),
+            "value": value.tolist(),
+            "count": count.tolist(),
+            "emotion": names[emo.argmax(axis=1)].tolist() if len(names) else [],
+        })
+        return result
+
+
+def get_index(session_id):
+    """
+    Index timeline đúng với phiên bản log hiện tại: lấy từ cache / sidecar,
+    chỉ cập nhật khi log đã thay đổi. None nếu chưa có log.
+
+    Log được ghi thêm (session đang chạy): chỉ đọc phần mới và tính lại
+    bucket cuối mỗi tầng. Sidecar chỉ ghi khi session đã đóng, không ghi
+    lại sau mỗi lần poll.
+    """
+    version = log_version(session_id)
+    if version is None:
+        return None
+
+    with _cache_lock:
+        index = _cache.get(session_id)
+        if index is not None:
+            _cache.move_to_end(session_id)
+            if index.version == version:
+                return index
+
+    path = index_path(session_id)
+    if index is None:
+        try:
+            index = TimelineIndex.load(path)
+        except (FileNotFoundError, ValueError, KeyError, OSError):
+            pass
+
+    changed = False
+    if index is not None:
+        with index.lock:
+            if index.version != version:
+                changed = True
+                if not _extend(session_id, index, version):
+                    index = None
+
+    if index is None:
+        loaded = load_log_since(session_id, 0)
+        if loaded is None:
+            return None
+        df, offset = loaded
+        index = TimelineIndex.build(df, version, offset)
+        changed = True
+
+    if changed and index.t0 is not None and not is_live(session_id):
+        index.save(path)
+
+    with _cache_lock:
+        _cache[session_id] = index
+        _cache.move_to_end(session_id)
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+    return index
+
+
+def _extend(session_id, index, version):
+    """Thêm phần log mới vào index. False nếu log đã bị ghi lại (cần dựng lại)."""
+    try:
+        loaded = load_log_since(session_id, index.offset)
+    except ValueError:
+        return False
+    if loaded is None:
+        return False
+    df, offset = loaded
+    index.extend(df, version, offset)
+    return True
+
+
+def query_timeline(session_id, start=None, end=None, points=500, agg="mean"):
+    try:
+        index = get_index(session_id)
+    except Exception:
+        # file hỏng / không parse được (giống generate_report)
+        logger.exception("[timeline] cannot index log of %s", session_id)
+        return {"session_id": session_id, "warning": "csv_read_error", "t": [], "value": [],
+                "count": [], "emotion": []}
+    if index is None:
+        return {"session_id": session_id, "error": "log_not_found"}
+    if index.t0 is None:
+        # log rỗng / chỉ có header (webcam không detect được mặt)
+        return {"session_id": session_id, "warning": "empty_log", "t": [], "value": [],
+                "count": [], "emotion": []}
+    return {"session_id": session_id, **index.query(start, end, points, agg)}
@@ -1,24 +1,42 @@
-import matplotlib
-matplotlib.use("Agg")  # FIX lỗi Tkinter khi chạy trong server
-
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
+import json
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import numpy as np
+
+from backend.core.config import CHART_MAX_POINTS
+from backend.analysis.downsampling import lttb
+from backend.storage.log_writer import load_log, log_version
+
+logger = logging.getLogger(__name__)
 
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
+def _pyplot():
+    """
+    Import matplotlib / seaborn ở lần vẽ đầu tiên (không phải lúc import
+    module): server khởi động nhanh, chỉ trả giá import khi có report.
+    """
+    import matplotlib
+    matplotlib.use("Agg")  # FIX lỗi Tkinter khi chạy trong server
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
 def create_charts(session_id):
-    log_path = f"output/logs/{session_id}.csv"
     out_dir = f"output/reports/{session_id}/"
     ensure_dir(out_dir)
 
-    df = pd.read_csv(log_path)
+    df = load_log(session_id)
 
-    if df.empty:
+    if df is None or df.empty:
         return {"emotion_pie": None, "engagement_line": None}
 
+    plt, sns = _pyplot()
+
     # Pie chart
     plt.figure(figsize=(6, 6))
     df["emotion"].value_counts().plot.pie(autopct="%1.1f%%")
@@ -27,9 +45,13 @@ def create_charts(session_id):
     plt.savefig(pie_path)
     plt.close()
 
-    # Line chart
+    # Line chart (session dài -> LTTB giữ hình dạng đường, không vẽ hết mọi dòng)
+    y = df["eng_smooth"].to_numpy(dtype=np.float64)
+    x = np.arange(len(y))
+    keep = lttb(x, y, CHART_MAX_POINTS)
+
     plt.figure(figsize=(10, 4))
-    sns.lineplot(data=df["eng_smooth"])
+    sns.lineplot(x=x[keep], y=y[keep])
     plt.title("Engagement Over Time")
     plt.ylabel("Engagement")
     plt.xlabel("Frame Index")
@@ -38,3 +60,91 @@ def create_charts(session_id):
     plt.close()
 
     return {"emotion_pie": pie_path, "engagement_line": line_path}
+
+
+# ==========================
+#   RENDER NỀN + CACHE THEO PHIÊN BẢN LOG
+# ==========================
+class ChartRenderer:
+    """
+    Vẽ biểu đồ trong 1 worker nền (pyplot không thread-safe), cache theo
+    phiên bản log (mtime, size) ghi ở output/reports/<id>/charts.json.
+
+    request() trả ngay:
+    - "ready":   ảnh đã vẽ cho đúng phiên bản log hiện tại
+    - "pending": đang vẽ (kèm ảnh cũ nếu có)
+    - "missing": session chưa có log
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="charts")
+        self._lock = threading.Lock()
+        self._cache = {}     # session_id -> meta {version, emotion_pie, engagement_line}
+        self._pending = {}   # session_id -> Future
+
+    @staticmethod
+    def _meta_path(session_id):
+        return f"output/reports/{session_id}/charts.json"
+
+    def _cached(self, session_id):
+        meta = self._cache.get(session_id)
+        if meta is None:
+            try:
+                with open(self._meta_path(session_id), encoding="utf-8") as f:
+                    meta = json.load(f)
+                self._cache[session_id] = meta
+            except (FileNotFoundError, ValueError):
+                return None
+        return meta
+
+    def _render(self, session_id, version):
+        try:
+            charts = create_charts(session_id)
+            meta = {"version": version, **charts}
+            with open(self._meta_path(session_id), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            with self._lock:
+                self._cache[session_id] = meta
+            return meta
+        except Exception:
+            logger.exception("[ChartRenderer] vẽ biểu đồ %s lỗi", session_id)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(session_id, None)
+
+    def request(self, session_id, wait=0):
+        """wait: số giây tối đa chờ vẽ xong (0 = trả ngay)."""
+        version = log_version(session_id)
+        if version is None:
+            return {"status": "missing", "emotion_pie": None, "engagement_line": None}
+
+        with self._lock:
+            meta = self._cached(session_id)
+            if meta is not None and meta.get("version") == version:
+                return {"status": "ready", "emotion_pie": meta["emotion_pie"],
+                        "engagement_line": meta["engagement_line"]}
+
+            future = self._pending.get(session_id)
+            if future is None:
+                future = self._executor.submit(self._render, session_id, version)
+                self._pending[session_id] = future
+
+        if wait:
+            try:
+                meta = future.result(timeout=wait)
+                return {"status": "ready", "emotion_pie": meta["emotion_pie"],
+                        "engagement_line": meta["engagement_line"]}
+            except TimeoutError:
+                pass
+            except Exception as e:
+                return {"status": "error", "error": str(e)}
+
+        return {
+            "status": "pending",
+            "emotion_pie": meta["emotion_pie"] if meta else None,
+            "engagement_line": meta["engagement_line"] if meta else None,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
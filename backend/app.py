@@ -1,21 +1,30 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, WebSocket
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-import threading
-import time
-from collections import Counter
 
-import numpy as np
-import cv2
-
-from backend.pipeline.engagement_pipeline import EngagementPipeline
+from backend.pipeline.session_engine import SessionEngine
+from backend.pipeline.inference_pool import InferencePool
+from backend.pipeline.realtime import init_worker_models, analyze_bytes
+from backend.pipeline.offline_batch import OfflineJob
+from backend.pipeline.frame_stream import stream_frames
 from backend.storage.session_manager import SessionManager
 from backend.analysis.report_generator import generate_report
-from backend.analysis.visualization import create_charts
-from backend.models.face_detector import FaceDetector
-from backend.models.emotion_model import EmotionModel
-from backend.core.config import EMOTION_WEIGHTS
-from backend.storage.log_writer import LogWriter
-from backend.utils.file_utils import ensure_dir
+from backend.analysis.visualization import ChartRenderer
+from backend.analysis.timeline import query_timeline, AGGREGATIONS
+from backend.storage.face_store import FaceStore
+from backend.storage.catalog import get_catalog, ORDER_COLUMNS
+from backend.models.registry import registry, batcher_stats, shutdown_batcher
+from backend.core import metrics
+from backend.core.config import (
+    RT_DETECT_WIDTH,
+    RT_MIN_CROP_SIZE,
+    RT_UPLOAD_MAX_WIDTH,
+    RT_UPLOAD_JPEG_QUALITY,
+    MODEL_PRELOAD,
+)
+from backend.core.logging_config import setup_logging
+
+setup_logging()
 
 app = FastAPI()
 
@@ -23,16 +32,32 @@ app = FastAPI()
 #   GLOBAL INSTANCES
 # ==========================
 session_manager = SessionManager()
-pipeline = EngagementPipeline()
-thread = None  # background thread (pipeline loop)
 
-# dùng riêng cho realtime /analyze_frame
-rt_face_detector = FaceDetector()
-rt_emotion_model = EmotionModel()
+# nhiều session video/webcam/realtime chạy đồng thời, mỗi session có
+# pipeline / smoother / tracker / log riêng, dùng chung pool worker
+engine = SessionEngine()
 
-# logging cho realtime dashboard
-rt_log: LogWriter | None = None
-rt_session_id: str | None = None
+# model (detector + CNN) dùng chung giữa /analyze_frame và pipeline qua
+# ModelRegistry, chỉ load ở lần dùng đầu tiên
+
+# executor có giới hạn cho /analyze_frame (không chặn event loop)
+rt_pool = InferencePool(initializer=init_worker_models)
+
+# độ sâu hàng đợi, đọc lúc /metrics được scrape
+metrics.QUEUE_DEPTH.labels("rt_pool").set_function(lambda: rt_pool.stats()["queue_depth"])
+metrics.QUEUE_DEPTH.labels("infer_batcher").set_function(
+    lambda: (batcher_stats() or {}).get("queue_depth", 0)
+)
+for _name in ("engine_ready", "pipeline_detect", "pipeline_infer", "pipeline_log"):
+    metrics.QUEUE_DEPTH.labels(_name).set_function(
+        lambda name=_name: engine.queue_depths().get(name, 0)
+    )
+
+# vẽ biểu đồ trong worker nền, cache theo phiên bản log
+chart_renderer = ChartRenderer()
+
+# job phân tích offline (video đã quay) chạy trên process pool riêng
+offline_jobs = {}
 
 
 # ==========================
@@ -46,20 +71,6 @@ app.add_middleware(
 )
 
 
-# ==========================
-#   UTILS
-# ==========================
-def compute_engagement(prob_dict: dict) -> float:
-    """
-    Tính điểm engagement từ vector xác suất cảm xúc.
-    Engagement = sum(p(emotion) * weight_emotion)
-    """
-    score = 0.0
-    for emo, w in EMOTION_WEIGHTS.items():
-        score += prob_dict.get(emo, 0.0) * w
-    return score
-
-
 # ==========================
 #   ROOT
 # ==========================
@@ -68,25 +79,86 @@ def root():
     return {"status": "ok", "message": "Backend running!"}
 
 
+@app.on_event("startup")
+def startup():
+    # model load trong thread nền: server nhận request ngay, /readyz báo tiến độ
+    if MODEL_PRELOAD:
+        registry.preload()
+
+
+# ==========================
+#   HEALTH CHECK
+# ==========================
+@app.get("/healthz")
+def healthz():
+    """Liveness: process còn phục vụ request (không phụ thuộc model)."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """
+    Readiness: 200 khi mọi model đã load xong (hoặc MODEL_PRELOAD tắt),
+    503 trong lúc đang load / load lỗi, kèm trạng thái từng model.
+    """
+    models = registry.stats()
+    loaded = sum(1 for m in models.values() if m["loaded"])
+    ready = registry.ready() or not MODEL_PRELOAD
+    body = {
+        "status": "ready" if ready else "loading",
+        "loaded": loaded,
+        "total": len(models),
+        "models": models,
+    }
+    if not ready and any(m["state"] == "error" for m in models.values()):
+        body["status"] = "error"
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+@app.on_event("shutdown")
+def shutdown():
+    engine.shutdown()
+    rt_pool.shutdown()
+    shutdown_batcher()
+    chart_renderer.shutdown()
+
+
 # ==========================
 #   START SESSION (video / webcam - pipeline cũ)
 # ==========================
 @app.get("/start")
-def start(mode: str = "video", video_path: str = "data/videos/sample.mp4"):
+def start(mode: str = "video", video_path: str = "data/videos/sample.mp4",
+          pipeline_mode: str | None = None, policy: str | None = None,
+          max_fps: float | None = None, target_fps: float | None = None,
+          stride: int | None = None, start: float | None = None, end: float | None = None):
     """
     Khởi động 1 phiên phân tích mới (dùng cho pipeline video/webcam).
+    Có thể chạy nhiều phiên cùng lúc, mỗi phiên 1 session_id riêng.
+
+    pipeline_mode: "sequential" | "staged" (mặc định theo config)
+    policy: "realtime" | "offline" (mặc định: webcam -> realtime, video -> offline)
+    max_fps: giới hạn số frame/giây của phiên này (mặc định theo config)
+    target_fps / stride: chỉ phân tích tối đa target_fps frame/giây của nguồn,
+    hoặc 1 trong mỗi `stride` frame (frame bỏ qua không bị decode ra ảnh)
+    start / end: chỉ phân tích đoạn [start, end] giây của file video
     """
-    global thread
+    source_options = {
+        key: value
+        for key, value in {"target_fps": target_fps, "stride": stride, "start": start, "end": end}.items()
+        if value is not None
+    }
 
     # tạo session ID
     session_id = session_manager.create_session(mode, video_path)
 
-    # khởi động pipeline
-    pipeline.start(session_id, mode, video_path)
-
-    # chạy loop trong thread riêng
-    thread = threading.Thread(target=pipeline.loop, daemon=True)
-    thread.start()
+    # khởi động pipeline trong engine
+    try:
+        engine.start_session(session_id, mode, video_path,
+                             pipeline_mode=pipeline_mode, policy=policy, max_fps=max_fps,
+                             source_options=source_options)
+    except RuntimeError as e:
+        session_manager.stop_session(session_id)
+        return {"session_id": session_id, "status": "rejected", "error": str(e)}
 
     return {"session_id": session_id, "status": "started"}
 
@@ -95,29 +167,30 @@ def start(mode: str = "video", video_path: str = "data/videos/sample.mp4"):
 #   STOP SESSION + REPORT + CHARTS (pipeline cũ)
 
 @app.get("/stop")
-def stop():
+def stop(session_id: str | None = None, timeline: bool = True):
     """
-    Dừng phiên hiện tại, đợi ghi log xong,
+    Dừng phiên (mặc định: phiên mới nhất), đợi ghi log xong,
     sau đó sinh báo cáo + dữ liệu biểu đồ từ file log.
-    """
-    global thread
 
-    # yêu cầu pipeline dừng
-    pipeline.stop()
-    session_id = pipeline.current_session
+    timeline=false: chỉ trả summary (lấy từ sidecar thống kê, không đọc lại
+    log), bỏ các key timeline / emotions.
+    """
+    session_id = session_id or engine.latest_session()
+    if session_id is None:
+        return {"error": "no_session"}
 
-    # đợi thread dừng hẳn (fix lỗi report 0-0-0)
-    if thread is not None and thread.is_alive():
-        thread.join()
+    # yêu cầu pipeline dừng + đợi ghi log xong (fix lỗi report 0-0-0)
+    if not engine.stop_session(session_id) and not session_manager.has_session(session_id):
+        return {"error": "session_not_found", "session_id": session_id}
 
     # đánh dấu session đã kết thúc
     session_manager.stop_session(session_id)
 
     # tạo báo cáo từ log
-    report = generate_report(session_id)
+    report = generate_report(session_id, timeline=timeline)
 
-    # tạo dữ liệu biểu đồ
-    charts = create_charts(session_id)
+    # vẽ biểu đồ ở nền, lấy lại qua /sessions/{id}/charts khi status = "ready"
+    charts = chart_renderer.request(session_id)
 
     return {
         "session": session_id,
@@ -126,80 +199,273 @@ def stop():
     }
 
 
+# ==========================
+#   OFFLINE BATCH (video đã quay, chia shard chạy song song)
+# ==========================
+@app.post("/offline/analyze")
+def offline_analyze(video_path: str, workers: int | None = None,
+                    shards: int | None = None, stride: int = 1):
+    """
+    Phân tích cả video bằng nhiều process (mỗi process 1 đoạn frame).
+    Chạy nền, theo dõi tiến độ qua /offline/{session_id}.
+    """
+    if stride < 1:
+        return {"error": "invalid_stride", "detail": "stride phải >= 1"}
+
+    session_id = session_manager.create_session("offline", video_path)
+    offline_jobs[session_id] = OfflineJob(
+        session_id, video_path, workers=workers, shards=shards, stride=stride,
+        on_done=lambda job: session_manager.stop_session(job.session_id),
+    )
+    return {"session_id": session_id, "status": "started"}
+
+
+@app.get("/offline/{session_id}")
+def offline_status(session_id: str):
+    """
+    Trạng thái job offline: running / done / error + số shard đã xong.
+    """
+    job = offline_jobs.get(session_id)
+    if job is None:
+        return {"error": "job_not_found"}
+    return job.to_dict()
+
+
+# ==========================
+#   PIPELINE STATS
+# ==========================
+@app.get("/pipeline/stats")
+def pipeline_stats(session_id: str | None = None):
+    """
+    Throughput / queue depth / số frame bị drop.
+    Không truyền session_id -> trạng thái engine + mọi session đang chạy.
+    """
+    if session_id is None:
+        return engine.stats()
+    return engine.session_stats(session_id) or {"error": "session_not_found"}
+
+
+# ==========================
+#   CATALOG (truy vấn nhiều session, chỉ đọc index SQLite)
+# ==========================
+def _catalog_filters(start, end, mode, status, min_avg, max_avg, emotion, min_share):
+    return {
+        "start": start, "end": end, "mode": mode, "status": status,
+        "min_avg": min_avg, "max_avg": max_avg, "emotion": emotion, "min_share": min_share,
+    }
+
+
+@app.get("/sessions")
+def list_sessions(start: str | None = None, end: str | None = None, mode: str | None = None,
+                  status: str | None = None, min_avg: float | None = None, max_avg: float | None = None,
+                  emotion: str | None = None, min_share: float | None = None,
+                  order: str = "started_at", desc: bool = True, limit: int = 100, offset: int = 0):
+    """
+    Danh sách session theo bộ lọc, mới nhất trước.
+
+    start / end: thời điểm bắt đầu session (epoch hoặc ISO, vd. 2025-12-01)
+    emotion + min_share: chỉ lấy session có tỉ lệ frame emotion đó >= min_share
+    """
+    catalog = get_catalog()
+    if catalog is None:
+        return {"error": "catalog_disabled"}
+    if order not in ORDER_COLUMNS:
+        return {"error": "invalid_order", "allowed": list(ORDER_COLUMNS)}
+    try:
+        filters = _catalog_filters(start, end, mode, status, min_avg, max_avg, emotion, min_share)
+        return catalog.query(order=order, desc=desc, limit=limit, offset=offset, **filters)
+    except ValueError as e:
+        return {"error": "invalid_filter", "detail": str(e)}
+
+
+@app.get("/sessions/aggregate")
+def aggregate_sessions(start: str | None = None, end: str | None = None, mode: str | None = None,
+                       status: str | None = None, min_avg: float | None = None,
+                       max_avg: float | None = None, emotion: str | None = None,
+                       min_share: float | None = None):
+    """
+    Tổng hợp cả nhóm session (cohort): số session, tổng frame, engagement
+    trung bình, tỉ lệ emotion. Cùng bộ lọc với /sessions.
+    """
+    catalog = get_catalog()
+    if catalog is None:
+        return {"error": "catalog_disabled"}
+    try:
+        filters = _catalog_filters(start, end, mode, status, min_avg, max_avg, emotion, min_share)
+        return catalog.aggregate(**filters)
+    except ValueError as e:
+        return {"error": "invalid_filter", "detail": str(e)}
+
+
 # ==========================
 #   GET SESSION ANALYTICS
 # ==========================
 @app.get("/sessions/{session_id}/analytics")
-def analytics(session_id: str):
+def analytics(session_id: str, timeline: bool = True):
     """
-    Lấy lại report (summary + timeline) của 1 session bất kỳ.
+    Lấy lại report của 1 session bất kỳ.
+    timeline=false: chỉ summary từ sidecar thống kê, không kèm chuỗi
+    engagement / emotion (không đọc lại log).
     """
-    return generate_report(session_id)
+    return generate_report(session_id, timeline=timeline)
+
+
+# ==========================
+#   TIMELINE QUERY (zoom theo khoảng thời gian)
+# ==========================
+@app.get("/sessions/{session_id}/timeline")
+def timeline(session_id: str, start: float | None = None, end: float | None = None,
+             points: int = 500, agg: str = "mean"):
+    """
+    Engagement theo thời gian, đã gộp sẵn về tối đa `points` điểm.
+
+    start / end: giây tính từ đầu session (mặc định: cả session)
+    agg: "mean" | "min" | "max" cho mỗi điểm
+    """
+    if agg not in AGGREGATIONS:
+        return {"error": "invalid_agg", "allowed": list(AGGREGATIONS)}
+    return query_timeline(session_id, start=start, end=end, points=points, agg=agg)
+
+
+# ==========================
+#   PER-STUDENT (theo track ID)
+# ==========================
+@app.get("/sessions/{session_id}/students")
+def students(session_id: str):
+    """
+    Tổng hợp từng học sinh (track ID) của session: số frame, engagement
+    trung bình / min / max, emotion chủ đạo.
+    """
+    try:
+        return {"session_id": session_id, "students": FaceStore(session_id).students()}
+    except FileNotFoundError:
+        return {"session_id": session_id, "error": "face_store_not_found"}
+
+
+@app.get("/sessions/{session_id}/students/{track_id}")
+def student(session_id: str, track_id: int, points: int = 500):
+    """
+    Tổng hợp + timeline engagement / emotion của 1 học sinh,
+    timeline rút gọn còn tối đa `points` điểm.
+    """
+    try:
+        result = FaceStore(session_id).student(track_id, points=points)
+    except FileNotFoundError:
+        return {"session_id": session_id, "error": "face_store_not_found"}
+    if result is None:
+        return {"session_id": session_id, "error": "student_not_found"}
+    return {"session_id": session_id, **result}
+
+
+# ==========================
+#   RE-SCORE (trọng số / bộ lọc mới trên xác suất đã lưu)
+# ==========================
+@app.get("/rescore")
+def rescore(session_ids: str, weights: str | None = None, filter: str = "ema",
+            alpha: float | None = None, window: int = 15, points: int = 500):
+    """
+    Tính lại engagement của 1 hoặc nhiều session (session_ids="a,b,c") từ
+    vector xác suất đã lưu, không chạy lại model.
+
+    weights: "happy=1,neutral=0.5" (emotion không ghi giữ trọng số trong config)
+    filter: "ema" (alpha) | "median" / "mean" (window frame) | "none"
+    """
+    # pandas chỉ import khi có request re-score đầu tiên
+    from backend.analysis.rescoring import rescore_sessions, parse_weights, FILTERS
+
+    if filter not in FILTERS:
+        return {"error": "invalid_filter", "allowed": list(FILTERS)}
+    try:
+        weights = parse_weights(weights)
+    except (ValueError, TypeError) as e:
+        # TypeError: giá trị JSON không phải số (null, list, ...)
+        return {"error": "invalid_weights", "detail": str(e)}
+
+    ids = [s.strip() for s in session_ids.split(",") if s.strip()]
+    kwargs = {"alpha": alpha} if alpha is not None else {}
+    return rescore_sessions(ids, weights, filter, window=window, points=points, **kwargs)
+
+
+@app.get("/sessions/{session_id}/rescore")
+def rescore_session(session_id: str, weights: str | None = None, filter: str = "ema",
+                    alpha: float | None = None, window: int = 15, points: int = 500):
+    """Như /rescore cho 1 session."""
+    result = rescore(session_id, weights, filter, alpha, window, points)
+    if "sessions" not in result:
+        return result
+    return {"params": result["params"], **result["sessions"][0]}
 
 
 # ==========================
 #   GET SESSION CHARTS
 # ==========================
 @app.get("/sessions/{session_id}/charts")
-def charts(session_id: str):
+def charts(session_id: str, wait: float = 0):
     """
     Lấy lại dữ liệu biểu đồ của 1 session.
+    status = "ready" (ảnh đúng với log hiện tại) | "pending" (đang vẽ nền, gọi lại sau)
+    wait: số giây tối đa chờ vẽ xong.
     """
-    return create_charts(session_id)
+    return chart_renderer.request(session_id, wait=wait)
 
 
 # ==========================
 #   REALTIME SESSION (dashboard dùng /analyze_frame)
 
+@app.get("/rt_config")
+def rt_config():
+    """
+    Độ phân giải FE nên gửi lên: frame rộng hơn upload_max_width chỉ tốn công
+    encode / gửi / decode, vì detect chạy ở detect_width và crop mặt chỉ cần
+    min_crop_size px.
+    """
+    return {
+        "upload_max_width": RT_UPLOAD_MAX_WIDTH,
+        "jpeg_quality": RT_UPLOAD_JPEG_QUALITY,
+        "detect_width": RT_DETECT_WIDTH,
+        "min_crop_size": RT_MIN_CROP_SIZE,
+    }
+
+
 @app.get("/rt_start")
 def rt_start():
     """
     Bắt đầu 1 session realtime cho dashboard (không dùng VideoSource).
-    CSV sẽ được ghi mỗi lần /analyze_frame được gọi.
+    CSV sẽ được ghi mỗi lần /analyze_frame được gọi với session_id này.
+    Mỗi dashboard có session riêng.
     """
-    global rt_log, rt_session_id
-
-    if rt_log is not None:
-        # đã có session realtime đang chạy
-        return {"session_id": rt_session_id, "status": "already_started"}
-
     # tạo session id cho realtime
-    rt_session_id = session_manager.create_session("realtime", "webcam_js")
-
-    # đảm bảo thư mục tồn tại
-    ensure_dir("output/")
-    ensure_dir("output/logs/")
+    session_id = session_manager.create_session("realtime", "webcam_js")
 
-    # mở file log
-    rt_log = LogWriter(f"output/logs/{rt_session_id}.csv")
+    try:
+        engine.start_realtime(session_id)
+    except RuntimeError as e:
+        session_manager.stop_session(session_id)
+        return {"session_id": session_id, "status": "rejected", "error": str(e)}
 
-    return {"session_id": rt_session_id, "status": "rt_started"}
+    return {"session_id": session_id, "status": "rt_started"}
 
 
 @app.get("/rt_stop")
-def rt_stop():
+def rt_stop(session_id: str | None = None, timeline: bool = True):
     """
     Kết thúc session realtime, đóng CSV và sinh report + charts.
+    Không truyền session_id: chỉ dừng khi đang có đúng 1 session realtime
+    (nhiều dashboard cùng mở thì phải chỉ rõ session).
+    timeline=false: report chỉ có summary (xem /stop).
     """
-    global rt_log, rt_session_id
-
-    if rt_session_id is None or rt_log is None:
+    session = engine.stop_realtime(session_id)
+    if session is None:
         return {"error": "no_realtime_session"}
 
-    session_id = rt_session_id
-
-    # đóng file log
-    rt_log.close()
-    rt_log = None
+    session_id = session.session_id
 
     # đánh dấu session kết thúc
     session_manager.stop_session(session_id)
 
     # sinh report + charts từ CSV vừa log
-    report = generate_report(session_id)
-    charts = create_charts(session_id)
-
-    rt_session_id = None
+    report = generate_report(session_id, timeline=timeline)
+    charts = chart_renderer.request(session_id)
 
     return {
         "session": session_id,
@@ -211,73 +477,92 @@ def rt_stop():
 # ==========================
 #   REALTIME FRAME ANALYSIS (cho FE vẽ khung)
 
+async def _analyze_image(image_bytes, session_id):
+    """
+    Detect + predict 1 ảnh trong rt_pool, ghi log vào session realtime (nếu có).
+    Không truyền session_id: chỉ ghi log khi đang có đúng 1 session realtime.
+    -> dict trả về cho FE (dùng chung cho /analyze_frame và /ws/analyze).
+    """
+    session = engine.get_realtime(session_id)
+    track_key = session.session_id if session is not None else None
+
+    # decode + detect + predict chạy trong executor, event loop vẫn rảnh
+    status, results = await rt_pool.run(analyze_bytes, image_bytes, track_key)
+
+    if status != "ok":
+        # busy / dropped / error: FE giữ nguyên khung cũ và gửi frame tiếp theo
+        return {"status": status, "faces": []}
+
+    if results is None:
+        return {"status": "invalid_image", "faces": []}
+
+    # GHI LOG REALTIME (nếu đang có session)
+    if session is not None:
+        session.write(results)
+
+    return {
+        "status": "ok",
+        "faces": results,
+    }
+
+
 @app.post("/analyze_frame")
-async def analyze_frame(frame: UploadFile = File(...)):
+async def analyze_frame(frame: UploadFile = File(...), session_id: str | None = None):
     """
     Nhận 1 frame (ảnh jpg/png) từ FE, detect nhiều mặt + emotion
     -> trả bbox + emotion + engagement cho từng mặt.
 
-    ID ở đây là số thứ tự trong frame (1, 2, 3, ...),
-    đủ để minh hoạ "Student 1, Student 2, ..." trong báo cáo.
+    ID là track ID ổn định giữa các frame (FaceTracker), nên
+    "Student 3" vẫn là cùng 1 người suốt session.
 
-    Nếu đang có session realtime (rt_start đã được gọi),
-    thì mỗi lần gọi /analyze_frame sẽ ghi 1 dòng vào CSV.
+    Nếu có session realtime (session_id; không truyền thì chỉ khi đang có
+    đúng 1 session realtime), mỗi lần gọi /analyze_frame sẽ ghi 1 dòng vào
+    CSV của session đó.
     """
-
-    global rt_log, rt_session_id
-
     # đọc raw bytes
     image_bytes = await frame.read()
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-    if img is None:
-        return {"status": "invalid_image", "faces": []}
+    return await _analyze_image(image_bytes, session_id)
 
-    # detect faces
-    boxes = rt_face_detector.detect(img)
 
-    results = []
-    for idx, (x, y, w, h) in enumerate(boxes):
-        if w <= 0 or h <= 0:
-            continue
+@app.websocket("/ws/analyze")
+async def ws_analyze(websocket: WebSocket, session_id: str | None = None):
+    """
+    Stream frame liên tục: FE gửi mỗi frame là 1 message nhị phân (jpg),
+    server luôn xử lý frame mới nhất (frame cũ chưa kịp xử lý bị bỏ) và đẩy
+    kết quả về ngay khi xong, cùng JSON với /analyze_frame
+    (+ seq / processed / dropped).
+    """
+    await websocket.accept()
+    await stream_frames(websocket, lambda data: _analyze_image(data, session_id))
 
-        face_img = img[y:y + h, x:x + w]
-        if face_img is None or face_img.size == 0:
-            continue
 
-        probs, dominant = rt_emotion_model.predict(face_img)
-        if probs is None:
-            continue
+@app.get("/rt_stats")
+def rt_stats(session_id: str | None = None):
+    """
+    Trạng thái hàng đợi inference realtime: queue depth, số frame bị drop/reject,
+    batcher (cỡ batch, thời gian chờ gom batch).
+    """
+    stats = rt_pool.stats()
+    stats["batcher"] = batcher_stats()
+    session = engine.get_realtime(session_id)
+    if session is not None:
+        stats["session"] = {"session_id": session.session_id, **session.stats()}
+    return stats
 
-        eng = compute_engagement(probs)
 
-        results.append({
-            "id": int(idx + 1),  # ID = 1,2,3,... trong frame hiện tại
-            "x": int(x),
-            "y": int(y),
-            "w": int(w),
-            "h": int(h),
-            "emotion": str(dominant),
-            "engagement": float(eng),
-            "probs": {k: float(v) for k, v in probs.items()},
-        })
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """
+    Metrics dạng Prometheus: latency từng stage (decode, detect, crop,
+    preprocess, forward, log_write), số mặt mỗi frame, frame bị drop, độ sâu queue,
+    quyết định của motion gate (frame bỏ qua / mặt dùng lại).
+    """
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
-    # GHI LOG REALTIME (nếu đang có session)
-    if rt_log is not None and results:
-        # engagement trung bình của cả frame
-        avg_eng = sum(f["engagement"] for f in results) / len(results)
-        # dominant emotion của frame = emotion xuất hiện nhiều nhất
-        dominant_frame = Counter(f["emotion"] for f in results).most_common(1)[0][0]
-
-        rt_log.write(
-            time.time(),
-            dominant_frame,
-            avg_eng,
-            avg_eng,  # ở đây raw = smooth, smoothing đã làm ở FE (line chart)
-        )
 
-    return {
-        "status": "ok",
-        "faces": results,
-    }
+@app.get("/models")
+def models():
+    """
+    Trạng thái model trong process: đã load chưa, thời gian load / warmup (ms).
+    """
+    return registry.stats()
@@ -0,0 +1,108 @@
+"""
+So sánh latency / recall giữa các face detector backend.
+
+    python -m backend.benchmarks.bench_face_detector
+    python -m backend.benchmarks.bench_face_detector --backends haar ssd --widths 0 640 --runs 10
+
+Recall được tính so với detector tham chiếu (mặc định mtcnn trên frame gốc):
+1 box tham chiếu được tính là "tìm thấy" nếu có box với IoU >= --iou.
+Nếu không load được detector tham chiếu thì chỉ báo số box.
+"""
+import argparse
+import json
+import statistics
+import time
+
+import cv2
+
+from backend.models.face_detector import FaceDetector, BACKENDS
+from backend.models.face_tracker import iou
+
+DEFAULT_IMAGES = ["happy.jpg", "test.jpg"]
+
+
+def load_detector(backend, max_width):
+    try:
+        return FaceDetector(backend=backend, max_width=max_width or None)
+    except Exception as e:
+        print(f"[skip] {backend}: {e}")
+        return None
+
+
+def time_detect(detector, img, runs):
+    detector.detect(img)  # warmup
+    times = []
+    boxes = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        boxes = detector.detect(img)
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return boxes, times
+
+
+def recall(reference, boxes, threshold):
+    if not reference:
+        return None
+    found = sum(1 for r in reference if any(iou(r, b) >= threshold for b in boxes))
+    return found / len(reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", nargs="+", default=DEFAULT_IMAGES)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--widths", nargs="+", type=int, default=[0, 960, 640],
+                        help="max width để detect (0 = frame gốc)")
+    parser.add_argument("--reference", default="mtcnn")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--iou", type=float, default=0.4)
+    parser.add_argument("--json", help="ghi kết quả ra file json")
+    args = parser.parse_args()
+
+    images = {}
+    for path in args.images:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"[skip] không đọc được ảnh {path}")
+            continue
+        images[path] = img
+
+    ref_detector = load_detector(args.reference, 0)
+    references = {}
+    if ref_detector is not None:
+        references = {p: ref_detector.detect(img) for p, img in images.items()}
+
+    rows = []
+    for backend in args.backends:
+        for width in args.widths:
+            detector = load_detector(backend, width)
+            if detector is None:
+                break
+
+            for path, img in images.items():
+                boxes, times = time_detect(detector, img, args.runs)
+                rows.append({
+                    "backend": backend,
+                    "max_width": width or None,
+                    "image": path,
+                    "faces": len(boxes),
+                    "reference_faces": len(references.get(path, [])) if references else None,
+                    "recall": recall(references.get(path), boxes, args.iou),
+                    "median_ms": statistics.median(times),
+                    "min_ms": min(times),
+                })
+
+    print(f"{'backend':8} {'width':>6} {'image':12} {'faces':>5} {'ref':>4} {'recall':>6} {'median ms':>10} {'min ms':>8}")
+    for r in rows:
+        rec = "-" if r["recall"] is None else f"{r['recall']:.2f}"
+        ref = "-" if r["reference_faces"] is None else r["reference_faces"]
+        print(f"{r['backend']:8} {str(r['max_width'] or 'full'):>6} {r['image']:12} "
+              f"{r['faces']:>5} {ref:>4} {rec:>6} {r['median_ms']:>10.1f} {r['min_ms']:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
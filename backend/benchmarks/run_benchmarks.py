@@ -0,0 +1,391 @@
+"""
+Bộ benchmark cho hot path inference + phân tích, chạy offline, kết quả JSON.
+
+    python -m backend.benchmarks.run_benchmarks
+    python -m backend.benchmarks.run_benchmarks --only detect predict --runs 20
+    python -m backend.benchmarks.run_benchmarks --save-baseline     # ghi baseline.json
+    python -m backend.benchmarks.run_benchmarks --threshold 0.2     # chậm hơn baseline >20% -> exit 1
+
+Dữ liệu: happy.jpg, test.jpg, frame tổng hợp nhiều mặt (ghép mặt từ happy.jpg
+lên 1 khung 1280x720) và log tổng hợp dài (--log-rows dòng) ghi vào thư mục tạm.
+Case nào không chạy được (thiếu model / backend) thì ghi "skipped" kèm lý do.
+So sánh với baseline theo p50_ms (thấp hơn là tốt hơn).
+
+Repo không kèm baseline.json (số đo phụ thuộc máy: CPU, số thread, backend
+detector / model). Chạy --save-baseline 1 lần trên máy dùng để so sánh trước;
+chưa có baseline thì chỉ in kết quả, không kiểm tra regression.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_IMAGES = [os.path.join(ROOT, "happy.jpg"), os.path.join(ROOT, "test.jpg")]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+SEED = 0
+
+
+class Skip(Exception):
+    """Case không chạy được trong môi trường hiện tại."""
+
+
+# ==========================
+#   ĐO THỜI GIAN
+# ==========================
+def measure(fn, runs, warmup=1, items=1):
+    """Chạy fn() `runs` lần (sau warmup) -> dict latency (ms) + throughput (items/s)."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    times_ms = sorted(t * 1000.0 for t in times)
+    return {
+        "runs": runs,
+        "mean_ms": statistics.fmean(times_ms),
+        "p50_ms": statistics.median(times_ms),
+        "p95_ms": times_ms[min(len(times_ms) - 1, int(round(0.95 * (len(times_ms) - 1))))],
+        "min_ms": times_ms[0],
+        "throughput": items / statistics.median(times) if times else 0.0,
+    }
+
+
+@contextmanager
+def workdir(path):
+    """output/logs, output/reports là đường dẫn tương đối -> chạy trong thư mục tạm."""
+    old = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+
+# ==========================
+#   DỮ LIỆU
+# ==========================
+class Fixtures:
+    def __init__(self, images, log_rows):
+        self.images = {}
+        for path in images:
+            img = cv2.imread(path)
+            if img is not None:
+                self.images[os.path.basename(path)] = img
+        self.log_rows = log_rows
+        self._detector = None
+        self._model = None
+
+    @property
+    def detector(self):
+        if self._detector is None:
+            from backend.models.face_detector import FaceDetector
+            try:
+                self._detector = FaceDetector()
+            except Exception as e:
+                raise Skip(f"face detector: {e}")
+        return self._detector
+
+    @property
+    def model(self):
+        if self._model is None:
+            from backend.models.emotion_model import EmotionModel
+            try:
+                self._model = EmotionModel()
+            except Exception as e:
+                raise Skip(f"emotion model: {e}")
+        return self._model
+
+    def face_crop(self):
+        """
+        Crop mặt đầu tiên detect được trong happy.jpg; lấy giữa ảnh nếu không
+        thấy mặt hoặc detector không load được (case EmotionModel vẫn chạy).
+        """
+        img = self.images.get("happy.jpg")
+        if img is None:
+            raise Skip("thiếu happy.jpg")
+        try:
+            boxes = self.detector.detect(img)
+        except Skip:
+            boxes = []
+        if boxes:
+            x, y, w, h = boxes[0]
+        else:
+            h, w = img.shape[0] // 3, img.shape[1] // 5
+            x, y = (img.shape[1] - w) // 2, (img.shape[0] - h) // 2
+        return img[y:y + h, x:x + w].copy()
+
+    def multi_face_frame(self, faces=6, size=(1280, 720)):
+        """Khung tổng hợp: `faces` mặt xếp lưới trên nền xám có nhiễu."""
+        face = self.face_crop()
+        width, height = size
+        rng = np.random.default_rng(SEED)
+        frame = rng.integers(90, 140, size=(height, width, 3), dtype=np.uint8)
+
+        cols = int(np.ceil(np.sqrt(faces * width / height)))
+        rows = int(np.ceil(faces / cols))
+        cell_w, cell_h = width // cols, height // rows
+        side = int(min(cell_w, cell_h) * 0.8)
+        tile = cv2.resize(face, (side, side))
+        for i in range(faces):
+            r, c = divmod(i, cols)
+            x = c * cell_w + (cell_w - side) // 2
+            y = r * cell_h + (cell_h - side) // 2
+            frame[y:y + side, x:x + side] = tile
+        return frame
+
+    def log_rows_data(self):
+        rng = np.random.default_rng(SEED)
+        n = self.log_rows
+        ts = 1.7e9 + np.arange(n) * 0.1
+        raw = rng.random(n)
+        smooth = raw.copy()
+        for i in range(1, n):
+            smooth[i] = 0.6 * raw[i] + 0.4 * smooth[i - 1]
+        emotions = np.array(["happy", "neutral", "sad", "surprise", "fear", "angry"])[rng.integers(0, 6, n)]
+        return ts.tolist(), emotions.tolist(), raw.tolist(), smooth.tolist()
+
+
+# ==========================
+#   CÁC CASE
+# ==========================
+def bench_detect(fx, runs):
+    results = {}
+    for name, img in fx.images.items():
+        results[f"detect[{name}]"] = measure(lambda: fx.detector.detect(img), runs)
+    frame = fx.multi_face_frame()
+    results["detect[synthetic_6faces]"] = measure(lambda: fx.detector.detect(frame), runs)
+    return results
+
+
+def bench_preprocess(fx, runs):
+    crops = [fx.face_crop()] * 8
+    return {
+        "preprocess[1]": measure(lambda: fx.model._preprocess(crops[0]), runs * 5),
+        "preprocess[8]": measure(lambda: fx.model.preprocessor(crops), runs * 5, items=8),
+    }
+
+
+def bench_predict(fx, runs):
+    crop = fx.face_crop()
+    crops = [crop] * 8
+    return {
+        "predict[1]": measure(lambda: fx.model.predict(crop), runs),
+        "predict_batch[8]": measure(lambda: fx.model.predict_batch(crops), runs, items=8),
+    }
+
+
+def bench_process_frame(fx, runs):
+    from backend.analysis.smoothing import EngagementSmoother
+    from backend.pipeline.frame_processor import process_frame
+
+    frame = fx.multi_face_frame()
+    smoother = EngagementSmoother()
+    return {
+        "process_frame[synthetic_6faces]": measure(
+            lambda: process_frame(frame, fx.detector, fx.model, smoother), runs),
+    }
+
+
+def bench_log_write(fx, runs, tmp):
+    from backend.storage.log_writer import open_log_writer
+
+    rows = list(zip(*fx.log_rows_data()))
+    results = {}
+    with workdir(tmp):
+        for fmt in ("csv", "columnar"):
+            counter = iter(range(10 ** 9))
+
+            def write_all():
+                log = open_log_writer(f"bench_write_{fmt}_{next(counter)}", fmt=fmt)
+                for row in rows:
+                    log.write(*row)
+                log.close()
+
+            results[f"log_write[{fmt},{len(rows)}]"] = measure(write_all, max(1, runs // 5), items=len(rows))
+    return results
+
+
+def _write_long_log(fx, session_id, fmt):
+    from backend.storage.log_writer import open_log_writer
+
+    log = open_log_writer(session_id, fmt=fmt)
+    for row in zip(*fx.log_rows_data()):
+        log.write(*row)
+    log.close()
+
+
+def bench_report(fx, runs, tmp):
+    from backend.analysis.report_generator import generate_report
+    from backend.storage.log_writer import summary_path
+
+    results = {}
+    with workdir(tmp):
+        for fmt in ("csv", "columnar"):
+            session_id = f"bench_report_{fmt}"
+            _write_long_log(fx, session_id, fmt)
+
+            results[f"generate_report[{fmt},summary]"] = measure(
+                lambda: generate_report(session_id, timeline=False), runs * 5)
+
+            def rebuild():
+                # không có sidecar -> đọc lại cả log
+                if os.path.exists(summary_path(session_id)):
+                    os.remove(summary_path(session_id))
+                generate_report(session_id, timeline=True)
+
+            results[f"generate_report[{fmt},full]"] = measure(rebuild, runs)
+    return results
+
+
+def bench_charts(fx, runs, tmp):
+    from backend.analysis.visualization import create_charts
+
+    with workdir(tmp):
+        session_id = "bench_charts"
+        _write_long_log(fx, session_id, "columnar")
+        return {"create_charts": measure(lambda: create_charts(session_id), max(1, runs // 5))}
+
+
+CASES = {
+    "detect": bench_detect,
+    "preprocess": bench_preprocess,
+    "predict": bench_predict,
+    "process_frame": bench_process_frame,
+    "log_write": bench_log_write,
+    "report": bench_report,
+    "charts": bench_charts,
+}
+NEEDS_TMP = {"log_write", "report", "charts"}
+
+
+# ==========================
+#   BASELINE
+# ==========================
+def compare(results, baseline, threshold, min_delta_ms=0.0):
+    """
+    -> list (tên, p50 baseline, p50 hiện tại, tỉ lệ) của các case chậm hơn ngưỡng.
+    min_delta_ms: bỏ qua chênh lệch tuyệt đối nhỏ (case dưới 1 ms rất nhiễu).
+    """
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base or "p50_ms" not in cur or "p50_ms" not in base:
+            continue
+        ratio = cur["p50_ms"] / base["p50_ms"] if base["p50_ms"] > 0 else 1.0
+        cur["vs_baseline"] = ratio
+        if ratio > 1.0 + threshold and cur["p50_ms"] - base["p50_ms"] > min_delta_ms:
+            regressions.append((name, base["p50_ms"], cur["p50_ms"], ratio))
+    return regressions
+
+
+def environment():
+    import torch
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--images", nargs="+", default=DEFAULT_IMAGES)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--log-rows", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads (cố định để so sánh)")
+    parser.add_argument("--json", help="ghi kết quả ra file json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="ghi kết quả lần này làm baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="chậm hơn baseline quá tỉ lệ này (p50) -> regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="chỉ tính regression khi p50 chậm hơn ít nhất bấy nhiêu ms")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+    cv2.setRNGSeed(SEED)
+
+    fx = Fixtures(args.images, args.log_rows)
+    results = {}
+    skipped = {}
+
+    with tempfile.TemporaryDirectory(prefix="engagement_bench_") as tmp:
+        for name in args.only:
+            case = CASES[name]
+            try:
+                if name in NEEDS_TMP:
+                    results.update(case(fx, args.runs, tmp))
+                else:
+                    results.update(case(fx, args.runs))
+            except Skip as e:
+                skipped[name] = str(e)
+            except Exception as e:
+                traceback.print_exc()
+                skipped[name] = f"error: {e}"
+
+    regressions = []
+    has_baseline = os.path.exists(args.baseline)
+    if not args.save_baseline and has_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f).get("results", {}),
+                                  args.threshold, args.min_delta_ms)
+
+    report = {
+        "environment": environment(),
+        "config": {"runs": args.runs, "log_rows": args.log_rows,
+                   "threshold": args.threshold, "min_delta_ms": args.min_delta_ms},
+        "results": results,
+        "skipped": skipped,
+        "regressions": [
+            {"name": n, "baseline_p50_ms": b, "p50_ms": c, "ratio": r} for n, b, c, r in regressions
+        ],
+    }
+
+    print(f"{'case':40} {'p50 ms':>10} {'p95 ms':>10} {'items/s':>12} {'vs base':>8}")
+    for name, r in results.items():
+        vs = f"{r['vs_baseline']:.2f}x" if "vs_baseline" in r else "-"
+        print(f"{name:40} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['throughput']:>12.1f} {vs:>8}")
+    for name, reason in skipped.items():
+        print(f"[skip] {name}: {reason}")
+    if not args.save_baseline and not has_baseline:
+        print(f"[baseline] chưa có {args.baseline}: chạy --save-baseline trước, lần này không so sánh")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[baseline] đã ghi {args.baseline}")
+
+    if regressions:
+        for name, base, cur, ratio in regressions:
+            print(f"[regression] {name}: {base:.2f} ms -> {cur:.2f} ms ({ratio:.2f}x)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,3 +11,111 @@ SMOOTHING_ALPHA = 0.6
 
 OUTPUT_LOG_DIR = "output/logs/"
 OUTPUT_FIG_DIR = "output/figures/"
+
+# Realtime /analyze_frame: inference chạy trong executor riêng, không chặn event loop
+RT_EXECUTOR = "thread"          # "thread" | "process"
+RT_WORKERS = 2
+RT_MAX_PENDING = 4              # số frame tối đa đang chờ/đang chạy
+RT_OVERLOAD_POLICY = "drop_oldest"  # "drop_oldest" | "reject"
+# detect trên ảnh decode thu nhỏ (JPEG decode thẳng ở 1/2, 1/4, 1/8) rộng ít nhất bấy nhiêu px,
+# crop mặt lấy từ tầng thô nhất mà mặt vẫn >= RT_MIN_CROP_SIZE px. None = decode full-res
+RT_DETECT_WIDTH = 640
+RT_MIN_CROP_SIZE = 96
+# FE thu nhỏ frame về chiều rộng này trước khi gửi (GET /rt_config)
+RT_UPLOAD_MAX_WIDTH = 1280
+RT_UPLOAD_JPEG_QUALITY = 0.7
+
+# EngagementPipeline: "sequential" = 1 thread, "staged" = decode -> detect -> infer -> log
+PIPELINE_MODE = "sequential"    # "sequential" | "staged"
+# "realtime" = bỏ frame để theo kịp nguồn, "offline" = xử lý hết mọi frame
+# None = tự chọn theo mode (webcam -> realtime, video -> offline)
+PIPELINE_POLICY = None
+PIPELINE_STAGE_WORKERS = {"detect": 2, "infer": 1}  # decode / log luôn 1 worker
+PIPELINE_QUEUE_SIZE = 8
+
+# VideoSource: thread nền decode trước tối đa N frame (0 = đọc đồng bộ)
+VIDEO_PREFETCH = 8
+# lấy mẫu frame file video / webcam: chỉ giữ tối đa TARGET_FPS frame/giây
+# và / hoặc 1 trong mỗi STRIDE frame (None = giữ mọi frame)
+VIDEO_TARGET_FPS = None
+VIDEO_STRIDE = None
+
+# Face tracking: chỉ chạy detector đầy đủ mỗi N frame, giữa các lần detect thì dự đoán box
+TRACKER_ENABLED = True
+TRACKER_DETECT_EVERY = 5
+TRACKER_IOU_THRESHOLD = 0.3
+TRACKER_MAX_CENTER_DIST = 0.5   # khoảng cách tâm tối đa, tính theo kích thước box
+TRACKER_MAX_MISSES = 3          # số lần detect liên tiếp không thấy -> xoá track
+
+# Face detector backend: "mtcnn" (chính xác, chậm, cần TensorFlow)
+# | "haar" (Haar cascade có sẵn trong OpenCV) | "ssd" (OpenCV DNN res10 SSD)
+FACE_DETECTOR_BACKEND = "mtcnn"
+# detect trên bản thu nhỏ (chiều rộng tối đa, px), box được scale lại về full-res.
+# None = detect trên frame gốc
+FACE_DETECT_MAX_WIDTH = None
+FACE_HAAR_MODEL = "haarcascade_frontalface_default.xml"
+FACE_SSD_PROTOTXT = "backend/models/face_ssd/deploy.prototxt"
+FACE_SSD_WEIGHTS = "backend/models/face_ssd/res10_300x300_ssd_iter_140000.caffemodel"
+FACE_SSD_CONFIDENCE = 0.5
+
+# EmotionModel: tensor input dạng channels_last (NHWC trong bộ nhớ), thường nhanh hơn trên CPU
+EMOTION_CHANNELS_LAST = False
+# "eager" (PyTorch) | "torchscript" | "onnx" (onnxruntime) | "int8" (dynamic quantization)
+# file .ts / .onnx / .int8.ts tạo bằng: python -m backend.models.export_model
+EMOTION_MODEL_BACKEND = "eager"
+
+# InferenceBatcher: gom crop từ nhiều request / session đồng thời thành 1 lần forward
+INFER_BATCH_ENABLED = True
+INFER_BATCH_WINDOW_MS = 5.0     # chờ thêm request tối đa bấy nhiêu ms sau request đầu tiên
+INFER_BATCH_MAX = 32            # hoặc tới khi đủ bấy nhiêu crop
+
+# Model registry: mỗi model chỉ load 1 lần / process, lần dùng đầu tiên
+MODEL_WARMUP = True             # chạy inference giả ngay sau khi load
+MODEL_WARMUP_RUNS = 2
+# load (+ warmup) model trong thread nền ngay khi server khởi động; /readyz trả 503
+# tới khi xong. False = load ở request đầu tiên dùng tới (/readyz luôn 200)
+MODEL_PRELOAD = True
+
+# SessionEngine: nhiều session video/webcam/realtime chạy đồng thời,
+# các session sequential dùng chung 1 pool worker (round-robin từng frame)
+ENGINE_WORKERS = 4
+ENGINE_MAX_SESSIONS = 16
+ENGINE_SESSION_MAX_FPS = None   # giới hạn fps mỗi session (None = không giới hạn)
+
+# Offline batch: chia video thành các đoạn frame, xử lý song song bằng process pool
+OFFLINE_WORKERS = None          # None = os.cpu_count()
+OFFLINE_SHARDS_PER_WORKER = 2   # số shard = workers * hệ số này (cân bằng tải)
+
+# Định dạng log session: "csv" (mặc định) | "columnar" (cột nhị phân, xem storage/column_log.py)
+LOG_FORMAT = "csv"
+LOG_FLUSH_ROWS = 256        # columnar: flush khi buffer đủ số dòng này
+LOG_FLUSH_INTERVAL = 1.0    # columnar: hoặc sau mỗi khoảng (giây)
+
+# Thống kê chạy dần của session (sidecar <session_id>.summary.json)
+STATS_QUANTILES = (0.5, 0.9)   # quantile P² của eng_smooth, () để tắt
+
+# Biểu đồ: số điểm tối đa của line chart (LTTB downsampling)
+CHART_MAX_POINTS = 2000
+
+# Timeline query: mỗi tầng rollup gộp bấy nhiêu bucket của tầng dưới
+TIMELINE_ROLLUP_FACTOR = 8
+
+# Motion gate: hình gần như không đổi -> dùng lại kết quả lần predict gần nhất
+# None (tắt) | "global" (so cả frame, bỏ qua detect + CNN) | "face" (so từng mặt, bỏ qua CNN)
+MOTION_GATE_MODE = "face"
+MOTION_THRESHOLD = 4.0      # chênh lệch xám trung bình (0..255) dưới ngưỡng = không đổi
+MOTION_MAX_REUSE = 10       # dùng lại tối đa bấy nhiêu frame liên tiếp rồi bắt buộc predict lại
+MOTION_THUMB_WIDTH = 96     # global: so sánh trên ảnh thu nhỏ rộng bấy nhiêu px
+MOTION_FACE_PATCH = 24      # face: so sánh vùng mặt thu về NxN px
+
+# Lưu kết quả từng mặt (track ID, box, vector xác suất, engagement) theo học sinh
+FACE_STORE_ENABLED = True
+
+# Catalog session (SQLite): metadata + summary từng session, truy vấn nhiều session
+CATALOG_ENABLED = True
+CATALOG_PATH = "output/catalog.sqlite3"
+ARCHIVE_DIR = "output/archive/"     # log thô đã nén (python -m backend.storage.catalog compact)
+
+# Metrics (GET /metrics, định dạng Prometheus)
+METRICS_ENABLED = True
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
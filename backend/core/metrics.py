@@ -0,0 +1,283 @@
+"""
+Metrics trong process (histogram / counter / gauge), xuất dạng text của
+Prometheus qua GET /metrics. Không phụ thuộc prometheus_client.
+
+    with stage_timer("detect"):
+        faces = detector.detect(frame)
+
+Mỗi lần observe chỉ là bisect + cộng dưới 1 lock, nên chi phí không đáng kể
+so với detect / forward.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from backend.core.config import METRICS_ENABLED, METRICS_LATENCY_BUCKETS
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(v):
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+        self.fn = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, fn):
+        """Giá trị được đọc lúc scrape (vd. độ sâu queue)."""
+        self.fn = fn
+
+    def render(self, name, labelnames, key):
+        value = self.value
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                value = math.nan
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(value)}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # ô cuối = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts = list(self.counts)
+            total, n = self.sum, self.count
+
+        lines = []
+        cumulative = 0
+        for bound, c in zip(list(self.buckets) + [math.inf], counts):
+            cumulative += c
+            labels = _format_labels(labelnames, key, ("le", _format_value(bound)))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {n}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def set_function(self, fn):
+        self.labels().set_function(fn)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=METRICS_LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._get(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=METRICS_LATENCY_BUCKETS):
+        return self._get(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ==========================
+#   METRICS DÙNG CHUNG CHO HOT PATH
+# ==========================
+STAGE_SECONDS = registry.histogram(
+    "engagement_stage_seconds",
+    "Latency of each processing stage (decode, detect, crop, preprocess, forward, log_write)",
+    ("stage",),
+)
+FACES_PER_FRAME = registry.histogram(
+    "engagement_faces_per_frame",
+    "Number of faces located per frame",
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64),
+)
+FRAMES = registry.counter(
+    "engagement_frames_total",
+    "Frames processed, by source (realtime, pipeline)",
+    ("source",),
+)
+FRAMES_DROPPED = registry.counter(
+    "engagement_frames_dropped_total",
+    "Frames dropped or rejected under load, by where they were dropped",
+    ("where",),
+)
+MOTION_GATE = registry.counter(
+    "engagement_motion_gate_total",
+    "Motion gate decisions (frames_skipped, frames_processed, faces_reused, faces_predicted)",
+    ("result",),
+)
+BATCH_SIZE = registry.histogram(
+    "engagement_infer_batch_size",
+    "Face crops per batched forward pass of the emotion model (InferenceBatcher)",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+BATCH_WAIT = registry.histogram(
+    "engagement_infer_batch_wait_seconds",
+    "Time a request waited in the InferenceBatcher before its forward pass",
+)
+QUEUE_DEPTH = registry.gauge(
+    "engagement_queue_depth",
+    "Items waiting in a queue",
+    ("queue",),
+)
+
+
+@contextmanager
+def stage_timer(stage):
+    """Đo thời gian 1 stage vào STAGE_SECONDS (không làm gì nếu METRICS_ENABLED=False)."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - t0)
+
+
+def observe_faces(n):
+    if METRICS_ENABLED:
+        FACES_PER_FRAME.observe(n)
+
+
+def count_frame(source):
+    if METRICS_ENABLED:
+        FRAMES.labels(source).inc()
+
+
+def count_drop(where, n=1):
+    if METRICS_ENABLED:
+        FRAMES_DROPPED.labels(where).inc(n)
+
+
+def count_gate(result, n=1):
+    if METRICS_ENABLED:
+        MOTION_GATE.labels(result).inc(n)
+
+
+def observe_batch(size, waits):
+    if METRICS_ENABLED:
+        BATCH_SIZE.observe(size)
+        for w in waits:
+            BATCH_WAIT.observe(w)
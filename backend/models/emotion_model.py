@@ -1,81 +1,186 @@
+import logging
 import os
-import cv2
-import numpy as np
 import torch
+import torch.nn as nn
 import torch.nn.functional as F
 
 from .model_emotion import SimpleCNN
 from .emotion_labels import EMOTION_LABELS
+from .preprocess import BatchPreprocessor
+from backend.core.config import EMOTION_CHANNELS_LAST, EMOTION_MODEL_BACKEND
+from backend.core.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+
+# file của từng backend, đặt cạnh best_cnn.pt (tạo bằng backend/models/export_model.py)
+BACKEND_SUFFIXES = {
+    "torchscript": ".ts",
+    "onnx": ".onnx",
+    "int8": ".int8.ts",
+}
+
+
+def variant_path(weight_path, backend):
+    """best_cnn.pt + "onnx" -> best_cnn.onnx"""
+    return os.path.splitext(weight_path)[0] + BACKEND_SUFFIXES[backend]
+
+
+def load_eager_model(weight_path, num_class, device="cpu"):
+    """Load SimpleCNN (eager PyTorch) từ checkpoint best_cnn.pt."""
+    # init model
+    model = SimpleCNN(num_class=num_class).to(device).eval()
+
+    ckpt = torch.load(weight_path, map_location=device)
+
+    # resolve checkpoint format
+    if isinstance(ckpt, dict):
+        if "model_state_dict" in ckpt:
+            state = ckpt["model_state_dict"]
+        elif "state_dict" in ckpt:
+            state = ckpt["state_dict"]
+        elif "model" in ckpt:
+            state = ckpt["model"]
+        else:
+            raise ValueError(f"Checkpoint keys không hợp lệ: {ckpt.keys()}")
+
+        if hasattr(state, "state_dict"):
+            model = state.to(device).eval()
+        else:
+            if any(k.startswith("module.") for k in state):
+                state = {k.replace("module.", "", 1): v for k, v in state.items()}
+            model.load_state_dict(state, strict=True)
+
+    elif hasattr(ckpt, "state_dict"):
+        model = ckpt.to(device).eval()
+
+    else:
+        raise ValueError("Không nhận dạng được format best_cnn.pt")
+
+    # bảo vệ: số label phải khớp output
+    assert num_class == model.fc[-1].out_features
+
+    return model
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization cho các lớp Linear (head fc 6272x512, ...)."""
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxModel:
+    """Bọc onnxruntime.InferenceSession để gọi giống nn.Module: model(x) -> logits."""
+
+    def __init__(self, path):
+        import onnxruntime as ort
+
+        self.session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        # ONNX cần NCHW contiguous
+        logits = self.session.run(None, {self.input_name: x.contiguous().cpu().numpy()})[0]
+        return torch.from_numpy(logits)
 
 
 class EmotionModel:
     """
     predict(face_img) -> (probs_dict, dominant_label)
+    predict_batch([face_img, ...]) -> [(probs_dict, dominant_label), ...]
+
+    backend: "eager" | "torchscript" | "onnx" | "int8" (mặc định EMOTION_MODEL_BACKEND)
     """
 
-    def __init__(self, weight_name="best_cnn.pt", device=None):
+    def __init__(self, weight_name="best_cnn.pt", device=None,
+                 channels_last=EMOTION_CHANNELS_LAST, backend=None):
         self.labels = EMOTION_LABELS
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.backend = backend or EMOTION_MODEL_BACKEND
 
         weight_path = os.path.join(os.path.dirname(__file__), weight_name)
 
-        # init model
-        self.model = SimpleCNN(num_class=len(self.labels)).to(self.device).eval()
-
-        ckpt = torch.load(weight_path, map_location=self.device)
+        if self.backend == "eager":
+            self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+            self.model = load_eager_model(weight_path, len(self.labels), self.device)
 
-        # resolve checkpoint format
-        if isinstance(ckpt, dict):
-            if "model_state_dict" in ckpt:
-                state = ckpt["model_state_dict"]
-            elif "state_dict" in ckpt:
-                state = ckpt["state_dict"]
-            elif "model" in ckpt:
-                state = ckpt["model"]
-            else:
-                raise ValueError(f"Checkpoint keys không hợp lệ: {ckpt.keys()}")
+        elif self.backend == "torchscript":
+            self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+            self.model = torch.jit.load(variant_path(weight_path, "torchscript"), map_location=self.device).eval()
 
-            if hasattr(state, "state_dict"):
-                self.model = state.to(self.device).eval()
+        elif self.backend == "int8":
+            # quantized chỉ chạy trên CPU
+            self.device = "cpu"
+            path = variant_path(weight_path, "int8")
+            if os.path.exists(path):
+                self.model = torch.jit.load(path, map_location="cpu").eval()
             else:
-                if any(k.startswith("module.") for k in state):
-                    state = {k.replace("module.", "", 1): v for k, v in state.items()}
-                self.model.load_state_dict(state, strict=True)
+                # chưa export -> quantize ngay khi load
+                self.model = quantize_int8(load_eager_model(weight_path, len(self.labels)))
 
-        elif hasattr(ckpt, "state_dict"):
-            self.model = ckpt.to(self.device).eval()
+        elif self.backend == "onnx":
+            self.device = "cpu"
+            self.model = OnnxModel(variant_path(weight_path, "onnx"))
+            channels_last = False
 
         else:
-            raise ValueError("Không nhận dạng được format best_cnn.pt")
+            raise ValueError(f"EMOTION_MODEL_BACKEND không hợp lệ: {self.backend}")
+
+        if channels_last:
+            self.model = self.model.to(memory_format=torch.channels_last)
 
-        # bảo vệ: số label phải khớp output
-        assert len(self.labels) == self.model.fc[-1].out_features
+        # buffer input dùng lại giữa các frame (mỗi thread 1 bộ)
+        self.preprocessor = BatchPreprocessor(size=224, channels_last=channels_last)
 
     @torch.inference_mode()
     def predict(self, face_img):
         try:
-            x = self._preprocess(face_img).to(self.device)
-            logits = self.model(x)
-            probs_t = F.softmax(logits, dim=1)[0]
+            with stage_timer("preprocess"):
+                x = self._preprocess(face_img).to(self.device)
+            with stage_timer("forward"):
+                logits = self.model(x)
+                probs_t = F.softmax(logits, dim=1)[0]
 
             probs = {self.labels[i]: float(probs_t[i]) for i in range(len(self.labels))}
             dominant = max(probs, key=probs.get)
             return probs, dominant
 
-        except Exception as e:
-            print("[EmotionModel error]", e)
+        except Exception:
+            logger.exception("[EmotionModel] predict lỗi")
             return None, None
 
+    @torch.inference_mode()
+    def predict_batch(self, face_imgs):
+        """
+        Dự đoán cho nhiều mặt trong cùng 1 frame bằng 1 lần forward duy nhất.
+        Trả về list cùng thứ tự với face_imgs; crop lỗi -> (None, None).
+        """
+        results = [(None, None)] * len(face_imgs)
+
+        valid_idx = [
+            i for i, img in enumerate(face_imgs)
+            if img is not None and img.size > 0
+        ]
+        if not valid_idx:
+            return results
+
+        try:
+            with stage_timer("preprocess"):
+                x = self.preprocessor([face_imgs[i] for i in valid_idx]).to(self.device)
+            with stage_timer("forward"):
+                logits = self.model(x)
+                probs_t = F.softmax(logits, dim=1).cpu().numpy()
+        except Exception:
+            logger.exception("[EmotionModel] predict_batch lỗi")
+            return results
+
+        for row, i in zip(probs_t, valid_idx):
+            probs = {label: float(p) for label, p in zip(self.labels, row)}
+            dominant = max(probs, key=probs.get)
+            results[i] = (probs, dominant)
+
+        return results
+
     def _preprocess(self, img):
         if img is None:
             raise ValueError("face_img is None")
 
-        if len(img.shape) == 2:
-            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (224, 224), interpolation=cv2.INTER_AREA)
-        img = img.astype(np.float32) / 255.0
-        img = np.transpose(img, (2, 0, 1))
-
-        return torch.from_numpy(img).unsqueeze(0)
+        return self.preprocessor([img])
@@ -0,0 +1,136 @@
+"""
+Export best_cnn.pt sang các backend inference nhanh hơn + kiểm tra độ lệch.
+
+    python -m backend.models.export_model
+    python -m backend.models.export_model --formats int8 onnx --images happy.jpg test.jpg
+
+Tạo cạnh file weight:
+    best_cnn.ts       TorchScript (trace + freeze)
+    best_cnn.onnx     ONNX (batch size động), chạy bằng onnxruntime
+    best_cnn.int8.ts  TorchScript của model đã dynamic int8 quantization (Linear)
+
+Sau khi export, kiểm tra parity: chạy cùng các ảnh qua eager và từng backend,
+báo độ lệch xác suất lớn nhất, tỉ lệ trùng nhãn và thời gian 1 batch.
+Chọn backend khi chạy bằng EMOTION_MODEL_BACKEND trong core/config.py.
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+import torch
+
+from backend.models.emotion_labels import EMOTION_LABELS
+from backend.models.emotion_model import (
+    EmotionModel,
+    load_eager_model,
+    quantize_int8,
+    variant_path,
+)
+
+FORMATS = ["torchscript", "onnx", "int8"]
+DEFAULT_IMAGES = ["happy.jpg", "test.jpg"]
+
+
+def export(model, fmt, path):
+    example = torch.rand(1, 3, 224, 224)
+
+    with torch.inference_mode():
+        if fmt == "torchscript":
+            traced = torch.jit.freeze(torch.jit.trace(model, example))
+            traced.save(path)
+
+        elif fmt == "int8":
+            traced = torch.jit.trace(quantize_int8(model), example)
+            traced.save(path)
+
+    if fmt == "onnx":
+        torch.onnx.export(
+            model,
+            example,
+            path,
+            input_names=["input"],
+            output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17,
+        )
+
+
+def sample_crops(images, per_image=8, seed=0):
+    """Ảnh gốc + vài crop ngẫu nhiên từ mỗi ảnh, làm input cho parity check."""
+    rng = np.random.default_rng(seed)
+    crops = []
+    for path in images:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"[skip] không đọc được ảnh {path}")
+            continue
+        crops.append(img)
+        h, w = img.shape[:2]
+        for _ in range(per_image):
+            size = int(rng.integers(min(h, w) // 8, min(h, w) // 2))
+            y = int(rng.integers(0, h - size))
+            x = int(rng.integers(0, w - size))
+            crops.append(img[y:y + size, x:x + size])
+    return crops
+
+
+def probs_matrix(model, crops):
+    preds = model.predict_batch(crops)
+    return np.array([[p[label] for label in EMOTION_LABELS] for p, _ in preds])
+
+
+def timed(model, crops, runs=5):
+    model.predict_batch(crops)  # warmup
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        model.predict_batch(crops)
+    return (time.perf_counter() - t0) / runs * 1000.0
+
+
+def parity(weight_name, backends, crops):
+    eager = EmotionModel(weight_name, device="cpu", backend="eager")
+    ref = probs_matrix(eager, crops)
+
+    print(f"{'backend':12} {'max |dp|':>10} {'label match':>12} {'batch ms':>10}")
+    print(f"{'eager':12} {0.0:>10.2e} {1.0:>12.2%} {timed(eager, crops):>10.1f}")
+
+    for backend in backends:
+        try:
+            model = EmotionModel(weight_name, device="cpu", backend=backend)
+        except Exception as e:
+            print(f"{backend:12} [skip] {e}")
+            continue
+
+        out = probs_matrix(model, crops)
+        drift = float(np.abs(out - ref).max())
+        match = float((out.argmax(1) == ref.argmax(1)).mean())
+        print(f"{backend:12} {drift:>10.2e} {match:>12.2%} {timed(model, crops):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default="best_cnn.pt", help="tên file trong backend/models/ hoặc đường dẫn")
+    parser.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS)
+    parser.add_argument("--images", nargs="+", default=DEFAULT_IMAGES)
+    parser.add_argument("--no-check", action="store_true", help="bỏ qua parity check")
+    args = parser.parse_args()
+
+    weight_path = os.path.join(os.path.dirname(__file__), args.weights)
+    model = load_eager_model(weight_path, len(EMOTION_LABELS))
+
+    for fmt in args.formats:
+        path = variant_path(weight_path, fmt)
+        try:
+            export(model, fmt, path)
+            print(f"[ok] {fmt}: {path}")
+        except Exception as e:
+            print(f"[fail] {fmt}: {e}")
+
+    if not args.no_check:
+        parity(args.weights, args.formats, sample_crops(args.images))
+
+
+if __name__ == "__main__":
+    main()
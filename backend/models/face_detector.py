@@ -1,19 +1,142 @@
-from mtcnn import MTCNN
+import os
+import threading
+
+import cv2
+
+from backend.core.config import (
+    FACE_DETECTOR_BACKEND,
+    FACE_DETECT_MAX_WIDTH,
+    FACE_HAAR_MODEL,
+    FACE_SSD_PROTOTXT,
+    FACE_SSD_WEIGHTS,
+    FACE_SSD_CONFIDENCE,
+)
+
+
+# ==========================
+#   BACKENDS
+#   detect(frame) -> [(x, y, w, h), ...] trên đúng ảnh được truyền vào
+# ==========================
+class MTCNNBackend:
+    name = "mtcnn"
 
-class FaceDetector:
     def __init__(self):
+        # import lazy: mtcnn kéo theo TensorFlow
+        from mtcnn import MTCNN
         self.detector = MTCNN()
 
     def detect(self, frame):
+        faces = self.detector.detect_faces(frame)
+        return [tuple(f.get("box", (0, 0, 0, 0))) for f in faces]
+
+
+class HaarBackend:
+    name = "haar"
+
+    def __init__(self, model=FACE_HAAR_MODEL):
+        path = model if os.path.exists(model) else os.path.join(cv2.data.haarcascades, model)
+        self.detector = cv2.CascadeClassifier(path)
+        if self.detector.empty():
+            raise FileNotFoundError(f"Không load được Haar cascade: {path}")
+
+    def detect(self, frame):
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.equalizeHist(gray)
+        faces = self.detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(24, 24))
+        return [tuple(int(v) for v in f) for f in faces]
+
+
+class SSDBackend:
+    name = "ssd"
+
+    def __init__(self, prototxt=FACE_SSD_PROTOTXT, weights=FACE_SSD_WEIGHTS,
+                 confidence=FACE_SSD_CONFIDENCE):
+        for path in (prototxt, weights):
+            if not os.path.exists(path):
+                raise FileNotFoundError(
+                    f"Thiếu file model SSD: {path} "
+                    "(lấy từ opencv/samples/dnn/face_detector)"
+                )
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, weights)
+        self.confidence = confidence
+
+    def detect(self, frame):
+        h, w = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(
+            cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0)
+        )
+        self.net.setInput(blob)
+        out = self.net.forward()  # (1, 1, N, 7): _, _, conf, x0, y0, x1, y1 (tỉ lệ)
+
+        boxes = []
+        for det in out[0, 0]:
+            if float(det[2]) < self.confidence:
+                continue
+            x0, y0 = int(det[3] * w), int(det[4] * h)
+            x1, y1 = int(det[5] * w), int(det[6] * h)
+            boxes.append((x0, y0, x1 - x0, y1 - y0))
+        return boxes
+
+
+BACKENDS = {
+    "mtcnn": MTCNNBackend,
+    "haar": HaarBackend,
+    "ssd": SSDBackend,
+}
+
+
+class FaceDetector:
+    """
+    detect(frame) -> [(x, y, w, h), ...] theo toạ độ frame gốc.
+
+    backend: "mtcnn" | "haar" | "ssd" (mặc định FACE_DETECTOR_BACKEND)
+    max_width: nếu frame rộng hơn thì detect trên bản thu nhỏ rồi scale
+               box ngược lại, crop vẫn lấy từ frame full-res.
+    """
+
+    def __init__(self, backend=None, max_width=FACE_DETECT_MAX_WIDTH):
+        backend = backend or FACE_DETECTOR_BACKEND
+        if backend not in BACKENDS:
+            raise ValueError(f"Face detector backend không hợp lệ: {backend}")
+
+        self.backend = BACKENDS[backend]()
+        self.max_width = max_width
+
+        # MTCNN / CascadeClassifier / cv2.dnn.Net không đảm bảo thread-safe,
+        # mà 1 instance được dùng chung qua ModelRegistry
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def detect(self, frame):
+        frame_h, frame_w = frame.shape[:2]
+
+        scale = 1.0
+        image = frame
+        if self.max_width and frame_w > self.max_width:
+            scale = self.max_width / frame_w
+            image = cv2.resize(frame, (self.max_width, max(1, int(round(frame_h * scale)))),
+                               interpolation=cv2.INTER_AREA)
+
         try:
-            faces = self.detector.detect_faces(frame)
+            with self._lock:
+                faces = self.backend.detect(image)
         except Exception:
-            # nếu MTCNN lỗi thì coi như không có mặt
+            # nếu detector lỗi thì coi như không có mặt
             return []
 
         boxes = []
-        for f in faces:
-            x, y, w, h = f.get("box", (0, 0, 0, 0))
+        for x, y, w, h in faces:
+            if scale != 1.0:
+                x, y = int(round(x / scale)), int(round(y / scale))
+                w, h = int(round(w / scale)), int(round(h / scale))
+
+            # giữ box trong frame (MTCNN có thể trả toạ độ âm)
+            x0, y0 = max(0, x), max(0, y)
+            x1, y1 = min(frame_w, x + w), min(frame_h, y + h)
+            x, y, w, h = x0, y0, x1 - x0, y1 - y0
 
             # bỏ những box lỗi / size âm
             if w <= 0 or h <= 0:
@@ -0,0 +1,184 @@
+import threading
+
+from backend.core.config import (
+    TRACKER_DETECT_EVERY,
+    TRACKER_IOU_THRESHOLD,
+    TRACKER_MAX_CENTER_DIST,
+    TRACKER_MAX_MISSES,
+)
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0.0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0.0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def center_distance(a, b):
+    """Khoảng cách tâm 2 box, chuẩn hoá theo kích thước box a."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    dx = (ax + aw / 2) - (bx + bw / 2)
+    dy = (ay + ah / 2) - (by + bh / 2)
+    scale = max(aw, ah, 1.0)
+    return (dx * dx + dy * dy) ** 0.5 / scale
+
+
+class Track:
+    def __init__(self, track_id, box, frame_idx):
+        self.id = track_id
+        self.box = tuple(float(v) for v in box)
+        self.vx = 0.0
+        self.vy = 0.0
+        self.misses = 0
+        self.last_detect_box = self.box
+        self.last_detect_frame = frame_idx
+
+    def predict(self):
+        """Dịch box theo vận tốc (constant velocity) cho frame tiếp theo."""
+        x, y, w, h = self.box
+        self.box = (x + self.vx, y + self.vy, w, h)
+
+    def correct(self, box, frame_idx):
+        """Cập nhật box từ detection mới + ước lượng lại vận tốc."""
+        box = tuple(float(v) for v in box)
+        frames = max(1, frame_idx - self.last_detect_frame)
+        px, py, _, _ = self.last_detect_box
+        # làm mượt vận tốc để tránh box giật khi detector rung
+        self.vx = 0.5 * self.vx + 0.5 * (box[0] - px) / frames
+        self.vy = 0.5 * self.vy + 0.5 * (box[1] - py) / frames
+        self.box = box
+        self.misses = 0
+        self.last_detect_box = box
+        self.last_detect_frame = frame_idx
+
+
+class FaceTracker:
+    """
+    Bọc FaceDetector để gán ID ổn định cho từng mặt:
+
+        track(frame) -> [(track_id, (x, y, w, h)), ...]
+        detect(frame) -> [(x, y, w, h), ...]   (giống FaceDetector)
+
+    Detector đầy đủ chỉ chạy mỗi detect_every frame, hoặc ngay khi có
+    track bị mất / chưa có track nào. Các frame ở giữa chỉ dự đoán box
+    theo vận tốc (không gọi detector).
+    """
+
+    def __init__(self, face_detector, detect_every=TRACKER_DETECT_EVERY,
+                 iou_threshold=TRACKER_IOU_THRESHOLD,
+                 max_center_dist=TRACKER_MAX_CENTER_DIST,
+                 max_misses=TRACKER_MAX_MISSES):
+        self.face_detector = face_detector
+        self.detect_every = max(1, detect_every)
+        self.iou_threshold = iou_threshold
+        self.max_center_dist = max_center_dist
+        self.max_misses = max_misses
+
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.tracks = []
+            self.next_id = 1
+            self.frame_idx = 0
+            self.last_detect_frame = None
+            self.detections = 0
+
+    def detect(self, frame):
+        return [box for _, box in self.track(frame)]
+
+    def track(self, frame):
+        with self._lock:
+            self.frame_idx += 1
+            frame_h, frame_w = frame.shape[:2]
+
+            for t in self.tracks:
+                t.predict()
+
+            if self._need_detect(frame_w, frame_h):
+                boxes = self.face_detector.detect(frame)
+                self._associate(boxes)
+                self.last_detect_frame = self.frame_idx
+                self.detections += 1
+
+            return [
+                (t.id, self._clip(t.box, frame_w, frame_h))
+                for t in self.tracks
+                if t.misses == 0
+            ]
+
+    def _need_detect(self, frame_w, frame_h):
+        if not self.tracks or self.last_detect_frame is None:
+            return True
+
+        if self.frame_idx - self.last_detect_frame >= self.detect_every:
+            return True
+
+        for t in self.tracks:
+            # track đang bị mất -> detect lại ngay
+            if t.misses > 0:
+                return True
+
+            # box dự đoán đã trôi ra khỏi frame
+            x, y, w, h = t.box
+            if x + w <= 0 or y + h <= 0 or x >= frame_w or y >= frame_h:
+                return True
+
+        return False
+
+    def _associate(self, boxes):
+        """Ghép detection với track: IoU trước, sau đó khoảng cách tâm."""
+        unmatched_tracks = list(range(len(self.tracks)))
+        unmatched_boxes = list(range(len(boxes)))
+
+        for score_fn, accept in (
+            (lambda t, b: iou(t.box, b), lambda s: s >= self.iou_threshold),
+            (lambda t, b: -center_distance(t.box, b), lambda s: -s <= self.max_center_dist),
+        ):
+            pairs = []
+            for ti in unmatched_tracks:
+                for bi in unmatched_boxes:
+                    score = score_fn(self.tracks[ti], boxes[bi])
+                    if accept(score):
+                        pairs.append((score, ti, bi))
+
+            # greedy: cặp tốt nhất trước
+            pairs.sort(reverse=True)
+            for _, ti, bi in pairs:
+                if ti in unmatched_tracks and bi in unmatched_boxes:
+                    self.tracks[ti].correct(boxes[bi], self.frame_idx)
+                    unmatched_tracks.remove(ti)
+                    unmatched_boxes.remove(bi)
+
+        for ti in unmatched_tracks:
+            self.tracks[ti].misses += 1
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for bi in unmatched_boxes:
+            self.tracks.append(Track(self.next_id, boxes[bi], self.frame_idx))
+            self.next_id += 1
+
+    @staticmethod
+    def _clip(box, frame_w, frame_h):
+        x, y, w, h = box
+        x0 = int(round(min(max(x, 0), frame_w)))
+        y0 = int(round(min(max(y, 0), frame_h)))
+        x1 = int(round(min(max(x + w, 0), frame_w)))
+        y1 = int(round(min(max(y + h, 0), frame_h)))
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "frames": self.frame_idx,
+                "detections": self.detections,
+                "active_tracks": sum(1 for t in self.tracks if t.misses == 0),
+                "lost_tracks": sum(1 for t in self.tracks if t.misses > 0),
+            }
@@ -0,0 +1,164 @@
+"""
+Gom crop mặt từ nhiều request / session chạy đồng thời thành 1 lần forward:
+
+    batcher = InferenceBatcher(get_emotion_model())
+    batcher.predict_batch(crops)   # cùng interface EmotionModel, block tới khi có kết quả
+
+1 thread nền lấy request đầu hàng đợi, chờ thêm tối đa window_ms (hoặc tới khi
+đủ max_batch crop), chạy model.predict_batch 1 lần cho tất cả rồi trả phần kết
+quả của từng caller. CPU chạy batch 16-32 nhanh hơn nhiều so với từng batch 1.
+"""
+import threading
+import time
+from collections import deque, Counter
+
+from backend.core.config import INFER_BATCH_WINDOW_MS, INFER_BATCH_MAX
+from backend.core.metrics import observe_batch
+
+
+class _Request:
+    __slots__ = ("crops", "enqueued", "done", "results", "error")
+
+    def __init__(self, crops):
+        self.crops = crops
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+def _size_bucket(n):
+    """1, 2-3, 4-7, 8-15, ... để xem phân bố cỡ batch."""
+    low = 1 << (n.bit_length() - 1)
+    return str(low) if low == 1 else f"{low}-{2 * low - 1}"
+
+
+class InferenceBatcher:
+    def __init__(self, model, window_ms=INFER_BATCH_WINDOW_MS, max_batch=INFER_BATCH_MAX):
+        self.model = model
+        self.labels = model.labels
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+
+        self._queue = deque()
+        self._queued_crops = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.requests = 0
+        self.batches = 0
+        self.crops = 0
+        self.sizes = Counter()
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+        self._thread = threading.Thread(target=self._loop, name="infer-batcher", daemon=True)
+        self._thread.start()
+
+    # ==========================
+    #   INTERFACE GIỐNG EmotionModel
+    # ==========================
+    def predict_batch(self, face_imgs):
+        if not face_imgs:
+            return []
+
+        req = _Request(list(face_imgs))
+        with self._cond:
+            if self._closed:
+                return self.model.predict_batch(face_imgs)
+            self._queue.append(req)
+            self._queued_crops += len(req.crops)
+            self._cond.notify()
+
+        req.done.wait()
+        if req.error is not None:
+            raise req.error
+        return req.results
+
+    def predict(self, face_img):
+        return self.predict_batch([face_img])[0]
+
+    # ==========================
+    #   THREAD NỀN
+    # ==========================
+    def _collect(self):
+        """Đợi request đầu tiên, gom thêm trong cửa sổ thời gian -> list request (rỗng khi đóng)."""
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return []
+                self._cond.wait()
+
+            deadline = self._queue[0].enqueued + self.window
+            while self._queued_crops < self.max_batch and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # luôn lấy ít nhất 1 request (kể cả khi 1 request đã vượt max_batch)
+            batch = [self._queue.popleft()]
+            size = len(batch[0].crops)
+            while self._queue and size + len(self._queue[0].crops) <= self.max_batch:
+                req = self._queue.popleft()
+                batch.append(req)
+                size += len(req.crops)
+            self._queued_crops -= size
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+
+            started = time.perf_counter()
+            crops = [crop for req in batch for crop in req.crops]
+            try:
+                results = self.model.predict_batch(crops)
+            except Exception as e:
+                results = None
+                for req in batch:
+                    req.error = e
+
+            start = 0
+            for req in batch:
+                if results is not None:
+                    req.results = results[start:start + len(req.crops)]
+                start += len(req.crops)
+                req.done.set()
+
+            self._record(batch, len(crops), started)
+
+    def _record(self, batch, size, started):
+        waits = [started - req.enqueued for req in batch]
+        with self._cond:
+            self.requests += len(batch)
+            self.batches += 1
+            self.crops += size
+            self.sizes[_size_bucket(size)] += 1
+            self.wait_total += sum(waits)
+            self.wait_max = max(self.wait_max, *waits)
+        observe_batch(size, waits)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "window_ms": self.window * 1000.0,
+                "max_batch": self.max_batch,
+                "queue_depth": len(self._queue),
+                "requests": self.requests,
+                "batches": self.batches,
+                "crops": self.crops,
+                "avg_batch": self.crops / self.batches if self.batches else 0.0,
+                "requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+                "batch_sizes": dict(sorted(self.sizes.items(), key=lambda kv: int(kv[0].split("-")[0]))),
+                "avg_wait_ms": self.wait_total / self.requests * 1000.0 if self.requests else 0.0,
+                "max_wait_ms": self.wait_max * 1000.0,
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -39,5 +39,5 @@ class SimpleCNN(nn.Module):
         x = self.conv3(x)
         x = self.conv4(x)
         x = self.conv5(x)
-        x = x.view(x.shape[0], -1)
+        x = x.reshape(x.shape[0], -1)  # reshape: cũng chạy được với channels_last
         return self.fc(x)
@@ -0,0 +1,70 @@
+import threading
+
+import cv2
+import numpy as np
+import torch
+
+
+class BatchPreprocessor:
+    """
+    list crop BGR (hoặc gray) -> tensor (N, 3, size, size) float32 trong [0, 1].
+
+    Không cấp phát lại mỗi frame: mỗi thread giữ 1 buffer uint8 (N, size, size, 3)
+    và 1 tensor input (N, 3, size, size), chỉ nới rộng khi batch lớn hơn.
+    Resize ghi thẳng vào buffer, đổi BGR -> RGB tại chỗ, rồi chuẩn hoá
+    thẳng vào tensor input của model (tuỳ chọn layout channels_last).
+
+    Tensor trả về là view vào buffer dùng chung của thread hiện tại:
+    phải dùng xong (forward) trước lần gọi tiếp theo trên cùng thread.
+    """
+
+    def __init__(self, size=224, channels_last=False, capacity=8):
+        self.size = size
+        self.channels_last = channels_last
+        self.capacity = capacity
+        self._local = threading.local()
+
+    def _buffers(self, n):
+        local = self._local
+        staging = getattr(local, "staging", None)
+
+        if staging is None or staging.shape[0] < n:
+            cap = max(n, self.capacity if staging is None else 2 * staging.shape[0])
+            s = self.size
+
+            local.staging = np.empty((cap, s, s, 3), dtype=np.uint8)
+            local.gray = np.empty((s, s), dtype=np.uint8)
+
+            tensor = torch.empty((cap, 3, s, s), dtype=torch.float32)
+            if self.channels_last:
+                tensor = tensor.contiguous(memory_format=torch.channels_last)
+            local.tensor = tensor
+
+        return local.staging, local.gray, local.tensor
+
+    def __call__(self, crops):
+        n = len(crops)
+        if n == 0:
+            raise ValueError("crops rỗng")
+
+        staging, gray, tensor = self._buffers(n)
+        size = (self.size, self.size)
+
+        for i, img in enumerate(crops):
+            if img is None or img.size == 0:
+                raise ValueError("face_img rỗng")
+
+            dst = staging[i]
+            if img.ndim == 2:
+                cv2.resize(img, size, dst=gray, interpolation=cv2.INTER_AREA)
+                cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB, dst=dst)
+            else:
+                # resize trước rồi mới đổi màu: chỉ đổi màu trên ảnh 224x224
+                cv2.resize(img, size, dst=dst, interpolation=cv2.INTER_AREA)
+                cv2.cvtColor(dst, cv2.COLOR_BGR2RGB, dst=dst)
+
+        # NHWC uint8 -> NCHW float32: permute chỉ là view, copy_ ghi thẳng vào tensor input
+        out = tensor[:n]
+        out.copy_(torch.from_numpy(staging[:n]).permute(0, 3, 1, 2))
+        out.mul_(1.0 / 255.0)
+        return out
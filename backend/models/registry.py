@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from backend.core.config import MODEL_WARMUP, MODEL_WARMUP_RUNS, INFER_BATCH_ENABLED
+
+logger = logging.getLogger(__name__)
+
+
+def _load_face_detector():
+    from backend.models.face_detector import FaceDetector
+    return FaceDetector()
+
+
+def _load_emotion_model():
+    from backend.models.emotion_model import EmotionModel
+    return EmotionModel()
+
+
+def _warmup_face_detector(model):
+    model.detect(np.zeros((480, 640, 3), dtype=np.uint8))
+
+
+def _warmup_emotion_model(model):
+    # batch > 1 để cấp phát sẵn buffer preprocess cho cỡ batch thường gặp
+    model.predict_batch([np.zeros((224, 224, 3), dtype=np.uint8)] * 4)
+
+
+class ModelRegistry:
+    """
+    Giữ 1 instance duy nhất cho mỗi model trong process.
+
+    Model được load ở lần get() đầu tiên (thread-safe, load đúng 1 lần),
+    chạy warmup nếu MODEL_WARMUP, và ghi lại thời gian load / warmup.
+    Dùng chung cho /analyze_frame, EngagementPipeline và các worker.
+    """
+
+    def __init__(self, warmup=MODEL_WARMUP, warmup_runs=MODEL_WARMUP_RUNS):
+        self.warmup = warmup
+        self.warmup_runs = warmup_runs
+
+        self._factories = {
+            "face_detector": (_load_face_detector, _warmup_face_detector),
+            "emotion_model": (_load_emotion_model, _warmup_emotion_model),
+        }
+        self._models = {}
+        self._locks = {name: threading.Lock() for name in self._factories}
+        self.timings = {}
+        self.errors = {}
+        self._loading = set()
+        self._preload = None    # thread load nền (preload())
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        # lock riêng từng model: load detector không chặn load CNN
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                # "loading" gồm cả warmup (xem state())
+                self._loading.add(name)
+                try:
+                    model = self._load(name)
+                    self._models[name] = model
+                except Exception as e:
+                    self.errors[name] = f"{type(e).__name__}: {e}"
+                    raise
+                finally:
+                    self._loading.discard(name)
+            return model
+
+    def _load(self, name):
+        factory, warmup = self._factories[name]
+
+        t0 = time.perf_counter()
+        model = factory()
+        load_ms = (time.perf_counter() - t0) * 1000.0
+
+        warmup_ms = 0.0
+        if self.warmup:
+            t0 = time.perf_counter()
+            for _ in range(self.warmup_runs):
+                warmup(model)
+            warmup_ms = (time.perf_counter() - t0) * 1000.0
+
+        self.errors.pop(name, None)
+        self.timings[name] = {"load_ms": load_ms, "warmup_ms": warmup_ms}
+        logger.info("[ModelRegistry] %s loaded in %.0f ms (warmup %.0f ms)", name, load_ms, warmup_ms)
+        return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    # ==========================
+    #   LOAD NỀN LÚC KHỞI ĐỘNG
+    # ==========================
+    def preload(self, names=None):
+        """
+        Load (+ warmup) các model trong 1 thread nền, trả về ngay.
+        Request tới trước khi load xong vẫn dùng get() như thường (chờ lock
+        của model đó), không load lần 2.
+        """
+        if self._preload is not None:
+            return self._preload
+        names = list(names or self._factories)
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    logger.exception("[ModelRegistry] preload %s failed", name)
+
+        self._preload = threading.Thread(target=run, name="model-preload", daemon=True)
+        self._preload.start()
+        return self._preload
+
+    def state(self, name):
+        """"ready" | "loading" | "error" | "pending"."""
+        if name in self._models:
+            return "ready"
+        if name in self._loading:
+            return "loading"
+        if name in self.errors:
+            return "error"
+        return "pending"
+
+    def ready(self):
+        return all(name in self._models for name in self._factories)
+
+    def stats(self):
+        out = {}
+        for name in self._factories:
+            out[name] = {"loaded": name in self._models, "state": self.state(name),
+                         **self.timings.get(name, {})}
+            if name in self.errors:
+                out[name]["error"] = self.errors[name]
+        return out
+
+
+registry = ModelRegistry()
+
+
+def get_face_detector():
+    return registry.get("face_detector")
+
+
+def get_emotion_model():
+    return registry.get("emotion_model")
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_emotion_predictor():
+    """
+    Model emotion cho serving (realtime / session): InferenceBatcher dùng chung
+    trong process nếu INFER_BATCH_ENABLED, không thì chính EmotionModel.
+    """
+    global _batcher
+    if not INFER_BATCH_ENABLED:
+        return get_emotion_model()
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                from backend.models.inference_batcher import InferenceBatcher
+                _batcher = InferenceBatcher(get_emotion_model())
+    return _batcher
+
+
+def batcher_stats():
+    return _batcher.stats() if _batcher is not None else None
+
+
+def shutdown_batcher():
+    global _batcher
+    with _batcher_lock:
+        if _batcher is not None:
+            _batcher.shutdown()
+            _batcher = None
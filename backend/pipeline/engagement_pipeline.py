@@ -1,11 +1,20 @@
-import time
 from backend.pipeline.video_source import VideoSource
 from backend.pipeline.frame_processor import process_frame
-from backend.models.face_detector import FaceDetector
-from backend.models.emotion_model import EmotionModel
+from backend.pipeline.staged_pipeline import StagedRunner
+from backend.pipeline.motion_gate import make_motion_gate
+from backend.models.face_tracker import FaceTracker
+from backend.models.registry import get_face_detector, get_emotion_predictor
 from backend.analysis.smoothing import EngagementSmoother
-from backend.storage.log_writer import LogWriter
+from backend.storage.log_writer import open_log_writer
+from backend.core.metrics import stage_timer, count_frame
 from backend.utils.file_utils import ensure_dir
+from backend.core.config import (
+    PIPELINE_MODE,
+    PIPELINE_POLICY,
+    PIPELINE_STAGE_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    TRACKER_ENABLED,
+)
 
 class EngagementPipeline:
 
@@ -15,23 +24,77 @@ class EngagementPipeline:
         self.source = None
         self.log = None
 
-        self.face_detector = FaceDetector()
-        self.emotion_model = EmotionModel()
+        self.pipeline_mode = PIPELINE_MODE
+        self.policy = None
+        self.runner = None
+        self.frames = 0
+
+        # model dùng chung qua ModelRegistry, chỉ lấy khi start() lần đầu
+        self.face_detector = None
+        self.emotion_model = None
         self.smoother = EngagementSmoother()
+        self.tracker = None
+        # frame / mặt không đổi -> dùng lại kết quả cũ (None nếu tắt)
+        self.gate = make_motion_gate()
+
+    def _locator(self):
+        """Detector dùng cho process_frame: tracker nếu bật, không thì detector gốc."""
+        return self.tracker or self.face_detector
 
-    def start(self, session_id, mode, video_path):
+    def start(self, session_id, mode, video_path, pipeline_mode=None, policy=None, source_options=None):
         self.current_session = session_id
+        self.pipeline_mode = pipeline_mode or PIPELINE_MODE
+        self.frames = 0
+
+        if self.face_detector is None:
+            self.face_detector = get_face_detector()
+            # batcher dùng chung: gom crop của nhiều session chạy đồng thời
+            self.emotion_model = get_emotion_predictor()
+
+            # tracker gán ID ổn định + chỉ detect mỗi N frame
+            if TRACKER_ENABLED:
+                self.tracker = FaceTracker(self.face_detector)
+
+        if self.tracker:
+            self.tracker.reset()
+        if self.gate:
+            self.gate.reset()
+
+        # webcam phải theo kịp thời gian thực, video thì xử lý hết mọi frame
+        self.policy = policy or PIPELINE_POLICY or ("realtime" if mode == "webcam" else "offline")
 
         # create needed folders
         ensure_dir("output/")
         ensure_dir("output/logs/")
 
-        # init video source
-        self.source = VideoSource(mode, video_path)
+        # init video source (source_options: target_fps / stride / start / end / prefetch)
+        self.source = VideoSource(mode, video_path, **(source_options or {}))
         self.source.open()
 
         # init log file
-        self.log = LogWriter(f"output/logs/{session_id}.csv")
+        self.log = open_log_writer(session_id)
+
+        if self.pipeline_mode == "staged":
+            workers = dict(PIPELINE_STAGE_WORKERS)
+            if self.tracker:
+                # tracker cần frame đúng thứ tự -> chỉ 1 worker detect
+                workers["detect"] = 1
+
+            self.runner = StagedRunner(
+                self.source,
+                self._locator(),
+                self.emotion_model,
+                self.smoother,
+                self.log,
+                gate=self.gate,
+                policy=self.policy,
+                workers=workers,
+                queue_size=PIPELINE_QUEUE_SIZE,
+            )
+        elif self.pipeline_mode == "sequential":
+            self.runner = None
+        else:
+            raise ValueError(f"pipeline_mode không hợp lệ: {self.pipeline_mode}")
 
         # allow loop() to run
         self.running = True
@@ -39,27 +102,72 @@ class EngagementPipeline:
     def stop(self):
         """Stop the loop safely without closing file immediately."""
         self.running = False  # tell loop() to stop
+        if self.runner:
+            self.runner.stop()
+
+    def stats(self):
+        """Throughput của pipeline (theo từng stage nếu chạy staged)."""
+        info = {
+            "session_id": self.current_session,
+            "pipeline_mode": self.pipeline_mode,
+            "policy": self.policy,
+            "running": self.running,
+        }
+        if self.runner:
+            info["stages"] = self.runner.stats()
+        else:
+            info["frames"] = self.frames
+        if self.tracker:
+            info["tracker"] = self.tracker.stats()
+        if self.gate:
+            info["motion_gate"] = self.gate.stats()
+        if self.source:
+            info["source"] = self.source.stats()
+        return info
 
     def loop(self):
         """Main processing loop (running inside a thread)."""
-        while self.running:
-            ret, frame = self.source.read_frame()
-
-            if not ret:
-                break
-
-            data = process_frame(frame, self.face_detector, self.emotion_model, self.smoother)
-            if data:
-                try:
-                    self.log.write(
-                        time.time(),
-                        data["dominant"],
-                        data["eng_raw"],
-                        data["eng_smooth"]
-                    )
-                except ValueError:
-                    # file already closed
-                    break
+        if self.runner:
+            self.runner.run()
+        else:
+            while self.running and self.step():
+                pass
+
+        self.close()
+
+    def step(self):
+        """
+        Xử lý đúng 1 frame (chế độ sequential).
+        -> False khi hết nguồn / log đã đóng, True nếu còn frame.
+        """
+        with stage_timer("decode"):
+            frame = self.source.read()
+
+        if frame is None:
+            return False
+        count_frame("pipeline")
+
+        data = process_frame(frame.image, self._locator(), self.emotion_model, self.smoother, self.gate)
+        self.frames += 1
+        if data:
+            try:
+                ts = self.source.log_time(frame)
+                self.log.write(
+                    ts,
+                    data["dominant"],
+                    data["eng_raw"],
+                    data["eng_smooth"]
+                )
+                self.log.write_faces(ts, data["results"])
+            except ValueError:
+                # file already closed
+                return False
+
+        return True
+
+    def close(self):
+        """Giải phóng nguồn video + đóng log, gọi khi loop/step đã dừng hẳn."""
+        self.running = False
 
         # only close resources AFTER loop finishes
         if self.source:
@@ -1,4 +1,7 @@
+from collections import Counter
+
 from backend.core.config import EMOTION_WEIGHTS
+from backend.core.metrics import stage_timer, observe_faces
 
 def compute_engagement(prob_dict):
     score = 0.0
@@ -6,37 +9,120 @@ def compute_engagement(prob_dict):
         score += prob_dict.get(emo, 0.0) * w
     return score
 
-def process_frame(frame, face_detector, emotion_model, smoother):
-    # 1. detect face
-    faces = face_detector.detect(frame)
-    if len(faces) == 0:
-        # không có mặt -> bỏ frame
-        return None
+def locate_faces(frame, face_detector):
+    """
+    -> [(face_id, (x, y, w, h)), ...]
 
-    # 2. lấy face đầu tiên
-    x, y, w, h = faces[0]
+    Nếu face_detector là FaceTracker thì face_id là track ID ổn định giữa
+    các frame, còn không thì chỉ là số thứ tự trong frame (1, 2, 3, ...).
+    """
+    with stage_timer("detect"):
+        if hasattr(face_detector, "track"):
+            faces = face_detector.track(frame)
+        else:
+            faces = list(enumerate(face_detector.detect(frame), start=1))
+    observe_faces(len(faces))
+    return faces
 
-    if w <= 0 or h <= 0:
-        return None
+def crop_faces(frame, faces):
+    """Cắt các mặt hợp lệ từ frame -> (faces, crops) cùng thứ tự."""
+    with stage_timer("crop"):
+        if hasattr(frame, "crop_faces"):
+            # FramePyramid: crop từ tầng độ phân giải phù hợp
+            return frame.crop_faces(faces)
+        return _crop_faces(frame, faces)
 
-    # 3. crop mặt
-    face_img = frame[y:y+h, x:x+w]
+def _crop_faces(frame, faces):
+    kept_faces = []
+    crops = []
+    for face_id, (x, y, w, h) in faces:
+        if w <= 0 or h <= 0:
+            continue
 
-    # nếu crop ra ảnh rỗng
-    if face_img is None or face_img.size == 0:
-        return None
+        face_img = frame[y:y+h, x:x+w]
+
+        # nếu crop ra ảnh rỗng
+        if face_img is None or face_img.size == 0:
+            continue
+
+        kept_faces.append((face_id, (x, y, w, h)))
+        crops.append(face_img)
+
+    return kept_faces, crops
+
+def analyze_faces(frame, face_detector, emotion_model, gate=None):
+    """
+    Detect + predict emotion cho tất cả các mặt trong frame.
+    -> list dict {id, x, y, w, h, emotion, engagement, probs}
+
+    frame: ảnh (ndarray) hoặc FramePyramid (detect trên ảnh thu nhỏ, box trả
+    về theo toạ độ ảnh gốc).
+    gate: MotionGate (tuỳ chọn) -> frame / mặt không đổi dùng lại kết quả cũ.
+    """
+    pyramid = frame if hasattr(frame, "detect_image") else None
+    image = pyramid.detect_image if pyramid is not None else frame
 
-    # 4. predict emotion
-    probs, dominant = emotion_model.predict(face_img)
-    if probs is None:
+    plan = gate.begin(image) if gate is not None else None
+    if plan is not None and plan.results is not None:
+        return plan.results
+
+    faces = locate_faces(image, face_detector)
+    if pyramid is not None:
+        faces = pyramid.to_full(faces)
+    faces, crops = crop_faces(frame, faces)
+    if plan is not None:
+        faces, crops = plan.select(faces, crops)
+
+    results = []
+    if crops:
+        # predict cả frame trong 1 batch (1 lần forward)
+        predictions = emotion_model.predict_batch(crops)
+        results = build_face_results(faces, predictions)
+
+    return plan.finish(results) if plan is not None else results
+
+def build_face_results(faces, predictions):
+    """Ghép (face_id, box) + kết quả predict_batch -> list dict cho từng mặt."""
+    results = []
+    for (face_id, (x, y, w, h)), (probs, dominant) in zip(faces, predictions):
+        if probs is None:
+            continue
+
+        results.append({
+            "id": int(face_id),
+            "x": int(x),
+            "y": int(y),
+            "w": int(w),
+            "h": int(h),
+            "emotion": str(dominant),
+            "engagement": float(compute_engagement(probs)),
+            "probs": {k: float(v) for k, v in probs.items()},
+        })
+
+    return results
+
+def summarize_faces(faces):
+    """
+    Gộp kết quả các mặt thành 1 giá trị cho cả frame:
+    engagement trung bình + emotion xuất hiện nhiều nhất.
+    """
+    avg_eng = sum(f["engagement"] for f in faces) / len(faces)
+    dominant = Counter(f["emotion"] for f in faces).most_common(1)[0][0]
+    return dominant, avg_eng
+
+def process_frame(frame, face_detector, emotion_model, smoother, gate=None):
+    faces = analyze_faces(frame, face_detector, emotion_model, gate)
+    if not faces:
+        # không có mặt -> bỏ frame
         return None
 
-    # 5. tính engagement
-    eng_raw = compute_engagement(probs)
+    # engagement của frame = trung bình các mặt
+    dominant, eng_raw = summarize_faces(faces)
     eng_smooth = smoother.update(eng_raw)
 
     return {
-        "faces": faces,
+        "faces": [(f["x"], f["y"], f["w"], f["h"]) for f in faces],
+        "results": faces,
         "dominant": dominant,
         "eng_raw": eng_raw,
         "eng_smooth": eng_smooth,
@@ -0,0 +1,195 @@
+"""
+Decode ảnh upload ở độ phân giải thấp để detect, chỉ lấy pixel độ phân giải
+cao cho vùng mặt cần crop.
+
+    pyramid = FramePyramid.from_bytes(jpeg_bytes, detect_width=640)
+    boxes = detector.detect(pyramid.detect_image)      # toạ độ ảnh detect
+    faces = pyramid.to_full(faces)                     # -> toạ độ ảnh gốc
+    faces, crops = pyramid.crop_faces(faces)
+
+JPEG được decode thẳng ở 1/2, 1/4, 1/8 (cv2.IMREAD_REDUCED_COLOR_*, libjpeg
+bỏ qua phần DCT không cần) nên không phải decode cả ảnh 1080p chỉ để detect.
+Mỗi crop lấy từ tầng thô nhất mà mặt vẫn đủ min_crop px; tầng đó chỉ được
+decode (1 lần) khi có mặt cần tới.
+"""
+import cv2
+import numpy as np
+
+from backend.core.config import RT_DETECT_WIDTH, RT_MIN_CROP_SIZE
+
+REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# SOF0..SOF15 trừ DHT (C4), JPG (C8), DAC (CC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data):
+    """(width, height) đọc từ header JPEG (không decode), None nếu không phải JPEG."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    i, n = 2, len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        if marker == 0xD9 or marker == 0xDA:
+            # hết header mà chưa gặp SOF
+            return None
+        if marker in _SOF_MARKERS:
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def reduction_factor(width, detect_width):
+    """Hệ số giảm lớn nhất (1/2/4/8) mà ảnh detect vẫn rộng ít nhất detect_width."""
+    if not detect_width or not width:
+        return 1
+    for factor in (8, 4, 2):
+        if width / factor >= detect_width:
+            return factor
+    return 1
+
+
+class FramePyramid:
+    def __init__(self, levels, full_size, detect_factor, data=None, jpeg=False, min_crop=RT_MIN_CROP_SIZE):
+        self._levels = levels               # factor -> ảnh đã decode
+        self.full_size = full_size          # (width, height) ảnh gốc
+        self.detect_factor = detect_factor
+        self.min_crop = min_crop
+        self._data = data
+        self._jpeg = jpeg
+
+    @classmethod
+    def from_bytes(cls, data, detect_width=RT_DETECT_WIDTH, min_crop=RT_MIN_CROP_SIZE):
+        """-> FramePyramid, hoặc None nếu ảnh không hợp lệ."""
+        buf = np.frombuffer(data, np.uint8)
+        size = jpeg_size(data)
+        factor = reduction_factor(size[0], detect_width) if size else 1
+
+        if size and factor > 1:
+            img = cv2.imdecode(buf, REDUCED_FLAGS[factor])
+            if img is None:
+                return None
+            full_size = size
+            if (img.shape[1] > img.shape[0]) != (size[0] > size[1]):
+                # EXIF xoay ảnh khi decode
+                full_size = (size[1], size[0])
+            return cls({factor: img}, full_size, factor, data=buf, jpeg=True, min_crop=min_crop)
+
+        img = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        return cls.from_image(img, detect_width, min_crop)
+
+    @classmethod
+    def from_image(cls, img, detect_width=RT_DETECT_WIDTH, min_crop=RT_MIN_CROP_SIZE):
+        """Ảnh đã decode (vd. frame video): các tầng thấp tạo bằng resize khi cần."""
+        h, w = img.shape[:2]
+        return cls({1: img}, (w, h), reduction_factor(w, detect_width), min_crop=min_crop)
+
+    # ==========================
+    #   CÁC TẦNG
+    # ==========================
+    def level(self, factor):
+        img = self._levels.get(factor)
+        if img is not None:
+            return img
+
+        if self._jpeg:
+            img = cv2.imdecode(self._data, REDUCED_FLAGS[factor])
+        else:
+            full = self._levels[1]
+            w, h = self.full_size
+            img = cv2.resize(full, (max(1, -(-w // factor)), max(1, -(-h // factor))),
+                             interpolation=cv2.INTER_AREA)
+        self._levels[factor] = img
+        return img
+
+    @property
+    def detect_image(self):
+        return self.level(self.detect_factor)
+
+    @property
+    def full(self):
+        return self.level(1)
+
+    def _scale(self, factor):
+        img = self.level(factor)
+        w, h = self.full_size
+        return w / img.shape[1], h / img.shape[0]
+
+    # ==========================
+    #   TOẠ ĐỘ / CROP
+    # ==========================
+    def to_full(self, faces):
+        """[(face_id, box ảnh detect)] -> [(face_id, box ảnh gốc)]."""
+        if self.detect_factor == 1:
+            return faces
+        sx, sy = self._scale(self.detect_factor)
+        w, h = self.full_size
+        out = []
+        for face_id, (x, y, bw, bh) in faces:
+            x0 = min(max(int(round(x * sx)), 0), w)
+            y0 = min(max(int(round(y * sy)), 0), h)
+            x1 = min(max(int(round((x + bw) * sx)), 0), w)
+            y1 = min(max(int(round((y + bh) * sy)), 0), h)
+            out.append((face_id, (x0, y0, x1 - x0, y1 - y0)))
+        return out
+
+    def _crop_factor(self, box):
+        """Tầng thô nhất (<= tầng detect) mà cạnh ngắn của mặt vẫn >= min_crop px."""
+        side = min(box[2], box[3])
+        for factor in (8, 4, 2):
+            if factor <= self.detect_factor and side / factor >= self.min_crop:
+                return factor
+        return 1
+
+    def crop(self, box):
+        """Crop vùng box (toạ độ ảnh gốc)."""
+        factor = self._crop_factor(box)
+        img = self.level(factor)
+        if factor == 1:
+            x, y, w, h = box
+            return img[y:y + h, x:x + w]
+
+        sx, sy = self._scale(factor)
+        x, y, w, h = box
+        x0, y0 = int(x / sx), int(y / sy)
+        x1, y1 = int(np.ceil((x + w) / sx)), int(np.ceil((y + h) / sy))
+        return img[y0:y1, x0:x1]
+
+    def crop_faces(self, faces):
+        """Giống frame_processor.crop_faces nhưng crop từ tầng phù hợp."""
+        kept_faces, crops = [], []
+        for face_id, box in faces:
+            if box[2] <= 0 or box[3] <= 0:
+                continue
+            face_img = self.crop(box)
+            if face_img is None or face_img.size == 0:
+                continue
+            kept_faces.append((face_id, box))
+            crops.append(face_img)
+        return kept_faces, crops
+
+    def stats(self):
+        return {
+            "full_size": list(self.full_size),
+            "detect_factor": self.detect_factor,
+            "decoded_levels": sorted(self._levels),
+        }
@@ -0,0 +1,83 @@
+import asyncio
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from backend.core.metrics import count_drop
+
+
+class LatestFrame:
+    """
+    Ô chứa 1 frame: frame mới ghi đè frame chưa xử lý (frame cũ bị bỏ),
+    nên server luôn xử lý frame mới nhất thay vì xếp hàng.
+    """
+
+    def __init__(self):
+        self.data = None
+        self.seq = 0
+        self.received = 0
+        self.dropped = 0
+        self.closed = False
+        self._event = asyncio.Event()
+
+    def put(self, data):
+        if self.data is not None:
+            self.dropped += 1
+            count_drop("ws_stale")
+        self.data = data
+        self.received += 1
+        self.seq = self.received
+        self._event.set()
+
+    async def take(self):
+        """Đợi frame tiếp theo. -> (seq, bytes), hoặc None khi kết nối đã đóng."""
+        while self.data is None:
+            if self.closed:
+                return None
+            await self._event.wait()
+            self._event.clear()
+        data, self.data = self.data, None
+        return self.seq, data
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+
+async def stream_frames(websocket: WebSocket, process):
+    """
+    Nhận frame nhị phân liên tục từ websocket, xử lý frame mới nhất bằng
+    `process(bytes) -> dict` (async) và đẩy kết quả JSON về ngay khi xong.
+    """
+    slot = LatestFrame()
+
+    async def receive():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    slot.put(message["bytes"])
+        except WebSocketDisconnect:
+            pass
+        finally:
+            slot.close()
+
+    receiver = asyncio.create_task(receive())
+    processed = 0
+    try:
+        while True:
+            item = await slot.take()
+            if item is None:
+                break
+
+            seq, data = item
+            result = await process(data)
+            processed += 1
+            # seq: số thứ tự (từ 1) của frame vừa xử lý trong các frame đã nhận
+            result.update({"seq": seq, "processed": processed, "dropped": slot.dropped})
+            await websocket.send_json(result)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from backend.core.config import (
+    RT_EXECUTOR,
+    RT_WORKERS,
+    RT_MAX_PENDING,
+    RT_OVERLOAD_POLICY,
+)
+from backend.core.metrics import count_drop
+
+logger = logging.getLogger(__name__)
+
+
+class InferencePool:
+    """
+    Executor có giới hạn cho inference realtime, gọi từ event loop:
+
+        status, result = await pool.run(fn, *args)
+
+    status:
+      - "ok"      : fn chạy xong, result là giá trị trả về
+      - "busy"    : hàng đợi đầy, frame mới bị từ chối
+      - "dropped" : frame cũ bị bỏ để nhường chỗ cho frame mới hơn
+      - "error"   : fn raise exception (đã log)
+    """
+
+    def __init__(self, kind=RT_EXECUTOR, workers=RT_WORKERS,
+                 max_pending=RT_MAX_PENDING, policy=RT_OVERLOAD_POLICY,
+                 initializer=None):
+        if kind == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rt-infer")
+        elif kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers, initializer=initializer)
+        else:
+            raise ValueError(f"RT_EXECUTOR không hợp lệ: {kind}")
+
+        if policy not in ("drop_oldest", "reject"):
+            raise ValueError(f"RT_OVERLOAD_POLICY không hợp lệ: {policy}")
+
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.policy = policy
+
+        self._lock = threading.Lock()
+        self._pending = deque()  # future đang chờ hoặc đang chạy (cũ -> mới)
+
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.failed = 0
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            if len(self._pending) >= self.max_pending and not self._make_room():
+                self.rejected += 1
+                count_drop("rt_pool_rejected")
+                return "busy", None
+
+            fut = self._executor.submit(fn, *args)
+            self._pending.append(fut)
+            self.submitted += 1
+
+        waiter = loop.create_future()
+        fut.add_done_callback(
+            lambda f: loop.call_soon_threadsafe(self._resolve, f, waiter)
+        )
+        return await waiter
+
+    def _make_room(self):
+        """Bỏ frame cũ nhất chưa chạy (nếu policy cho phép). Gọi khi đang giữ lock."""
+        if self.policy != "drop_oldest":
+            return False
+
+        for fut in self._pending:
+            if not fut.running() and fut.cancel():
+                self._pending.remove(fut)
+                self.dropped += 1
+                count_drop("rt_pool_dropped")
+                return True
+
+        # tất cả đều đang chạy -> không bỏ được
+        return False
+
+    def _resolve(self, fut, waiter):
+        with self._lock:
+            if fut in self._pending:
+                self._pending.remove(fut)
+
+            if fut.cancelled():
+                status = ("dropped", None)
+            elif fut.exception() is not None:
+                self.failed += 1
+                logger.error("[InferencePool] job lỗi", exc_info=fut.exception())
+                status = ("error", None)
+            else:
+                self.completed += 1
+                status = ("ok", fut.result())
+
+        # client đã huỷ request -> không cần trả kết quả
+        if not waiter.done():
+            waiter.set_result(status)
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for f in self._pending if f.running())
+            return {
+                "executor": self.kind,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "policy": self.policy,
+                "queue_depth": len(self._pending) - running,
+                "running": running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
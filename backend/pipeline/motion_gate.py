@@ -0,0 +1,227 @@
+"""
+Motion gate: bỏ qua detect / predict khi hình gần như không đổi và dùng lại
+kết quả lần xử lý gần nhất (log vẫn ghi đủ mỗi frame).
+
+    mode "global": so sánh cả frame (ảnh xám thu nhỏ). Không đổi -> bỏ qua
+                   cả detector lẫn CNN, trả lại kết quả frame trước.
+    mode "face"  : detector vẫn chạy (tracker), so sánh từng vùng mặt với lần
+                   predict gần nhất của mặt đó. Mặt không đổi -> bỏ qua CNN.
+
+Luôn so sánh với ảnh lúc predict thật (không phải frame liền trước), nên
+thay đổi chậm qua nhiều frame vẫn được phát hiện. Mỗi kết quả chỉ được dùng
+lại tối đa max_reuse frame liên tiếp.
+
+    plan = gate.begin(frame)
+    if plan.results is not None:          # global: frame không đổi
+        return plan.results
+    faces, crops = plan.select(faces, crops)   # face: chỉ còn mặt cần predict
+    results = plan.finish(build_face_results(faces, predictions))
+"""
+import threading
+
+import cv2
+
+from backend.core.config import (
+    MOTION_GATE_MODE,
+    MOTION_THRESHOLD,
+    MOTION_MAX_REUSE,
+    MOTION_THUMB_WIDTH,
+    MOTION_FACE_PATCH,
+)
+from backend.core.metrics import count_gate
+from backend.models.face_tracker import iou
+
+MODES = ("global", "face")
+
+# mặt được coi là cùng 1 mặt giữa 2 frame nếu box chồng nhau ít nhất chừng này
+# (ID không track chỉ là số thứ tự trong frame)
+MIN_BOX_IOU = 0.5
+
+
+def _gray(img):
+    if img.ndim == 3:
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return img
+
+
+def frame_thumb(frame, width=MOTION_THUMB_WIDTH):
+    """Ảnh xám thu nhỏ + làm mờ nhẹ để nhiễu cảm biến không tính là chuyển động."""
+    h, w = frame.shape[:2]
+    if w > width:
+        frame = cv2.resize(frame, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(_gray(frame), (3, 3), 0)
+
+
+def face_patch(crop, size=MOTION_FACE_PATCH):
+    small = cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(_gray(small), (3, 3), 0)
+
+
+def mean_abs_diff(a, b):
+    """Chênh lệch trung bình (mức xám 0..255) giữa 2 ảnh cùng kích thước."""
+    if a.shape != b.shape:
+        return float("inf")
+    return cv2.norm(a, b, cv2.NORM_L1) / a.size
+
+
+def _copy(result, box=None):
+    out = dict(result)
+    out["probs"] = dict(result["probs"])
+    if box is not None:
+        out["x"], out["y"], out["w"], out["h"] = (int(v) for v in box)
+    return out
+
+
+class _CachedFace:
+    __slots__ = ("box", "patch", "result", "age")
+
+    def __init__(self, box, patch, result):
+        self.box = box
+        self.patch = patch
+        self.result = result
+        self.age = 0
+
+
+class GatePlan:
+    """Trạng thái của 1 frame đi qua gate (begin -> select -> finish)."""
+
+    def __init__(self, gate, thumb=None, results=None):
+        self.gate = gate
+        self.thumb = thumb
+        self.results = results      # != None: dùng lại cả frame, không cần xử lý
+        self._slots = None          # thứ tự mặt: face_id (cần predict) hoặc kết quả dùng lại
+        self._patches = {}
+
+    def select(self, faces, crops):
+        """-> (faces, crops) chỉ gồm các mặt cần predict (mode "face")."""
+        if self.gate.mode != "face":
+            return faces, crops
+
+        todo_faces, todo_crops = [], []
+        self._slots = []
+        gate = self.gate
+        patches = [face_patch(crop) for crop in crops]
+        with gate._lock:
+            seen = set()
+            for (face_id, box), crop, patch in zip(faces, crops, patches):
+                seen.add(face_id)
+                cached = gate._faces.get(face_id)
+                if (cached is not None
+                        and cached.age < gate.max_reuse
+                        and iou(cached.box, box) >= MIN_BOX_IOU
+                        and mean_abs_diff(patch, cached.patch) < gate.threshold):
+                    cached.age += 1
+                    self._slots.append(_copy(cached.result, box))
+                    continue
+
+                self._patches[face_id] = (box, patch)
+                self._slots.append(face_id)
+                todo_faces.append((face_id, box))
+                todo_crops.append(crop)
+
+            # mặt đã rời khung -> bỏ khỏi cache
+            for face_id in list(gate._faces):
+                if face_id not in seen:
+                    del gate._faces[face_id]
+
+        reused = len(faces) - len(todo_faces)
+        gate._count("faces_reused", reused)
+        gate._count("faces_predicted", len(todo_faces))
+        return todo_faces, todo_crops
+
+    def finish(self, results):
+        """Nhận kết quả predict của các mặt đã chọn -> kết quả đầy đủ của frame."""
+        gate = self.gate
+        gate._count("frames_processed")
+
+        if gate.mode == "global":
+            with gate._lock:
+                gate._ref = self.thumb
+                gate._results = [_copy(r) for r in results]
+                gate._age = 0
+            return results
+
+        if self._slots is None:
+            return results
+
+        by_id = {r["id"]: r for r in results}
+        with gate._lock:
+            for face_id, (box, patch) in self._patches.items():
+                r = by_id.get(face_id)
+                if r is not None:
+                    gate._faces[face_id] = _CachedFace(box, patch, _copy(r))
+
+        merged = []
+        for slot in self._slots:
+            if isinstance(slot, dict):
+                merged.append(slot)
+            elif slot in by_id:
+                merged.append(by_id[slot])
+        return merged
+
+
+class MotionGate:
+    def __init__(self, mode=MOTION_GATE_MODE, threshold=MOTION_THRESHOLD, max_reuse=MOTION_MAX_REUSE):
+        if mode not in MODES:
+            raise ValueError(f"motion gate mode không hợp lệ: {mode}")
+        self.mode = mode
+        self.threshold = threshold
+        self.max_reuse = max(0, max_reuse)
+
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._ref = None        # global: ảnh thu nhỏ lúc predict gần nhất
+            self._results = None
+            self._age = 0
+            self._faces = {}        # face: face_id -> _CachedFace
+            self.counts = {
+                "frames_skipped": 0,
+                "frames_processed": 0,
+                "faces_reused": 0,
+                "faces_predicted": 0,
+            }
+
+    def _count(self, key, n=1):
+        if n:
+            with self._lock:
+                self.counts[key] += n
+            count_gate(key, n)
+
+    def begin(self, frame):
+        if self.mode != "global":
+            return GatePlan(self)
+
+        thumb = frame_thumb(frame)
+        with self._lock:
+            reuse = (
+                self._results is not None
+                and self._age < self.max_reuse
+                and mean_abs_diff(thumb, self._ref) < self.threshold
+            )
+            if reuse:
+                self._age += 1
+                results = [_copy(r) for r in self._results]
+
+        if reuse:
+            self._count("frames_skipped")
+            return GatePlan(self, thumb, results)
+        return GatePlan(self, thumb)
+
+    def stats(self):
+        with self._lock:
+            info = {"mode": self.mode, **self.counts}
+        total = info["frames_skipped"] + info["frames_processed"]
+        info["skip_ratio"] = info["frames_skipped"] / total if total else 0.0
+        faces = info["faces_reused"] + info["faces_predicted"]
+        info["face_reuse_ratio"] = info["faces_reused"] / faces if faces else 0.0
+        return info
+
+
+def make_motion_gate():
+    """MotionGate theo config, hoặc None nếu MOTION_GATE_MODE = None."""
+    if not MOTION_GATE_MODE:
+        return None
+    return MotionGate()
@@ -0,0 +1,264 @@
+"""
+Phân tích offline 1 video đã quay bằng cách chia thành các đoạn frame (shard)
+và xử lý song song trên process pool.
+
+    python -m backend.pipeline.offline_batch data/videos/lecture.mp4 --workers 8
+
+- Timestamp mỗi dòng log = lúc bắt đầu phân tích + vị trí trong video (giây),
+  cùng quy ước với VideoSource.log_time của pipeline live.
+- Worker chỉ trả engagement thô; smoothing chạy 1 lần trên kết quả đã ghép
+  theo thứ tự frame nên liên tục qua ranh giới giữa các shard.
+- Shard được ghi vào log ngay khi các shard trước nó đã ghi xong, chỉ giữ
+  trong RAM các shard xong sớm hơn thứ tự.
+- Shard cuối luôn đọc tới hết video (frame count của container có thể sai);
+  không có frame count thì đọc tuần tự 1 shard.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from backend.core.config import OFFLINE_WORKERS, OFFLINE_SHARDS_PER_WORKER
+from backend.analysis.smoothing import EngagementSmoother
+from backend.storage.log_writer import open_log_writer
+
+logger = logging.getLogger(__name__)
+
+# track ID bắt đầu lại từ 1 ở mỗi shard -> shard thứ k dùng dải ID riêng
+SHARD_TRACK_OFFSET = 1_000_000
+
+
+def probe_video(video_path):
+    """-> (frame_count, fps)"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Không mở được video: {video_path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    cap.release()
+    return frame_count, fps
+
+
+def plan_shards(frame_count, shards):
+    """
+    Chia [0, frame_count) thành tối đa `shards` đoạn liên tiếp gần bằng nhau.
+    Đoạn cuối có end = None (đọc tới hết video); frame_count <= 0 -> [(0, None)].
+    """
+    if frame_count <= 0:
+        return [(0, None)]
+    shards = max(1, min(shards, frame_count))
+    bounds = [round(i * frame_count / shards) for i in range(shards + 1)]
+    plan = [(bounds[i], bounds[i + 1]) for i in range(shards) if bounds[i] < bounds[i + 1]]
+    plan[-1] = (plan[-1][0], None)
+    return plan
+
+
+def _init_shard_worker():
+    # mỗi process 1 thread tính toán, tránh oversubscription khi chạy nhiều process
+    import torch
+    from backend.pipeline.realtime import init_worker_models
+
+    torch.set_num_threads(1)
+    cv2.setNumThreads(1)
+    init_worker_models()
+
+
+def _seek(cap, start):
+    """Nhảy tới frame start; nếu codec không seek chính xác thì grab() từ đầu."""
+    if start == 0:
+        return True
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == start:
+        return True
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(start):
+        if not cap.grab():
+            return False
+    return True
+
+
+def process_shard(video_path, start, end, fps, stride=1):
+    """
+    Chạy trong process con: xử lý frame [start, end) (end = None: tới hết video) có idx chia hết cho
+    `stride` (lưới lấy mẫu chung cho cả video, không phụ thuộc cách chia shard).
+    -> list (frame_idx, ts_giây, dominant, eng_raw, faces) cho các frame có mặt.
+    """
+    from backend.core.config import TRACKER_ENABLED
+    from backend.models.face_tracker import FaceTracker
+    from backend.models.registry import get_face_detector, get_emotion_model
+    from backend.pipeline.frame_processor import analyze_faces, summarize_faces
+    from backend.pipeline.motion_gate import make_motion_gate
+
+    detector = get_face_detector()
+    if TRACKER_ENABLED:
+        detector = FaceTracker(detector)
+    model = get_emotion_model()
+    gate = make_motion_gate()
+
+    cap = cv2.VideoCapture(video_path)
+    rows = []
+    try:
+        if not _seek(cap, start):
+            return rows
+
+        idx = start - 1
+        while end is None or idx + 1 < end:
+            idx += 1
+            if idx % stride:
+                # frame bị bỏ qua: chỉ grab, không decode
+                if not cap.grab():
+                    break
+                continue
+
+            ok, frame = cap.read()
+            if not ok:
+                break
+
+            faces = analyze_faces(frame, detector, model, gate)
+            if not faces:
+                continue
+
+            dominant, eng_raw = summarize_faces(faces)
+            ts = idx / fps if fps > 0 else float(idx)
+            rows.append((idx, ts, dominant, eng_raw, faces))
+    finally:
+        cap.release()
+
+    return rows
+
+
+def analyze_video(video_path, session_id, workers=None, shards=None, stride=1, progress=None):
+    """
+    Phân tích cả video, ghi vào log của session_id (định dạng theo LOG_FORMAT).
+
+    progress: dict (tuỳ chọn) được cập nhật số shard đã xong để theo dõi.
+    -> dict tóm tắt (frames, rows, shards, elapsed_s, ...)
+    """
+    if stride < 1:
+        raise ValueError(f"stride phải >= 1 (nhận {stride})")
+
+    t0 = time.time()
+    frame_count, fps = probe_video(video_path)
+
+    workers = workers or OFFLINE_WORKERS or os.cpu_count() or 1
+    if frame_count <= 0:
+        # container không ghi số frame -> không chia shard được, đọc tuần tự
+        logger.warning("[offline] %s: không có frame count, xử lý tuần tự 1 shard", video_path)
+    shards = plan_shards(frame_count, shards or workers * OFFLINE_SHARDS_PER_WORKER)
+
+    if progress is not None:
+        progress.update({"shards_total": len(shards), "shards_done": 0, "frames_total": frame_count})
+
+    # ghép theo thứ tự frame, smoothing liên tục qua các shard
+    smoother = EngagementSmoother()
+    log = open_log_writer(session_id)
+    rows = 0
+
+    def write_shard(k, shard_rows):
+        nonlocal rows
+        for _, ts, dominant, eng_raw, faces in shard_rows:
+            ts += t0
+            log.write(ts, dominant, eng_raw, smoother.update(eng_raw))
+            for f in faces:
+                f["id"] += k * SHARD_TRACK_OFFSET
+            log.write_faces(ts, faces)
+            rows += 1
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_shard_worker) as pool:
+            futures = {
+                pool.submit(process_shard, video_path, start, end, fps, stride): k
+                for k, (start, end) in enumerate(shards)
+            }
+            # shard xong trước thứ tự chờ ở đây tới lượt ghi
+            pending = {}
+            next_k = 0
+            for fut in as_completed(futures):
+                pending[futures[fut]] = fut.result()
+                while next_k in pending:
+                    write_shard(next_k, pending.pop(next_k))
+                    next_k += 1
+                if progress is not None:
+                    progress["shards_done"] += 1
+    finally:
+        log.close()
+
+    return {
+        "session_id": session_id,
+        "video_path": video_path,
+        "frames": frame_count,
+        "fps": fps,
+        "stride": stride,
+        "rows": rows,
+        "workers": workers,
+        "shards": len(shards),
+        "elapsed_s": time.time() - t0,
+    }
+
+
+class OfflineJob:
+    """Chạy analyze_video trong thread nền, cho endpoint theo dõi tiến độ."""
+
+    def __init__(self, session_id, video_path, workers=None, shards=None, stride=1, on_done=None):
+        self.session_id = session_id
+        self.status = "running"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self._on_done = on_done
+
+        self.thread = threading.Thread(
+            target=self._run, args=(video_path, workers, shards, stride), daemon=True
+        )
+        self.thread.start()
+
+    def _run(self, video_path, workers, shards, stride):
+        try:
+            self.result = analyze_video(video_path, self.session_id, workers=workers,
+                                        shards=shards, stride=stride, progress=self.progress)
+            self.status = "done"
+        except Exception as e:
+            logger.exception("[OfflineJob] %s lỗi", self.session_id)
+            self.error = str(e)
+            self.status = "error"
+        finally:
+            if self._on_done:
+                self._on_done(self)
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video_path")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shards", type=int, default=None)
+    parser.add_argument("--stride", type=int, default=1, help="chỉ xử lý 1 frame mỗi `stride` frame")
+    parser.add_argument("--session-id", default=None)
+    args = parser.parse_args()
+
+    from backend.storage.session_manager import SessionManager
+
+    session_manager = SessionManager()
+    session_id = args.session_id or session_manager.create_session("offline", args.video_path)
+
+    summary = analyze_video(args.video_path, session_id, workers=args.workers,
+                            shards=args.shards, stride=args.stride)
+    for k, v in summary.items():
+        print(f"{k}: {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+
+from backend.core.config import TRACKER_ENABLED
+from backend.core.metrics import stage_timer, count_frame
+from backend.models.face_tracker import FaceTracker
+from backend.models.registry import get_face_detector, get_emotion_model, get_emotion_predictor
+from backend.pipeline.frame_processor import analyze_faces, summarize_faces
+from backend.pipeline.motion_gate import make_motion_gate
+from backend.pipeline.frame_pyramid import FramePyramid
+from backend.storage.log_writer import open_log_writer
+from backend.utils.file_utils import ensure_dir
+
+# tracker + motion gate theo từng session realtime, tracker bọc detector dùng
+# chung trong ModelRegistry. Với process executor mỗi process giữ trạng thái
+# riêng nên track ID chỉ ổn định trong 1 process.
+MAX_TRACKERS = 64
+_trackers = OrderedDict()
+_gates = OrderedDict()
+_trackers_lock = threading.Lock()
+
+
+def _session_item(items, session_id, factory):
+    with _trackers_lock:
+        item = items.get(session_id)
+        if item is None:
+            item = factory()
+            items[session_id] = item
+            # giữ tối đa MAX_TRACKERS session gần nhất
+            while len(items) > MAX_TRACKERS:
+                items.popitem(last=False)
+        else:
+            items.move_to_end(session_id)
+        return item
+
+
+def _face_locator(session_id):
+    if not TRACKER_ENABLED or session_id is None:
+        return get_face_detector()
+    return _session_item(_trackers, session_id, lambda: FaceTracker(get_face_detector()))
+
+
+def _motion_gate(session_id):
+    if session_id is None:
+        return None
+    return _session_item(_gates, session_id, make_motion_gate)
+
+
+def drop_tracker(session_id):
+    with _trackers_lock:
+        _trackers.pop(session_id, None)
+        _gates.pop(session_id, None)
+
+
+def tracker_stats(session_id):
+    tracker = _trackers.get(session_id)
+    return tracker.stats() if tracker is not None else None
+
+
+def gate_stats(session_id):
+    gate = _gates.get(session_id)
+    return gate.stats() if gate is not None else None
+
+
+def init_worker_models():
+    """Initializer cho ProcessPoolExecutor: load model trong process con ngay khi start."""
+    get_face_detector()
+    get_emotion_model()
+
+
+def analyze_bytes(image_bytes, session_id=None):
+    """
+    Chạy trong worker: decode ảnh + detect + predict.
+    -> list kết quả từng mặt (box theo toạ độ ảnh gửi lên), hoặc None nếu ảnh không hợp lệ.
+
+    session_id: ID ổn định theo tracker của session đó (None = không track).
+    Ảnh được decode ở độ phân giải detect (RT_DETECT_WIDTH), crop mặt lấy từ
+    tầng độ phân giải cao hơn khi cần (xem frame_pyramid.py).
+    """
+    with stage_timer("decode"):
+        img = FramePyramid.from_bytes(image_bytes)
+    if img is None:
+        return None
+    count_frame("realtime")
+
+    return analyze_faces(img, _face_locator(session_id), get_emotion_predictor(), _motion_gate(session_id))
+
+
+class RealtimeSession:
+    """
+    1 session realtime của dashboard: CSV được ghi mỗi lần /analyze_frame
+    trả kết quả cho session này.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.frames = 0
+        self.started_at = time.time()
+
+        # đảm bảo thư mục tồn tại
+        ensure_dir("output/")
+        ensure_dir("output/logs/")
+
+        # mở file log
+        self.log = open_log_writer(session_id)
+        self._lock = threading.Lock()
+
+    def write(self, faces):
+        if not faces:
+            return
+
+        # engagement trung bình + emotion xuất hiện nhiều nhất của cả frame
+        dominant, avg_eng = summarize_faces(faces)
+
+        with self._lock:
+            if self.log is None:
+                return
+            ts = time.time()
+            self.log.write(
+                ts,
+                dominant,
+                avg_eng,
+                avg_eng,  # ở đây raw = smooth, smoothing đã làm ở FE (line chart)
+            )
+            # kết quả từng mặt (track ID, box, xác suất) cho báo cáo theo học sinh
+            self.log.write_faces(ts, faces)
+            self.frames += 1
+
+    def close(self):
+        with self._lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
+        drop_tracker(self.session_id)
+
+    def stats(self):
+        return {
+            "mode": "realtime",
+            "frames": self.frames,
+            "running": self.log is not None,
+            "tracker": tracker_stats(self.session_id),
+            "motion_gate": gate_stats(self.session_id),
+        }
@@ -0,0 +1,262 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from backend.core.config import ENGINE_WORKERS, ENGINE_MAX_SESSIONS, ENGINE_SESSION_MAX_FPS
+from backend.pipeline.engagement_pipeline import EngagementPipeline
+from backend.pipeline.realtime import RealtimeSession
+
+logger = logging.getLogger(__name__)
+
+
+class _Slot:
+    """1 session video/webcam trong engine."""
+
+    def __init__(self, pipeline, max_fps):
+        self.pipeline = pipeline
+        self.max_fps = max_fps
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.next_at = 0.0
+        self.done = threading.Event()
+        self.thread = None  # chỉ dùng cho pipeline staged
+
+
+class SessionEngine:
+    """
+    Chạy nhiều session cùng lúc, mỗi session có pipeline / smoother / tracker /
+    log riêng.
+
+    - Session sequential: dùng chung ENGINE_WORKERS thread. Mỗi lần worker lấy
+      session đứng đầu hàng đợi, xử lý đúng 1 frame rồi đưa session về cuối
+      hàng -> round-robin công bằng, mỗi session tối đa 1 frame đang chạy
+      (giữ đúng thứ tự frame), có thể giới hạn max_fps cho từng session.
+    - Session staged: tự quản lý thread của các stage (StagedRunner).
+    - Session realtime: không có vòng lặp, frame đến từ /analyze_frame.
+    """
+
+    def __init__(self, workers=ENGINE_WORKERS, max_sessions=ENGINE_MAX_SESSIONS,
+                 max_fps=ENGINE_SESSION_MAX_FPS):
+        self.workers = workers
+        self.max_sessions = max_sessions
+        self.max_fps = max_fps
+
+        self._cond = threading.Condition()
+        self._ready = deque()
+        self._slots = {}      # session_id -> _Slot
+        self._realtime = {}   # session_id -> RealtimeSession
+        self._threads = []
+        self._shutdown = False
+
+    # ==========================
+    #   VIDEO / WEBCAM
+    # ==========================
+    def start_session(self, session_id, mode, video_path,
+                      pipeline_mode=None, policy=None, max_fps=None, source_options=None):
+        self._check_capacity()
+
+        pipeline = EngagementPipeline()
+        pipeline.start(session_id, mode, video_path, pipeline_mode=pipeline_mode, policy=policy,
+                       source_options=source_options)
+        slot = _Slot(pipeline, max_fps or self.max_fps)
+
+        with self._cond:
+            self._slots[session_id] = slot
+
+            if pipeline.runner:
+                slot.thread = threading.Thread(target=self._run_staged, args=(slot,), daemon=True)
+                slot.thread.start()
+            else:
+                self._ensure_workers()
+                self._ready.append(slot)
+                self._cond.notify()
+
+        return pipeline
+
+    def stop_session(self, session_id, timeout=None):
+        """Dừng session và đợi ghi log xong. -> False nếu không có session này."""
+        slot = self._slots.get(session_id)
+        if slot is None:
+            return False
+
+        # đặt cờ trước, rồi mới kiểm tra hàng đợi (worker kiểm tra cờ dưới cùng lock)
+        slot.pipeline.stop()
+
+        finish_now = False
+        with self._cond:
+            if slot in self._ready:
+                self._ready.remove(slot)
+                finish_now = True
+
+        if finish_now:
+            self._finish(slot)
+
+        slot.done.wait(timeout)
+
+        with self._cond:
+            self._slots.pop(session_id, None)
+        return True
+
+    def latest_session(self):
+        """Session video/webcam mới nhất (cho /stop không truyền session_id)."""
+        with self._cond:
+            return next(reversed(self._slots), None)
+
+    def _run_staged(self, slot):
+        try:
+            slot.pipeline.loop()
+        finally:
+            slot.done.set()
+
+    def _finish(self, slot):
+        try:
+            slot.pipeline.close()
+        finally:
+            slot.done.set()
+
+    # ==========================
+    #   WORKER POOL
+    # ==========================
+    def _ensure_workers(self):
+        """Tạo thread worker ở lần đầu có session (gọi khi đang giữ lock)."""
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._worker, name=f"engine-{len(self._threads)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _next_slot(self):
+        """Session đầu tiên trong hàng đợi đã tới lượt (theo max_fps). Gọi khi giữ lock."""
+        while True:
+            if self._shutdown:
+                return None
+
+            now = time.monotonic()
+            for slot in self._ready:
+                if slot.next_at <= now:
+                    self._ready.remove(slot)
+                    return slot
+
+            timeout = None
+            if self._ready:
+                timeout = min(s.next_at for s in self._ready) - now
+            self._cond.wait(timeout)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                slot = self._next_slot()
+            if slot is None:
+                return
+
+            slot.next_at = time.monotonic() + slot.min_interval
+            try:
+                alive = slot.pipeline.running and slot.pipeline.step()
+            except Exception:
+                logger.exception("[SessionEngine] session %s lỗi", slot.pipeline.current_session)
+                alive = False
+
+            with self._cond:
+                if alive and slot.pipeline.running:
+                    self._ready.append(slot)
+                    self._cond.notify()
+                    continue
+
+            self._finish(slot)
+
+    # ==========================
+    #   REALTIME
+    # ==========================
+    def start_realtime(self, session_id):
+        self._check_capacity()
+        session = RealtimeSession(session_id)
+        with self._cond:
+            self._realtime[session_id] = session
+        return session
+
+    def get_realtime(self, session_id=None):
+        """
+        session_id=None -> session realtime duy nhất đang chạy. Có nhiều session
+        thì trả None (không đoán, tránh ghi frame vào log của dashboard khác).
+        """
+        with self._cond:
+            if session_id is None:
+                if len(self._realtime) != 1:
+                    return None
+                session_id = next(iter(self._realtime))
+            return self._realtime.get(session_id)
+
+    def stop_realtime(self, session_id=None):
+        """session_id=None -> chỉ dừng khi có đúng 1 session realtime (như get_realtime)."""
+        with self._cond:
+            if session_id is None:
+                if len(self._realtime) != 1:
+                    return None
+                session_id = next(iter(self._realtime))
+            session = self._realtime.pop(session_id, None)
+
+        if session is not None:
+            session.close()
+        return session
+
+    # ==========================
+    #   STATS / SHUTDOWN
+    # ==========================
+    def _check_capacity(self):
+        with self._cond:
+            active = sum(1 for s in self._slots.values() if not s.done.is_set())
+            active += len(self._realtime)
+        if active >= self.max_sessions:
+            raise RuntimeError("too_many_sessions")
+
+    def stats(self):
+        with self._cond:
+            slots = dict(self._slots)
+            realtime = dict(self._realtime)
+            ready = len(self._ready)
+
+        sessions = {}
+        for session_id, slot in slots.items():
+            info = slot.pipeline.stats()
+            info["max_fps"] = slot.max_fps
+            info["finished"] = slot.done.is_set()
+            sessions[session_id] = info
+        for session_id, session in realtime.items():
+            sessions[session_id] = session.stats()
+
+        return {
+            "workers": self.workers,
+            "max_sessions": self.max_sessions,
+            "ready_queue": ready,
+            "sessions": sessions,
+        }
+
+    def queue_depths(self):
+        """Độ sâu các hàng đợi: ready queue của engine + tổng queue từng stage staged."""
+        with self._cond:
+            depths = {"engine_ready": len(self._ready)}
+            runners = [s.pipeline.runner for s in self._slots.values() if s.pipeline.runner]
+
+        for runner in runners:
+            for name, st in runner.stats().items():
+                key = f"pipeline_{name}"
+                depths[key] = depths.get(key, 0) + st["queue_depth"]
+        return depths
+
+    def session_stats(self, session_id):
+        slot = self._slots.get(session_id)
+        if slot is not None:
+            return slot.pipeline.stats()
+        session = self._realtime.get(session_id)
+        if session is not None:
+            return session.stats()
+        return None
+
+    def shutdown(self):
+        for session_id in list(self._slots):
+            self.stop_session(session_id, timeout=5)
+        for session_id in list(self._realtime):
+            self.stop_realtime(session_id)
+
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
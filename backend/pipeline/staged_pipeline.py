@@ -0,0 +1,311 @@
+import heapq
+import logging
+import queue
+import threading
+import time
+
+from backend.core.metrics import stage_timer, count_frame, count_drop
+from backend.pipeline.frame_processor import (
+    locate_faces,
+    crop_faces,
+    build_face_results,
+    summarize_faces,
+)
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # sentinel báo stage phía trước đã kết thúc
+
+
+class StageStats:
+    """Đếm số item đã xử lý / bị drop và thời gian bận của 1 stage."""
+
+    def __init__(self, name, workers, in_queue=None):
+        self.name = name
+        self.workers = workers
+        self.in_queue = in_queue
+        self.processed = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+        self.started_at = None
+        self._lock = threading.Lock()
+
+    def record(self, elapsed):
+        with self._lock:
+            self.processed += 1
+            self.busy_time += elapsed
+
+    def record_drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def to_dict(self):
+        with self._lock:
+            wall = time.time() - self.started_at if self.started_at else 0.0
+            return {
+                "workers": self.workers,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "queue_depth": self.in_queue.qsize() if self.in_queue is not None else 0,
+                "throughput_fps": self.processed / wall if wall > 0 else 0.0,
+                "avg_latency_ms": 1000.0 * self.busy_time / self.processed if self.processed else 0.0,
+                # tỉ lệ thời gian các worker của stage đang bận
+                "utilization": self.busy_time / (wall * self.workers) if wall > 0 else 0.0,
+            }
+
+
+class StagedRunner:
+    """
+    Pipeline nhiều stage chạy song song, nối bằng queue có giới hạn:
+
+        decode (1) -> detect (N) -> infer (M) -> log (1)
+
+    policy:
+      - "realtime": queue đầy thì bỏ frame cũ nhất, decode theo tốc độ nguồn
+      - "offline" : queue đầy thì chờ, xử lý hết mọi frame nhanh nhất có thể
+
+    Stage log sắp xếp lại theo số thứ tự frame nên smoothing và CSV
+    vẫn đúng thứ tự dù detect/infer có nhiều worker.
+    """
+
+    def __init__(self, source, face_detector, emotion_model, smoother, log,
+                 gate=None, policy="offline", workers=None, queue_size=8):
+        if policy not in ("realtime", "offline"):
+            raise ValueError(f"policy không hợp lệ: {policy}")
+
+        workers = workers or {}
+        self.source = source
+        self.face_detector = face_detector
+        self.emotion_model = emotion_model
+        self.smoother = smoother
+        self.log = log
+        self.gate = gate
+        self.policy = policy
+        self.running = False
+
+        self.q_detect = queue.Queue(maxsize=queue_size)
+        self.q_infer = queue.Queue(maxsize=queue_size)
+        self.q_log = queue.Queue(maxsize=queue_size)
+
+        self.stages = {
+            "decode": StageStats("decode", 1),
+            "detect": StageStats("detect", workers.get("detect", 1), self.q_detect),
+            "infer": StageStats("infer", workers.get("infer", 1), self.q_infer),
+            "log": StageStats("log", 1, self.q_log),
+        }
+
+        # số thứ tự frame bị drop, để stage log không chờ chúng
+        self._dropped_seqs = set()
+        self._drop_lock = threading.Lock()
+
+        # đếm worker còn sống của mỗi stage để gửi sentinel cho stage sau
+        self._alive = {}
+        self._alive_lock = threading.Lock()
+
+    # ==========================
+    #   RUN / STOP
+    # ==========================
+    def run(self):
+        """Chạy cho tới khi hết nguồn hoặc stop(); block tới khi mọi stage xong."""
+        self.running = True
+        now = time.time()
+        for st in self.stages.values():
+            st.started_at = now
+
+        plan = [
+            ("decode", self._decode_worker),
+            ("detect", self._detect_worker),
+            ("infer", self._infer_worker),
+            ("log", self._log_worker),
+        ]
+
+        threads = []
+        for name, target in plan:
+            n = self.stages[name].workers
+            self._alive[name] = n
+            for i in range(n):
+                t = threading.Thread(target=target, name=f"pipeline-{name}-{i}", daemon=True)
+                t.start()
+                threads.append(t)
+
+        for t in threads:
+            t.join()
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        return {name: st.to_dict() for name, st in self.stages.items()}
+
+    # ==========================
+    #   QUEUE HELPERS
+    # ==========================
+    def _put(self, q, item, stage):
+        if self.policy == "offline":
+            q.put(item)
+            return
+
+        # realtime: bỏ item cũ nhất trong queue để nhường chỗ cho frame mới
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    old = q.get_nowait()
+                except queue.Empty:
+                    continue
+                if old is _DONE:
+                    # không bao giờ bỏ sentinel
+                    q.put(old)
+                    continue
+                with self._drop_lock:
+                    self._dropped_seqs.add(old[0])
+                self.stages[stage].record_drop()
+                count_drop(f"pipeline_{stage}")
+
+    def _finish(self, name, next_q, next_stage):
+        """Worker cuối cùng của stage gửi sentinel cho mọi worker stage sau."""
+        with self._alive_lock:
+            self._alive[name] -= 1
+            last = self._alive[name] == 0
+
+        if last:
+            for _ in range(self.stages[next_stage].workers):
+                next_q.put(_DONE)
+
+    # ==========================
+    #   STAGES
+    # ==========================
+    def _decode_worker(self):
+        st = self.stages["decode"]
+
+        # realtime + file video: phát theo timestamp của frame (đúng fps nguồn,
+        # kể cả khi VideoSource lấy mẫu / bắt đầu giữa video)
+        paced = self.policy == "realtime" and self.source.mode != "webcam"
+
+        seq = 0
+        origin = None
+        while self.running:
+            t0 = time.perf_counter()
+            with stage_timer("decode"):
+                frame = self.source.read()
+            if frame is None:
+                break
+            st.record(time.perf_counter() - t0)
+
+            if paced:
+                if origin is None:
+                    origin = time.time() - frame.timestamp
+                delay = origin + frame.timestamp - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+
+            self._put(self.q_detect, (seq, self.source.log_time(frame), frame.image), "detect")
+            seq += 1
+
+        self._finish("decode", self.q_detect, "detect")
+
+    def _detect_worker(self):
+        st = self.stages["detect"]
+        while True:
+            item = self.q_detect.get()
+            if item is _DONE:
+                break
+
+            seq, ts, frame = item
+            t0 = time.perf_counter()
+            # motion gate: cache mặt chỉ cập nhật khi stage infer xong, nên các
+            # frame đang chờ trong q_infer chưa dùng lại được kết quả của nhau
+            plan = self.gate.begin(frame) if self.gate is not None else None
+            if plan is not None and plan.results is not None:
+                # frame không đổi: dùng lại kết quả cũ, bỏ qua stage infer
+                st.record(time.perf_counter() - t0)
+                self._put(self.q_log, (seq, ts, plan.results), "log")
+                continue
+
+            try:
+                faces = locate_faces(frame, self.face_detector)
+                faces, crops = crop_faces(frame, faces)
+                if plan is not None:
+                    faces, crops = plan.select(faces, crops)
+            except Exception:
+                logger.exception("[StagedRunner] detect lỗi")
+                faces, crops, plan = [], [], None
+            st.record(time.perf_counter() - t0)
+
+            self._put(self.q_infer, (seq, ts, faces, crops, plan), "infer")
+
+        self._finish("detect", self.q_infer, "infer")
+
+    def _infer_worker(self):
+        st = self.stages["infer"]
+        while True:
+            item = self.q_infer.get()
+            if item is _DONE:
+                break
+
+            seq, ts, faces, crops, plan = item
+            t0 = time.perf_counter()
+            results = []
+            if crops:
+                try:
+                    predictions = self.emotion_model.predict_batch(crops)
+                    results = build_face_results(faces, predictions)
+                except Exception:
+                    logger.exception("[StagedRunner] infer lỗi")
+            if plan is not None:
+                results = plan.finish(results)
+            st.record(time.perf_counter() - t0)
+
+            self._put(self.q_log, (seq, ts, results), "log")
+
+        self._finish("infer", self.q_log, "log")
+
+    def _log_worker(self):
+        st = self.stages["log"]
+        pending = []  # heap (seq, ts, faces) về không đúng thứ tự
+        next_seq = 0
+
+        def flush():
+            nonlocal next_seq
+            while True:
+                with self._drop_lock:
+                    while next_seq in self._dropped_seqs:
+                        self._dropped_seqs.discard(next_seq)
+                        next_seq += 1
+                if not pending or pending[0][0] != next_seq:
+                    return
+                seq, ts, faces = heapq.heappop(pending)
+                next_seq += 1
+                self._write(st, ts, faces)
+
+        while True:
+            item = self.q_log.get()
+            if item is _DONE:
+                break
+            heapq.heappush(pending, item)
+            flush()
+
+        # hết nguồn: ghi nốt phần còn lại theo thứ tự
+        while pending:
+            seq, ts, faces = heapq.heappop(pending)
+            self._write(st, ts, faces)
+
+    def _write(self, st, ts, faces):
+        t0 = time.perf_counter()
+        count_frame("pipeline")
+
+        # không có mặt -> bỏ frame (giống process_frame)
+        if faces:
+            dominant, eng_raw = summarize_faces(faces)
+            eng_smooth = self.smoother.update(eng_raw)
+            try:
+                self.log.write(ts, dominant, eng_raw, eng_smooth)
+                self.log.write_faces(ts, faces)
+            except ValueError:
+                # file already closed
+                self.running = False
+                return
+
+        st.record(time.perf_counter() - t0)
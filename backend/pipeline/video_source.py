@@ -1,22 +1,228 @@
+"""
+Nguồn frame cho pipeline (file video / webcam).
+
+    source = VideoSource("video", path, target_fps=5, start=60, end=120)
+    source.open()
+    frame = source.read()        # VideoFrame(index, timestamp, image) hoặc None khi hết
+    source.release()
+
+- Lấy mẫu theo target_fps hoặc stride: frame bị bỏ chỉ grab(), không
+  retrieve (không chuyển màu / copy ra ndarray).
+- start / end (giây): seek tới đầu đoạn, dừng khi qua cuối đoạn (file video).
+- prefetch > 0: thread nền đọc trước vào buffer giới hạn, decode chạy song
+  song với detect / predict. Webcam: buffer đầy thì bỏ frame cũ nhất.
+- timestamp: vị trí trong video (giây) với file, time.time() lúc chụp với webcam.
+"""
+import queue
+import threading
+import time
+from collections import namedtuple
+
 import cv2
 
+from backend.core.config import VIDEO_PREFETCH, VIDEO_TARGET_FPS, VIDEO_STRIDE
+
+VideoFrame = namedtuple("VideoFrame", ["index", "timestamp", "image"])
+
+_END = None
+
+
 class VideoSource:
-    def __init__(self, mode, path):
+    def __init__(self, mode, path, target_fps=VIDEO_TARGET_FPS, stride=VIDEO_STRIDE,
+                 start=None, end=None, prefetch=VIDEO_PREFETCH):
         self.mode = mode
         self.path = path
         self.cap = None
 
+        self.target_fps = target_fps
+        self.stride = max(1, stride or 1)
+        self.start = start
+        self.end = end
+        self.prefetch = prefetch
+
+        self.src_fps = 0.0
+        self.opened_at = None
+        self.index = -1          # index (trong nguồn) của frame vừa grab
+        self.grabbed = 0
+        self.decoded = 0
+
+        self._next_t = None      # target_fps: timestamp tối thiểu của frame giữ tiếp theo
+        self._buffer = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.dropped = 0         # webcam + prefetch: frame bị bỏ vì buffer đầy
+
     def open(self):
         if self.mode == "webcam":
             self.cap = cv2.VideoCapture(0)
         else:
             self.cap = cv2.VideoCapture(self.path)
 
-    def read_frame(self):
+        self.src_fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.opened_at = time.time()
+        if self.start and self.mode != "webcam":
+            self.seek(self.start)
+
+        if self.prefetch:
+            self._buffer = queue.Queue(maxsize=self.prefetch)
+            self._thread = threading.Thread(target=self._prefetch_loop, name="video-prefetch", daemon=True)
+            self._thread.start()
+
+    # ==========================
+    #   SEEK / LẤY MẪU
+    # ==========================
+    def seek(self, seconds):
+        """Nhảy tới vị trí `seconds` (file video). Gọi trước khi bắt đầu đọc."""
+        self.cap.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000.0)
+        pos = self.cap.get(cv2.CAP_PROP_POS_FRAMES)
+        self.index = int(pos) - 1 if pos else int(seconds * self.src_fps) - 1
+        self._next_t = None
+
+    def _timestamp(self):
+        if self.mode == "webcam":
+            return time.time()
+        if self.src_fps > 0:
+            return self.index / self.src_fps
+        return self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+    def _keep(self, ts):
+        """Frame này có được giữ lại không (stride, rồi target_fps)."""
+        if self.stride > 1 and self.index % self.stride:
+            return False
+        if not self.target_fps:
+            return True
+
+        period = 1.0 / self.target_fps
+        # 1e-6: sai số float khi fps nguồn chia hết cho target_fps
+        if self._next_t is None or ts >= self._next_t - 1e-6:
+            # nguồn bị trễ / nhảy (webcam) -> tính lại mốc từ frame này
+            if self._next_t is None or ts - self._next_t > period:
+                self._next_t = ts
+            self._next_t += period
+            return True
+        return False
+
+    def _read_next(self):
+        """Đọc trực tiếp frame giữ tiếp theo -> VideoFrame, None khi hết nguồn / hết đoạn."""
+        while True:
+            if not self.cap.grab():
+                return _END
+            self.index += 1
+            self.grabbed += 1
+
+            ts = self._timestamp()
+            if self.end is not None and self.mode != "webcam" and ts > self.end:
+                return _END
+            if not self._keep(ts):
+                continue
+
+            ok, image = self.cap.retrieve()
+            if not ok:
+                return _END
+            self.decoded += 1
+            return VideoFrame(self.index, ts, image)
+
+    # ==========================
+    #   PREFETCH
+    # ==========================
+    def _prefetch_loop(self):
+        try:
+            while not self._stop.is_set():
+                frame = self._read_next()
+                if frame is _END:
+                    break
+                self._put(frame)
+        finally:
+            self._put(_END, final=True)
+
+    def _put(self, item, final=False):
+        while not self._stop.is_set():
+            try:
+                self._buffer.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self.mode == "webcam" and not final:
+                    # webcam: bỏ frame cũ nhất, luôn giữ frame mới
+                    try:
+                        self._buffer.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    # ==========================
+    #   ĐỌC
+    # ==========================
+    def read(self):
+        """-> VideoFrame tiếp theo (đã lấy mẫu), None khi hết nguồn."""
         if not self.cap:
+            return None
+        if self._buffer is None:
+            return self._read_next()
+
+        while True:
+            try:
+                frame = self._buffer.get(timeout=0.1)
+                break
+            except queue.Empty:
+                # release() từ thread khác hoặc thread prefetch đã dừng
+                if self._stop.is_set() or not self._thread.is_alive():
+                    return None
+        if frame is _END:
+            # để các lần read() sau (nếu có) cũng thấy hết nguồn
+            self._stop.set()
+        return frame
+
+    def read_frame(self):
+        """Interface cũ: -> (ok, image)."""
+        frame = self.read()
+        if frame is None:
             return False, None
-        return self.cap.read()
+        return True, frame.image
+
+    def log_time(self, frame):
+        """
+        Timestamp ghi log cho frame: webcam giữ thời điểm chụp; file video
+        = lúc mở nguồn + vị trí trong video, nên khoảng cách giữa các dòng
+        log đúng theo video kể cả khi lấy mẫu / xử lý nhanh hơn thời gian thực.
+        """
+        if self.mode == "webcam":
+            return frame.timestamp
+        return self.opened_at + frame.timestamp - (self.start or 0.0)
+
+    def fps(self):
+        """fps của nguồn (chưa lấy mẫu)."""
+        return self.src_fps
+
+    def output_fps(self):
+        """fps sau khi lấy mẫu (ước lượng), 0 nếu không biết."""
+        fps = self.src_fps / self.stride if self.src_fps else 0.0
+        if self.target_fps:
+            fps = min(fps, self.target_fps) if fps else self.target_fps
+        return fps
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "src_fps": self.src_fps,
+            "output_fps": self.output_fps(),
+            "stride": self.stride,
+            "target_fps": self.target_fps,
+            "grabbed": self.grabbed,
+            "decoded": self.decoded,
+            "buffered": self._buffer.qsize() if self._buffer is not None else 0,
+            "dropped": self.dropped,
+        }
 
     def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            # rút bớt buffer để thread prefetch không kẹt ở put()
+            while self._thread.is_alive():
+                try:
+                    self._buffer.get_nowait()
+                except queue.Empty:
+                    pass
+                self._thread.join(timeout=0.1)
+            self._thread = None
         if self.cap:
             self.cap.release()
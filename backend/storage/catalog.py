@@ -0,0 +1,535 @@
+"""
+Catalog các session (SQLite, output/catalog.sqlite3): metadata + summary tính
+sẵn của từng session, cập nhật khi session đóng. Truy vấn nhiều session
+(khoảng ngày, mode, engagement trung bình, tỉ lệ emotion) chỉ đọc index,
+không mở log nào.
+
+    sessions          1 dòng / session (mode, thời gian, số frame, avg/min/max/...)
+    session_emotions  (session_id, emotion, count) cho truy vấn theo tỉ lệ emotion
+
+Log thô của session cũ có thể nén vào output/archive/<YYYY-MM>.zip (compact),
+summary vẫn nằm trong catalog + sidecar nên vẫn truy vấn / report được.
+
+    python -m backend.storage.catalog reindex                 # dựng lại từ output/logs
+    python -m backend.storage.catalog query --mode video --min-avg 0.5
+    python -m backend.storage.catalog compact --older-than-days 30
+    python -m backend.storage.catalog restore <session_id>
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+from backend.core.config import CATALOG_ENABLED, CATALOG_PATH, ARCHIVE_DIR, OUTPUT_LOG_DIR
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id   TEXT PRIMARY KEY,
+    mode         TEXT,
+    video_path   TEXT,
+    started_at   REAL,
+    ended_at     REAL,
+    duration     REAL,
+    frames       INTEGER,
+    avg          REAL,
+    min          REAL,
+    max          REAL,
+    std          REAL,
+    quantiles    TEXT,
+    dominant     TEXT,
+    log_format   TEXT,
+    status       TEXT,
+    archive_path TEXT,
+    updated_at   REAL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_started ON sessions(started_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_mode ON sessions(mode, started_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_avg ON sessions(avg);
+
+CREATE TABLE IF NOT EXISTS session_emotions (
+    session_id TEXT NOT NULL,
+    emotion    TEXT NOT NULL,
+    count      INTEGER NOT NULL,
+    PRIMARY KEY (session_id, emotion)
+);
+CREATE INDEX IF NOT EXISTS idx_emotions_emotion ON session_emotions(emotion);
+"""
+
+# status: "active" (đang chạy) | "closed" (log đầy đủ) | "archived" (log đã nén)
+ORDER_COLUMNS = ("started_at", "ended_at", "avg", "frames", "duration")
+
+
+def parse_time(value):
+    """epoch (số / chuỗi số) hoặc ISO ("2025-12-01", "2025-12-01T08:00") -> epoch giây."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def session_epoch(session_id):
+    """ID dạng "<epoch>" / "<epoch>_<hex>" -> epoch, None nếu không phải."""
+    head = session_id.split("_", 1)[0]
+    return float(head) if head.isdigit() else None
+
+
+class SessionCatalog:
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ==========================
+    #   GHI
+    # ==========================
+    def register(self, session_id, mode, video_path=None, started_at=None):
+        """Session mới bắt đầu (SessionManager.create_session)."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO sessions (session_id, mode, video_path, started_at, status, updated_at)
+                VALUES (?, ?, ?, ?, 'active', ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    mode = excluded.mode, video_path = excluded.video_path,
+                    started_at = excluded.started_at, status = 'active', updated_at = excluded.updated_at
+                """,
+                (session_id, mode, video_path, started_at or now, now),
+            )
+
+    def record_summary(self, session_id, summary, duration=None, log_format=None,
+                       ended_at=None, mode=None, started_at=None):
+        """
+        Summary của session đã đóng (SummaryLogWriter.close / reindex).
+        summary: dict của RunningStats.summary().
+        """
+        now = time.time()
+        ended_at = ended_at or now
+        distribution = summary.get("emotion_distribution") or {}
+        frames = summary.get("count")
+        if frames is None:
+            frames = sum(distribution.values())
+        dominant = max(distribution, key=distribution.get) if distribution else None
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO sessions (session_id, mode, started_at, ended_at, duration, frames,
+                                      avg, min, max, std, quantiles, dominant, log_format,
+                                      status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'closed', ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    mode = COALESCE(sessions.mode, excluded.mode),
+                    started_at = COALESCE(sessions.started_at, excluded.started_at),
+                    ended_at = excluded.ended_at, duration = excluded.duration,
+                    frames = excluded.frames, avg = excluded.avg, min = excluded.min,
+                    max = excluded.max, std = excluded.std, quantiles = excluded.quantiles,
+                    dominant = excluded.dominant, log_format = excluded.log_format,
+                    status = 'closed', archive_path = NULL, updated_at = excluded.updated_at
+                """,
+                (
+                    session_id, mode,
+                    started_at or session_epoch(session_id) or ended_at,
+                    ended_at, duration, frames,
+                    summary.get("avg"), summary.get("min"), summary.get("max"), summary.get("std"),
+                    json.dumps(summary.get("quantiles") or {}), dominant, log_format, now,
+                ),
+            )
+            self._conn.execute("DELETE FROM session_emotions WHERE session_id = ?", (session_id,))
+            self._conn.executemany(
+                "INSERT INTO session_emotions (session_id, emotion, count) VALUES (?, ?, ?)",
+                [(session_id, emo, int(n)) for emo, n in distribution.items()],
+            )
+
+    def mark_archived(self, session_id, archive_path):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET status = 'archived', archive_path = ?, updated_at = ? WHERE session_id = ?",
+                (archive_path, time.time(), session_id),
+            )
+
+    def mark_restored(self, session_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET status = 'closed', archive_path = NULL, updated_at = ? WHERE session_id = ?",
+                (time.time(), session_id),
+            )
+
+    # ==========================
+    #   ĐỌC
+    # ==========================
+    def _row(self, row, emotions=None):
+        item = dict(row)
+        item["quantiles"] = json.loads(item["quantiles"]) if item.get("quantiles") else {}
+        if emotions is not None:
+            item["emotion_distribution"] = emotions
+        return item
+
+    def _emotions(self, session_ids):
+        out = {sid: {} for sid in session_ids}
+        if not session_ids:
+            return out
+        # chia nhỏ để không vượt giới hạn số tham số của SQLite
+        for i in range(0, len(session_ids), 500):
+            chunk = session_ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT session_id, emotion, count FROM session_emotions "
+                f"WHERE session_id IN ({marks}) ORDER BY count DESC",
+                chunk,
+            )
+            for sid, emo, n in rows:
+                out[sid][emo] = n
+        return out
+
+    def get(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            return self._row(row, self._emotions([session_id])[session_id])
+
+    def summary(self, session_id):
+        """Summary cùng dạng RunningStats.summary(), None nếu session chưa đóng."""
+        item = self.get(session_id)
+        if item is None or item["frames"] is None:
+            return None
+        return {
+            "avg": item["avg"], "max": item["max"], "min": item["min"],
+            "emotion_distribution": item["emotion_distribution"],
+            "count": item["frames"], "std": item["std"], "quantiles": item["quantiles"],
+        }
+
+    @staticmethod
+    def _where(start=None, end=None, mode=None, status=None, min_avg=None, max_avg=None,
+               emotion=None, min_share=None):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("s.started_at >= ?")
+            params.append(parse_time(start))
+        if end is not None:
+            clauses.append("s.started_at < ?")
+            params.append(parse_time(end))
+        if mode:
+            clauses.append("s.mode = ?")
+            params.append(mode)
+        if status:
+            clauses.append("s.status = ?")
+            params.append(status)
+        if min_avg is not None:
+            clauses.append("s.avg >= ?")
+            params.append(min_avg)
+        if max_avg is not None:
+            clauses.append("s.avg <= ?")
+            params.append(max_avg)
+        if emotion:
+            # tỉ lệ frame có emotion này trong session >= min_share
+            clauses.append(
+                "EXISTS (SELECT 1 FROM session_emotions e WHERE e.session_id = s.session_id "
+                "AND e.emotion = ? AND e.count >= ? * s.frames)"
+            )
+            params.extend([emotion, min_share or 0.0])
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def query(self, order="started_at", desc=True, limit=100, offset=0, **filters):
+        """
+        Danh sách session theo bộ lọc (xem _where), mới nhất trước.
+        -> {"total", "sessions": [...]}
+        """
+        if order not in ORDER_COLUMNS:
+            raise ValueError(f"order không hợp lệ: {order} (chọn {ORDER_COLUMNS})")
+        where, params = self._where(**filters)
+        direction = "DESC" if desc else "ASC"
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM sessions s{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT s.* FROM sessions s{where} ORDER BY s.{order} {direction} LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+            emotions = self._emotions([r["session_id"] for r in rows])
+
+        return {
+            "total": total,
+            "sessions": [self._row(r, emotions[r["session_id"]]) for r in rows],
+        }
+
+    def aggregate(self, **filters):
+        """
+        Tổng hợp cả nhóm session (cohort): số session, tổng frame, engagement
+        trung bình theo frame, min / max, tỉ lệ emotion.
+        """
+        where, params = self._where(**filters)
+        with self._lock:
+            row = self._conn.execute(
+                f"""
+                SELECT COUNT(*) AS sessions, SUM(s.frames) AS frames, SUM(s.duration) AS duration,
+                       SUM(s.avg * s.frames) / NULLIF(SUM(s.frames), 0) AS avg,
+                       AVG(s.avg) AS avg_per_session,
+                       MIN(s.min) AS min, MAX(s.max) AS max,
+                       MIN(s.started_at) AS first_started, MAX(s.started_at) AS last_started
+                FROM sessions s{where}
+                """,
+                params,
+            ).fetchone()
+            emotion_rows = self._conn.execute(
+                f"""
+                SELECT e.emotion, SUM(e.count) FROM session_emotions e
+                WHERE e.session_id IN (SELECT s.session_id FROM sessions s{where})
+                GROUP BY e.emotion ORDER BY SUM(e.count) DESC
+                """,
+                params,
+            ).fetchall()
+
+        result = dict(row)
+        result["frames"] = result["frames"] or 0
+        counts = {emo: n for emo, n in emotion_rows}
+        total = sum(counts.values())
+        result["emotion_distribution"] = counts
+        result["emotion_share"] = {emo: n / total for emo, n in counts.items()} if total else {}
+        return result
+
+    def session_ids(self):
+        with self._lock:
+            return {r[0] for r in self._conn.execute("SELECT session_id FROM sessions")}
+
+
+# ==========================
+#   INSTANCE DÙNG CHUNG
+# ==========================
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Catalog của process (mở lần đầu dùng), None nếu CATALOG_ENABLED=False."""
+    global _catalog
+    if not CATALOG_ENABLED:
+        return None
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = SessionCatalog()
+        return _catalog
+
+
+def safe_call(method, *args, **kwargs):
+    """Gọi 1 method của catalog, lỗi catalog không được làm hỏng ghi log."""
+    catalog = get_catalog()
+    if catalog is None:
+        return None
+    try:
+        return getattr(catalog, method)(*args, **kwargs)
+    except Exception:
+        logger.exception("[catalog] %s lỗi", method)
+        return None
+
+
+# ==========================
+#   REINDEX / COMPACT / RESTORE
+# ==========================
+def _session_files(session_id, log_dir=OUTPUT_LOG_DIR):
+    """Các file / thư mục log thô của session (trừ sidecar summary)."""
+    prefix = f"{session_id}."
+    out = []
+    for name in os.listdir(log_dir):
+        if name.startswith(prefix) and not name.endswith(".summary.json"):
+            out.append(os.path.join(log_dir, name))
+    return out
+
+
+def _log_session_ids(log_dir=OUTPUT_LOG_DIR):
+    from backend.storage.log_writer import LOG_SUFFIXES
+
+    ids = set()
+    for name in os.listdir(log_dir):
+        for suffix in LOG_SUFFIXES.values():
+            if name.endswith(suffix):
+                ids.add(name[: -len(suffix)])
+    return ids
+
+
+def reindex(catalog=None, log_dir=OUTPUT_LOG_DIR, force=False):
+    """
+    Đưa các log đã có vào catalog (log cũ trước khi có catalog, hoặc catalog bị
+    xoá). Dùng sidecar summary nếu có, không thì đọc log 1 lần.
+    -> số session đã thêm / cập nhật.
+    """
+    from backend.analysis.running_stats import RunningStats
+    from backend.storage.log_writer import find_log, load_log, load_summary, save_summary, is_live
+
+    catalog = catalog or get_catalog()
+    if not os.path.isdir(log_dir):
+        return 0
+    known = set() if force else catalog.session_ids()
+    updated = 0
+
+    for session_id in sorted(_log_session_ids(log_dir) - known):
+        if is_live(session_id):
+            continue
+        path, fmt = find_log(session_id)
+        try:
+            df = load_log(session_id)
+        except Exception:
+            logger.warning("[catalog] không đọc được log %s", session_id)
+            continue
+
+        summary = load_summary(session_id)
+        if summary is None:
+            summary = RunningStats.from_frame(df).summary()
+            save_summary(session_id, summary)
+
+        duration = float(df["timestamp"].iloc[-1] - df["timestamp"].iloc[0]) if len(df) else 0.0
+        ended_at = os.path.getmtime(path)
+        catalog.record_summary(
+            session_id, summary, duration=duration, log_format=fmt, ended_at=ended_at,
+            mode="unknown", started_at=session_epoch(session_id) or ended_at - duration,
+        )
+        updated += 1
+    return updated
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        for name in os.listdir(path):
+            os.remove(os.path.join(path, name))
+        os.rmdir(path)
+    else:
+        os.remove(path)
+
+
+def compact(older_than_days=30, catalog=None, log_dir=OUTPUT_LOG_DIR, archive_dir=ARCHIVE_DIR,
+            dry_run=False):
+    """
+    Nén log thô của các session đã đóng, bắt đầu trước `older_than_days` ngày, vào
+    archive_dir/<YYYY-MM>.zip (theo tháng bắt đầu session) rồi xoá bản gốc.
+    Sidecar summary giữ nguyên. -> list session_id đã nén.
+    """
+    from backend.storage.log_writer import is_live
+
+    catalog = catalog or get_catalog()
+    cutoff = time.time() - older_than_days * 86400
+    candidates = catalog.query(status="closed", end=cutoff, order="started_at", desc=False,
+                               limit=-1)["sessions"]
+
+    compacted = []
+    for item in candidates:
+        session_id = item["session_id"]
+        if is_live(session_id):
+            continue
+        files = _session_files(session_id, log_dir)
+        if not files:
+            continue
+        if dry_run:
+            compacted.append(session_id)
+            continue
+
+        month = datetime.fromtimestamp(item["started_at"]).strftime("%Y-%m")
+        os.makedirs(archive_dir, exist_ok=True)
+        archive = os.path.join(archive_dir, f"{month}.zip")
+        with zipfile.ZipFile(archive, "a", compression=zipfile.ZIP_DEFLATED) as zf:
+            existing = set(zf.namelist())
+            for path in files:
+                targets = [path]
+                if os.path.isdir(path):
+                    targets = [os.path.join(path, n) for n in sorted(os.listdir(path))]
+                for target in targets:
+                    arcname = os.path.relpath(target, log_dir).replace(os.sep, "/")
+                    if arcname not in existing:
+                        zf.write(target, arcname)
+
+        # chỉ xoá bản gốc sau khi zip đã ghi xong
+        for path in files:
+            _remove(path)
+        catalog.mark_archived(session_id, archive)
+        compacted.append(session_id)
+
+    return compacted
+
+
+def restore(session_id, catalog=None, log_dir=OUTPUT_LOG_DIR):
+    """Giải nén log thô của 1 session đã archive về log_dir. -> True nếu có."""
+    catalog = catalog or get_catalog()
+    item = catalog.get(session_id)
+    if item is None or item["status"] != "archived" or not item["archive_path"]:
+        return False
+
+    prefix = f"{session_id}."
+    with zipfile.ZipFile(item["archive_path"]) as zf:
+        names = [n for n in zf.namelist() if n.startswith(prefix)]
+        zf.extractall(log_dir, members=names)
+    catalog.mark_restored(session_id)
+    return bool(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog session (SQLite)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("reindex", help="đưa các log trong output/logs vào catalog")
+    p.add_argument("--force", action="store_true", help="tính lại cả session đã có")
+
+    p = sub.add_parser("query", help="liệt kê session theo bộ lọc")
+    p.add_argument("--start", default=None, help="epoch hoặc ISO, vd. 2025-12-01")
+    p.add_argument("--end", default=None)
+    p.add_argument("--mode", default=None)
+    p.add_argument("--status", default=None)
+    p.add_argument("--min-avg", type=float, default=None)
+    p.add_argument("--max-avg", type=float, default=None)
+    p.add_argument("--emotion", default=None)
+    p.add_argument("--min-share", type=float, default=None)
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--aggregate", action="store_true", help="chỉ in tổng hợp cả nhóm")
+
+    p = sub.add_parser("compact", help="nén log thô của session cũ vào output/archive")
+    p.add_argument("--older-than-days", type=float, default=30)
+    p.add_argument("--dry-run", action="store_true")
+
+    p = sub.add_parser("restore", help="giải nén log thô của 1 session")
+    p.add_argument("session_id")
+
+    args = parser.parse_args()
+    catalog = SessionCatalog()
+
+    if args.command == "reindex":
+        print(f"Đã index {reindex(catalog, force=args.force)} session")
+    elif args.command == "query":
+        filters = {
+            "start": args.start, "end": args.end, "mode": args.mode, "status": args.status,
+            "min_avg": args.min_avg, "max_avg": args.max_avg,
+            "emotion": args.emotion, "min_share": args.min_share,
+        }
+        if args.aggregate:
+            result = catalog.aggregate(**filters)
+        else:
+            result = catalog.query(limit=args.limit, **filters)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    elif args.command == "compact":
+        done = compact(args.older_than_days, catalog, dry_run=args.dry_run)
+        print(("Sẽ nén" if args.dry_run else "Đã nén") + f" {len(done)} session")
+    elif args.command == "restore":
+        print("OK" if restore(args.session_id, catalog) else "Không tìm thấy trong archive")
+
+
+if __name__ == "__main__":
+    main()
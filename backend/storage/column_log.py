@@ -0,0 +1,188 @@
+"""
+Log session dạng cột (columnar): mỗi cột 1 file nhị phân kiểu cố định trong
+thư mục <session_id>.cols/, emotion được mã hoá theo từ điển (uint8).
+
+    timestamp.f8   float64
+    emotion.u1     uint8   (mã -> tên emotion trong meta.json)
+    eng_raw.f8     float64
+    eng_smooth.f8  float64
+    meta.json      {"columns": ..., "emotions": [...], "rows": N}
+
+Ghi theo lô: write() chỉ append vào buffer trong RAM, thread nền flush xuống
+file theo chu kỳ hoặc khi buffer đầy. Đọc lại bằng np.fromfile, không parse text.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+from backend.core.config import LOG_FLUSH_ROWS, LOG_FLUSH_INTERVAL
+
+COLUMN_LOG_SUFFIX = ".cols"
+
+# tên cột -> dtype
+COLUMNS = {
+    "timestamp": np.float64,
+    "emotion": np.uint8,
+    "eng_raw": np.float64,
+    "eng_smooth": np.float64,
+}
+
+META_FILE = "meta.json"
+
+
+def column_file(path, name, dtype):
+    return os.path.join(path, f"{name}.{np.dtype(dtype).str[1:]}")
+
+
+class ColumnFileWriter:
+    """
+    Ghi bảng nhiều cột vào thư mục `path`, mỗi cột 1 file nhị phân.
+
+    columns: tên -> dtype, hoặc tên -> (dtype, width) cho cột vector
+    (mỗi dòng `width` phần tử, vd. box 4 số, vector xác suất).
+    append() chỉ thêm vào buffer, thread nền flush theo lô.
+    """
+
+    def __init__(self, path, columns, flush_rows=LOG_FLUSH_ROWS, flush_interval=LOG_FLUSH_INTERVAL):
+        self.path = path
+        self.columns = {
+            name: spec if isinstance(spec, tuple) else (spec, 1)
+            for name, spec in columns.items()
+        }
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        os.makedirs(path, exist_ok=True)
+        self._files = {
+            name: open(column_file(path, name, dtype), "wb")
+            for name, (dtype, _) in self.columns.items()
+        }
+        self._buffers = {name: [] for name in self.columns}
+        self.rows = 0
+
+        self._lock = threading.Lock()       # bảo vệ buffer
+        self._io_lock = threading.Lock()    # chỉ 1 lần flush tại 1 thời điểm
+        self._wake = threading.Event()
+        self._closed = False
+
+        self._write_meta()
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def append(self, *values):
+        """1 dòng, giá trị theo thứ tự cột. -> False nếu writer đã đóng."""
+        with self._lock:
+            if self._closed:
+                return False
+            for buf, value in zip(self._buffers.values(), values):
+                buf.append(value)
+            full = len(next(iter(self._buffers.values()))) >= self.flush_rows
+
+        if full:
+            self._wake.set()
+        return True
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._io_lock:
+            # đổi buffer dưới lock, ghi file ngoài lock để append() không bị chặn
+            with self._lock:
+                buffers = self._buffers
+                n = len(next(iter(buffers.values())))
+                if not n:
+                    return
+                self._buffers = {name: [] for name in self.columns}
+                extra = self.meta_extra()
+
+            for name, (dtype, _) in self.columns.items():
+                np.asarray(buffers[name], dtype=dtype).tofile(self._files[name])
+                self._files[name].flush()
+
+            self.rows += n
+            self._write_meta(extra)
+
+    def meta_extra(self):
+        """Thông tin thêm ghi vào meta.json (gọi khi đang giữ lock buffer)."""
+        return {}
+
+    def _write_meta(self, extra=None):
+        meta = {
+            "columns": {name: np.dtype(dtype).str for name, (dtype, _) in self.columns.items()},
+            "widths": {name: width for name, (_, width) in self.columns.items() if width != 1},
+            "rows": self.rows,
+            **(extra or {}),
+        }
+        # ghi file tạm rồi rename để reader không đọc phải meta ghi dở
+        tmp = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        self._thread.join()
+
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+
+class ColumnLogWriter(ColumnFileWriter):
+    """Cùng interface với LogWriter: write(ts, emo, raw, smooth) + close()."""
+
+    def __init__(self, path, **kwargs):
+        self._emotions = {}   # tên -> mã
+        super().__init__(path, COLUMNS, **kwargs)
+
+    def _code(self, emo):
+        code = self._emotions.get(emo)
+        if code is None:
+            code = len(self._emotions)
+            if code > np.iinfo(np.uint8).max:
+                raise ValueError("Quá nhiều emotion khác nhau cho cột uint8")
+            self._emotions[emo] = code
+        return code
+
+    def write(self, ts, emo, raw, smooth):
+        """ValueError nếu writer đã đóng, giống file CSV (pipeline dựa vào đó để dừng)."""
+        with self._lock:
+            code = self._code(emo)
+        if not self.append(ts, code, raw, smooth):
+            raise ValueError("I/O operation on closed column log.")
+
+    def meta_extra(self):
+        return {"emotions": list(self._emotions)}
+
+
+def load_columns(path, mmap=False):
+    """
+    Đọc bảng cột -> (dict tên cột -> np.ndarray, meta).
+    Chỉ lấy số dòng đã ghi trong meta.json (bỏ phần đang flush dở).
+    mmap=True: memory-map thay vì đọc hết (chỉ chạm tới các dòng được index).
+    """
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+
+    rows = meta["rows"]
+    widths = meta.get("widths", {})
+    columns = {}
+    for name, dtype in meta["columns"].items():
+        width = widths.get(name, 1)
+        shape = (rows, width) if width != 1 else (rows,)
+        file = column_file(path, name, dtype)
+        if mmap and rows:
+            columns[name] = np.memmap(file, dtype=dtype, mode="r", shape=shape)
+        else:
+            columns[name] = np.fromfile(file, dtype=dtype, count=rows * width).reshape(shape)
+    return columns, meta
@@ -0,0 +1,201 @@
+"""
+Lưu kết quả từng mặt (từng học sinh) của session, dạng cột trong
+<session_id>.faces/ (xem column_log.ColumnFileWriter):
+
+    timestamp   float64
+    track       uint32        track ID (FaceTracker) = 1 học sinh
+    box         int32 x 4     x, y, w, h
+    probs       float32 x E   xác suất theo EMOTION_LABELS
+    engagement  float32
+
+Khi đóng session ghi thêm index theo học sinh (students.npz: các dòng của
+từng track, gom liền nhau) + tổng hợp từng học sinh (students.json), nên truy
+vấn 1 học sinh chỉ đọc đúng các dòng của học sinh đó.
+"""
+import json
+import os
+from collections import Counter
+
+import numpy as np
+
+from backend.core.config import OUTPUT_LOG_DIR
+from backend.models.emotion_labels import EMOTION_LABELS
+from backend.storage.column_log import ColumnFileWriter, load_columns, column_file
+from backend.analysis.downsampling import lttb
+
+FACE_STORE_SUFFIX = ".faces"
+INDEX_FILE = "students.npz"
+SUMMARY_FILE = "students.json"
+
+FACE_COLUMNS = {
+    "timestamp": np.float64,
+    "track": np.uint32,
+    "box": (np.int32, 4),
+    "probs": (np.float32, len(EMOTION_LABELS)),
+    "engagement": np.float32,
+}
+
+
+def face_store_path(session_id):
+    return os.path.join(OUTPUT_LOG_DIR, f"{session_id}{FACE_STORE_SUFFIX}")
+
+
+class _StudentStats:
+    def __init__(self):
+        self.count = 0
+        self.eng_sum = 0.0
+        self.eng_min = float("inf")
+        self.eng_max = float("-inf")
+        self.first_ts = None
+        self.last_ts = None
+        self.emotions = Counter()
+
+    def update(self, ts, emotion, engagement):
+        self.count += 1
+        self.eng_sum += engagement
+        self.eng_min = min(self.eng_min, engagement)
+        self.eng_max = max(self.eng_max, engagement)
+        if self.first_ts is None:
+            self.first_ts = ts
+        self.last_ts = ts
+        self.emotions[emotion] += 1
+
+    def to_dict(self):
+        return {
+            "frames": self.count,
+            "avg": self.eng_sum / self.count if self.count else 0.0,
+            "min": self.eng_min if self.count else 0.0,
+            "max": self.eng_max if self.count else 0.0,
+            "first_ts": self.first_ts,
+            "last_ts": self.last_ts,
+            "dominant": self.emotions.most_common(1)[0][0] if self.emotions else None,
+            "emotion_distribution": dict(self.emotions.most_common()),
+        }
+
+
+class FaceRecordWriter:
+    """Ghi từng mặt của mỗi frame, giữ tổng hợp theo học sinh trong RAM."""
+
+    def __init__(self, session_id):
+        self.path = face_store_path(session_id)
+        self.table = ColumnFileWriter(self.path, FACE_COLUMNS)
+        self.students = {}   # track_id -> _StudentStats
+
+    def write(self, ts, faces):
+        """faces: list dict {id, x, y, w, h, emotion, engagement, probs}."""
+        for f in faces:
+            probs = f["probs"]
+            ok = self.table.append(
+                ts,
+                f["id"],
+                (f["x"], f["y"], f["w"], f["h"]),
+                [probs.get(label, 0.0) for label in EMOTION_LABELS],
+                f["engagement"],
+            )
+            if not ok:
+                return
+
+            stats = self.students.get(f["id"])
+            if stats is None:
+                stats = self.students[f["id"]] = _StudentStats()
+            stats.update(ts, f["emotion"], f["engagement"])
+
+    def close(self):
+        self.table.close()
+
+        # index theo học sinh: vị trí các dòng của mỗi track, gom liền nhau
+        track = np.fromfile(column_file(self.path, "track", np.uint32), dtype=np.uint32)
+        build_index(self.path, track)
+
+        summary = {str(tid): s.to_dict() for tid, s in sorted(self.students.items())}
+        with open(os.path.join(self.path, SUMMARY_FILE), "w", encoding="utf-8") as f:
+            json.dump(summary, f)
+
+
+def build_index(path, track):
+    order = np.argsort(track, kind="stable").astype(np.uint32)
+    track_ids, offsets, counts = np.unique(track[order], return_index=True, return_counts=True)
+    np.savez(os.path.join(path, INDEX_FILE), track_ids=track_ids, offsets=offsets,
+             counts=counts, order=order)
+    return track_ids, offsets, counts, order
+
+
+class FaceStore:
+    """Đọc kết quả từng học sinh của 1 session (memory-map, không đọc cả bảng)."""
+
+    def __init__(self, session_id):
+        self.path = face_store_path(session_id)
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(self.path)
+
+        self.columns, self.meta = load_columns(self.path, mmap=True)
+
+        index_file = os.path.join(self.path, INDEX_FILE)
+        if os.path.exists(index_file):
+            with np.load(index_file) as data:
+                self.track_ids = data["track_ids"]
+                self.offsets = data["offsets"]
+                self.counts = data["counts"]
+                self.order = data["order"]
+        else:
+            # session đang chạy: dựng index từ cột track (chỉ đọc cột này)
+            track = np.asarray(self.columns.get("track", np.empty(0, np.uint32)))
+            self.order = np.argsort(track, kind="stable")
+            self.track_ids, self.offsets, self.counts = np.unique(
+                track[self.order], return_index=True, return_counts=True)
+
+    def _rows(self, track_id):
+        i = int(np.searchsorted(self.track_ids, track_id))
+        if i >= len(self.track_ids) or self.track_ids[i] != track_id:
+            return None
+        start = int(self.offsets[i])
+        # argsort stable -> các dòng của 1 track vẫn theo thứ tự thời gian
+        return self.order[start:start + int(self.counts[i])]
+
+    def students(self):
+        """Tổng hợp mọi học sinh: track_id -> {frames, avg, min, max, dominant, ...}."""
+        summary_file = os.path.join(self.path, SUMMARY_FILE)
+        if os.path.exists(summary_file):
+            with open(summary_file, encoding="utf-8") as f:
+                return json.load(f)
+        return {str(int(tid)): self._summarize(self._rows(tid)) for tid in self.track_ids}
+
+    def _summarize(self, rows):
+        eng = np.asarray(self.columns["engagement"][rows], dtype=np.float64)
+        ts = self.columns["timestamp"][rows]
+        emotions = Counter(EMOTION_LABELS[i] for i in self.columns["probs"][rows].argmax(axis=1))
+        return {
+            "frames": len(rows),
+            "avg": float(eng.mean()),
+            "min": float(eng.min()),
+            "max": float(eng.max()),
+            "first_ts": float(ts[0]),
+            "last_ts": float(ts[-1]),
+            "dominant": emotions.most_common(1)[0][0],
+            "emotion_distribution": dict(emotions.most_common()),
+        }
+
+    def student(self, track_id, points=500):
+        """
+        Tổng hợp + timeline của 1 học sinh (timeline rút gọn bằng LTTB
+        còn tối đa `points` điểm). -> None nếu không có track này.
+        """
+        rows = self._rows(track_id)
+        if rows is None:
+            return None
+
+        ts = np.asarray(self.columns["timestamp"][rows])
+        eng = np.asarray(self.columns["engagement"][rows], dtype=np.float64)
+        probs = np.asarray(self.columns["probs"][rows], dtype=np.float64)
+
+        keep = lttb(ts, eng, points)
+        return {
+            "track_id": int(track_id),
+            "summary": self._summarize(rows),
+            "mean_probs": dict(zip(EMOTION_LABELS, probs.mean(axis=0).tolist())),
+            "timeline": {
+                "t": ts[keep].tolist(),
+                "engagement": eng[keep].tolist(),
+                "emotion": [EMOTION_LABELS[i] for i in probs[keep].argmax(axis=1)],
+            },
+        }
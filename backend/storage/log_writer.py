@@ -1,13 +1,243 @@
 import csv
+import json
+import os
+import threading
+
+import numpy as np
+
+from backend.core.config import OUTPUT_LOG_DIR, LOG_FORMAT, FACE_STORE_ENABLED
+from backend.analysis.running_stats import RunningStats
+from backend.core.metrics import stage_timer
+from backend.storage.column_log import ColumnLogWriter, load_columns, COLUMN_LOG_SUFFIX
+from backend.storage.face_store import FaceRecordWriter
+from backend.storage.catalog import get_catalog, safe_call
+from backend.utils.file_utils import ensure_dir
+
+LOG_COLUMNS = ["timestamp", "emotion", "eng_raw", "eng_smooth"]
+
+LOG_SUFFIXES = {
+    "csv": ".csv",
+    "columnar": COLUMN_LOG_SUFFIX,
+}
+
 
 class LogWriter:
     def __init__(self, path):
         self.f = open(path, "w", newline="")
         self.writer = csv.writer(self.f)
-        self.writer.writerow(["timestamp", "emotion", "eng_raw", "eng_smooth"])
+        self.writer.writerow(LOG_COLUMNS)
 
     def write(self, ts, emo, raw, smooth):
         self.writer.writerow([ts, emo, raw, smooth])
 
     def close(self):
         self.f.close()
+
+
+class SummaryLogWriter:
+    """
+    Bọc writer thật, cập nhật RunningStats theo từng dòng. Khi close() ghi
+    sidecar <session_id>.summary.json để report không phải đọc lại cả log.
+    Nếu có face_writer thì write_faces() lưu thêm kết quả từng mặt (face_store).
+    close() cũng cập nhật summary vào catalog session.
+    """
+
+    def __init__(self, session_id, writer, face_writer=None, log_format=None):
+        self.session_id = session_id
+        self.writer = writer
+        self.face_writer = face_writer
+        self.log_format = log_format
+        self.stats = RunningStats()
+        self.first_ts = None
+        self.last_ts = None
+        self._lock = threading.Lock()
+
+    def write(self, ts, emo, raw, smooth):
+        with stage_timer("log_write"):
+            self.writer.write(ts, emo, raw, smooth)
+            with self._lock:
+                self.stats.update(emo, smooth)
+                if self.first_ts is None:
+                    self.first_ts = ts
+                self.last_ts = ts
+
+    def write_faces(self, ts, faces):
+        if self.face_writer is not None:
+            with stage_timer("face_write"):
+                self.face_writer.write(ts, faces)
+
+    def summary(self):
+        with self._lock:
+            return self.stats.summary()
+
+    def close(self):
+        self.writer.close()
+        if self.face_writer is not None:
+            self.face_writer.close()
+        summary = self.summary()
+        save_summary(self.session_id, summary)
+        with _live_lock:
+            _live.pop(self.session_id, None)
+
+        duration = self.last_ts - self.first_ts if self.first_ts is not None else 0.0
+        safe_call("record_summary", self.session_id, summary,
+                  duration=duration, log_format=self.log_format)
+
+
+# log đang mở trong process: session_id -> SummaryLogWriter
+_live = {}
+_live_lock = threading.Lock()
+
+
+# ==========================
+#   ĐƯỜNG DẪN / MỞ / ĐỌC LOG THEO SESSION
+# ==========================
+def log_path(session_id, fmt=None):
+    return os.path.join(OUTPUT_LOG_DIR, f"{session_id}{LOG_SUFFIXES[fmt or LOG_FORMAT]}")
+
+
+def find_log(session_id):
+    """Log đã có của session (định dạng nào cũng được) -> (path, fmt) hoặc (None, None)."""
+    formats = [LOG_FORMAT] + [f for f in LOG_SUFFIXES if f != LOG_FORMAT]
+    for fmt in formats:
+        path = log_path(session_id, fmt)
+        if os.path.exists(path):
+            return path, fmt
+    return None, None
+
+
+def log_version(session_id):
+    """(mtime_ns, size) của log, đổi mỗi khi log được ghi thêm. None nếu chưa có log."""
+    path, fmt = find_log(session_id)
+    if path is None:
+        return None
+    if fmt == "columnar":
+        # meta.json được ghi lại sau mỗi lần flush
+        path = os.path.join(path, "meta.json")
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def open_log_writer(session_id, fmt=None):
+    fmt = fmt or LOG_FORMAT
+    ensure_dir(OUTPUT_LOG_DIR)
+    path = log_path(session_id, fmt)
+    writer = ColumnLogWriter(path) if fmt == "columnar" else LogWriter(path)
+
+    # session mới: bỏ sidecar cũ (nếu có) của cùng session_id
+    if os.path.exists(summary_path(session_id)):
+        os.remove(summary_path(session_id))
+
+    face_writer = FaceRecordWriter(session_id) if FACE_STORE_ENABLED else None
+    writer = SummaryLogWriter(session_id, writer, face_writer, log_format=fmt)
+    with _live_lock:
+        _live[session_id] = writer
+    return writer
+
+
+def load_log(session_id):
+    """
+    Đọc log của session -> pandas DataFrame (cột LOG_COLUMNS), None nếu không có log.
+    Log dạng cột được dựng thẳng từ mảng numpy, không parse text.
+    """
+    import pandas as pd
+
+    path, fmt = find_log(session_id)
+    if path is None:
+        return None
+
+    if fmt == "csv":
+        return pd.read_csv(path)
+
+    columns, meta = load_columns(path)
+    return _columns_frame(columns, meta)
+
+
+def _columns_frame(columns, meta):
+    import pandas as pd
+
+    emotions = meta.get("emotions", [])
+    names = np.asarray(emotions, dtype=object) if emotions else np.empty(0, dtype=object)
+    columns["emotion"] = names[columns["emotion"]]
+    return pd.DataFrame(columns, columns=LOG_COLUMNS)
+
+
+def load_log_since(session_id, offset=0):
+    """
+    Chỉ đọc phần log ghi thêm sau `offset` -> (DataFrame, offset mới),
+    None nếu không có log. offset: số byte (csv) / số dòng (columnar) đã đọc.
+
+    CSV: bỏ dòng cuối đang ghi dở (lần sau đọc lại từ đầu dòng đó); file
+    rỗng hoặc chỉ có header -> DataFrame rỗng. ValueError nếu log ngắn hơn
+    offset (log đã bị ghi lại từ đầu).
+    """
+    import io
+    import pandas as pd
+
+    path, fmt = find_log(session_id)
+    if path is None:
+        return None
+
+    if fmt == "csv":
+        if os.path.getsize(path) < offset:
+            raise ValueError(f"log {session_id} ngắn hơn offset {offset}")
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        data = data[:data.rfind(b"\n") + 1]
+        new_offset = offset + len(data)
+        if offset == 0:
+            data = data[data.find(b"\n") + 1:] if data else data   # header
+        if not data.strip():
+            return pd.DataFrame(columns=LOG_COLUMNS), new_offset
+        df = pd.read_csv(io.BytesIO(data), header=None, names=LOG_COLUMNS)
+        return df, new_offset
+
+    columns, meta = load_columns(path, mmap=True)
+    rows = meta["rows"]
+    if rows < offset:
+        raise ValueError(f"log {session_id} ngắn hơn offset {offset}")
+    columns = {name: np.asarray(arr[offset:]) for name, arr in columns.items()}
+    return _columns_frame(columns, meta), rows
+
+
+# ==========================
+#   SUMMARY SIDECAR
+# ==========================
+def summary_path(session_id):
+    return os.path.join(OUTPUT_LOG_DIR, f"{session_id}.summary.json")
+
+
+def save_summary(session_id, summary):
+    tmp = summary_path(session_id) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(summary, f)
+    os.replace(tmp, summary_path(session_id))
+
+
+def load_summary(session_id):
+    """
+    Summary của session không cần đọc log:
+    - session đang ghi trong process này -> thống kê đang chạy
+    - session đã đóng -> sidecar, rồi tới catalog
+    -> None nếu không có (log cũ / process bị dừng giữa chừng).
+    """
+    with _live_lock:
+        live = _live.get(session_id)
+    if live is not None:
+        return live.summary()
+
+    try:
+        with open(summary_path(session_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        pass
+
+    if get_catalog() is None:
+        return None
+    return safe_call("summary", session_id)
+
+
+def is_live(session_id):
+    with _live_lock:
+        return session_id in _live
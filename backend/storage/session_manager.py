@@ -1,18 +1,43 @@
+import threading
 import time
+import uuid
+
+from backend.storage.log_writer import find_log
+from backend.storage.catalog import safe_call
 
 class SessionManager:
     def __init__(self):
         self.sessions = {}
+        self._lock = threading.Lock()
+
+    def _new_id(self):
+        """
+        ID dạng "<epoch giây>_<8 hex ngẫu nhiên>": vẫn sắp xếp được theo thời gian,
+        nhưng 2 session tạo trong cùng 1 giây không bao giờ trùng (không ghi đè log).
+        """
+        while True:
+            session_id = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+            if session_id in self.sessions:
+                continue
+            if find_log(session_id)[0] is not None:
+                continue
+            return session_id
 
     def create_session(self, mode, video_path):
-        session_id = str(int(time.time()))
-        self.sessions[session_id] = {
-            "mode": mode,
-            "video_path": video_path,
-            "active": True
-        }
+        with self._lock:
+            session_id = self._new_id()
+            self.sessions[session_id] = {
+                "mode": mode,
+                "video_path": video_path,
+                "active": True
+            }
+        # catalog giữ lại metadata sau khi restart (self.sessions chỉ nằm trong RAM)
+        safe_call("register", session_id, mode, video_path)
         return session_id
 
+    def has_session(self, session_id):
+        return session_id in self.sessions
+
     def stop_session(self, session_id):
         if session_id in self.sessions:
             self.sessions[session_id]["active"] = False
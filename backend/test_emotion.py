@@ -1,9 +1,13 @@
+import os
+
 import cv2
-from models.emotion_model import EmotionModel
+from backend.models.emotion_model import EmotionModel
 
+# chạy từ thư mục gốc repo: python -m backend.test_emotion
+# (benchmark đầy đủ: python -m backend.benchmarks.run_benchmarks)
 model = EmotionModel()
 
-img = cv2.imread("../happy.jpg")  # ảnh test
+img = cv2.imread(os.path.join(os.path.dirname(__file__), "..", "happy.jpg"))  # ảnh test
 probs, dom = model.predict(img)
 
 print("dominant:", dom)
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+import torch
+
+from backend.models.emotion_labels import EMOTION_LABELS
+from backend.models.model_emotion import SimpleCNN
+from backend.storage import catalog
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Chạy trong thư mục tạm: output/ (log, catalog, archive) là đường dẫn
+    tương đối, catalog của process được mở lại trong thư mục này.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(catalog, "_catalog", None)
+    yield tmp_path
+    if catalog._catalog is not None:
+        catalog._catalog.close()
+
+
+@pytest.fixture(scope="session")
+def weight_path(tmp_path_factory):
+    """Checkpoint SimpleCNN khởi tạo ngẫu nhiên (seed cố định), không cần best_cnn.pt."""
+    torch.manual_seed(0)
+    model = SimpleCNN(num_class=len(EMOTION_LABELS))
+    path = tmp_path_factory.mktemp("weights") / "cnn.pt"
+    torch.save({"model_state_dict": model.state_dict()}, path)
+    return str(path)
+
+
+@pytest.fixture
+def faces():
+    """Vài crop mặt BGR uint8 khác kích thước."""
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+            for h, w in ((120, 96), (224, 224), (64, 80), (300, 260))]
+
+
+def simulate_session(session_id, frames=40, max_faces=3, seed=0, close=True):
+    """
+    Ghi log + face store của 1 session giống pipeline (process_frame): mỗi
+    frame vài mặt với xác suất ngẫu nhiên, engagement frame = trung bình
+    các mặt, làm mượt bằng EngagementSmoother.
+    -> (writer, list frame: (ts, faces)).
+    """
+    from backend.analysis.smoothing import EngagementSmoother
+    from backend.pipeline.frame_processor import compute_engagement, summarize_faces
+    from backend.storage.log_writer import open_log_writer
+
+    rng = np.random.default_rng(seed)
+    writer = open_log_writer(session_id)
+    smoother = EngagementSmoother()
+    recorded = []
+    for i in range(frames):
+        ts = 1000.0 + 0.2 * i
+        faces = []
+        for track_id in range(1, int(rng.integers(1, max_faces + 1)) + 1):
+            p = rng.dirichlet(np.ones(len(EMOTION_LABELS)))
+            probs = dict(zip(EMOTION_LABELS, p.tolist()))
+            faces.append({
+                "id": track_id, "x": 10 * track_id, "y": 20, "w": 50, "h": 60,
+                "emotion": EMOTION_LABELS[int(p.argmax())],
+                "engagement": compute_engagement(probs),
+                "probs": probs,
+            })
+        dominant, eng_raw = summarize_faces(faces)
+        writer.write(ts, dominant, eng_raw, smoother.update(eng_raw))
+        writer.write_faces(ts, faces)
+        recorded.append((ts, faces))
+    if close:
+        writer.close()
+    return writer, recorded
+
+
+@pytest.fixture
+def session(workdir):
+    """Session 's1' đã đóng, ghi bởi simulate_session."""
+    return simulate_session("s1")[1]
@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+import pytest
+
+from backend.storage import catalog
+from backend.storage.log_writer import load_log, load_summary
+from conftest import simulate_session
+
+LOG_DIR = "output/logs/"
+ARCHIVE_DIR = "output/archive/"
+
+
+def log_files(session_id):
+    return sorted(n for n in os.listdir(LOG_DIR)
+                  if n.startswith(f"{session_id}.") and not n.endswith(".summary.json"))
+
+
+@pytest.fixture
+def cat(workdir):
+    """Catalog của process (SummaryLogWriter.close ghi vào đây)."""
+    return catalog.get_catalog()
+
+
+@pytest.mark.parametrize("fmt", ["csv", "columnar"])
+def test_compact_restore_round_trip(cat, monkeypatch, fmt):
+    monkeypatch.setattr("backend.storage.log_writer.LOG_FORMAT", fmt)
+    cat.register("s1", "video", "v.avi", started_at=1.7e9)
+    simulate_session("s1", frames=20)
+    cat.register("s2", "webcam")
+    live, _ = simulate_session("s2", frames=10, seed=1, close=False)   # đang ghi: không được nén
+    try:
+        check_round_trip(cat)
+    finally:
+        live.close()
+
+
+def check_round_trip(cat):
+    before = load_log("s1")
+    files = log_files("s1")
+    summary = load_summary("s1")
+    assert cat.get("s1")["status"] == "closed"
+
+    assert catalog.compact(older_than_days=-1, catalog=cat, log_dir=LOG_DIR,
+                           archive_dir=ARCHIVE_DIR, dry_run=True) == ["s1"]
+    assert log_files("s1") == files
+
+    assert catalog.compact(older_than_days=-1, catalog=cat, log_dir=LOG_DIR,
+                           archive_dir=ARCHIVE_DIR) == ["s1"]
+    item = cat.get("s1")
+    assert item["status"] == "archived"
+    assert os.path.exists(item["archive_path"])
+    assert log_files("s1") == []
+    assert load_log("s1") is None
+    assert load_summary("s1") == summary       # sidecar giữ nguyên
+    assert log_files("s2")
+
+    assert catalog.restore("s1", catalog=cat, log_dir=LOG_DIR)
+    assert cat.get("s1")["status"] == "closed"
+    assert log_files("s1") == files
+    pd.testing.assert_frame_equal(load_log("s1"), before)
+    assert catalog.restore("s1", catalog=cat, log_dir=LOG_DIR) is False
+
+
+def test_recent_sessions_kept(cat):
+    cat.register("s1", "video")
+    simulate_session("s1", frames=5)
+
+    assert catalog.compact(older_than_days=30, catalog=cat, log_dir=LOG_DIR,
+                           archive_dir=ARCHIVE_DIR) == []
+    assert cat.get("s1")["status"] == "closed"
+    assert catalog.restore("nope", catalog=cat, log_dir=LOG_DIR) is False
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.storage.column_log import ColumnLogWriter, load_columns
+from backend.storage.log_writer import (
+    LOG_COLUMNS, load_log, load_log_since, load_summary, open_log_writer,
+)
+
+ROWS = [
+    (1000.0, "happy", 0.8, 0.4),
+    (1000.1, "neutral", 0.5, 0.45),
+    (1000.2, "happy", 0.9, 0.55),
+    (1000.3, "sad", 0.1, 0.4),
+]
+
+
+def test_column_writer_round_trip(tmp_path):
+    path = str(tmp_path / "s.cols")
+    writer = ColumnLogWriter(path, flush_rows=2)
+    for row in ROWS:
+        writer.write(*row)
+    writer.close()
+
+    for mmap in (False, True):
+        columns, meta = load_columns(path, mmap=mmap)
+        assert meta["rows"] == len(ROWS)
+        emotions = meta["emotions"]
+        assert [emotions[c] for c in columns["emotion"]] == [r[1] for r in ROWS]
+        np.testing.assert_allclose(columns["timestamp"], [r[0] for r in ROWS])
+        np.testing.assert_allclose(columns["eng_raw"], [r[2] for r in ROWS], rtol=1e-6)
+        np.testing.assert_allclose(columns["eng_smooth"], [r[3] for r in ROWS], rtol=1e-6)
+
+    with pytest.raises(ValueError):
+        writer.write(1001.0, "happy", 0.5, 0.5)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "columnar"])
+def test_log_round_trip_by_session(workdir, fmt):
+    writer = open_log_writer("s1", fmt=fmt)
+    for row in ROWS[:2]:
+        writer.write(*row)
+    # đẩy phần đã ghi xuống đĩa như lúc session đang chạy
+    if fmt == "columnar":
+        writer.writer.flush()
+    else:
+        writer.writer.f.flush()
+    head, offset = load_log_since("s1", 0)
+    for row in ROWS[2:]:
+        writer.write(*row)
+    writer.close()
+
+    expected = pd.DataFrame(ROWS, columns=LOG_COLUMNS)
+    df = load_log("s1")
+    assert list(df.columns) == LOG_COLUMNS
+    assert df["emotion"].tolist() == expected["emotion"].tolist()
+    np.testing.assert_allclose(df[["timestamp", "eng_raw", "eng_smooth"]].to_numpy(dtype=float),
+                               expected[["timestamp", "eng_raw", "eng_smooth"]].to_numpy(), rtol=1e-6)
+
+    # đọc tăng dần: phần đầu + phần ghi thêm = cả log
+    tail, _ = load_log_since("s1", offset)
+    assert head["emotion"].tolist() + tail["emotion"].tolist() == expected["emotion"].tolist()
+
+    summary = load_summary("s1")
+    assert summary["emotion_distribution"] == {"happy": 2, "neutral": 1, "sad": 1}
+    assert summary["avg"] == pytest.approx(expected["eng_smooth"].mean())
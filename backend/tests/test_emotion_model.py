@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from backend.models.emotion_model import EmotionModel
+
+
+@pytest.fixture(scope="module")
+def model(weight_path):
+    # weight_name tuyệt đối: os.path.join bỏ qua thư mục models/
+    return EmotionModel(weight_name=weight_path, device="cpu", backend="eager")
+
+
+def test_predict_batch_matches_predict(model, faces):
+    batch = model.predict_batch(faces)
+    assert len(batch) == len(faces)
+
+    for img, (probs, dominant) in zip(faces, batch):
+        single_probs, single_dominant = model.predict(img)
+        assert dominant == single_dominant
+        assert list(probs) == list(model.labels)
+        np.testing.assert_allclose(
+            [probs[k] for k in model.labels],
+            [single_probs[k] for k in model.labels],
+            rtol=1e-4, atol=1e-6,
+        )
+        assert sum(probs.values()) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_predict_batch_keeps_positions_of_bad_crops(model, faces):
+    empty = np.zeros((0, 0, 3), dtype=np.uint8)
+    results = model.predict_batch([faces[0], None, empty, faces[1]])
+
+    assert results[1] == (None, None)
+    assert results[2] == (None, None)
+    assert results[0][1] == model.predict(faces[0])[1]
+    assert results[3][1] == model.predict(faces[1])[1]
+    assert model.predict_batch([]) == []
@@ -0,0 +1,71 @@
+from collections import Counter, defaultdict
+
+import numpy as np
+import pytest
+
+from backend.storage.face_store import FaceStore
+from conftest import simulate_session
+
+
+def by_student(recorded):
+    """track_id -> list (ts, face) theo thứ tự thời gian."""
+    out = defaultdict(list)
+    for ts, faces in recorded:
+        for f in faces:
+            out[f["id"]].append((ts, f))
+    return out
+
+
+def check_summary(summary, rows):
+    eng = [f["engagement"] for _, f in rows]
+    emotions = Counter(f["emotion"] for _, f in rows)
+    assert summary["frames"] == len(rows)
+    assert summary["avg"] == pytest.approx(np.mean(eng), abs=1e-5)
+    assert summary["min"] == pytest.approx(min(eng), abs=1e-5)
+    assert summary["max"] == pytest.approx(max(eng), abs=1e-5)
+    assert summary["first_ts"] == pytest.approx(rows[0][0])
+    assert summary["last_ts"] == pytest.approx(rows[-1][0])
+    assert summary["emotion_distribution"] == dict(emotions)
+    assert summary["dominant"] in [e for e, n in emotions.items() if n == max(emotions.values())]
+
+
+def test_students_summary(session):
+    expected = by_student(session)
+    students = FaceStore("s1").students()
+
+    assert sorted(students, key=int) == [str(tid) for tid in sorted(expected)]
+    for tid, rows in expected.items():
+        check_summary(students[str(tid)], rows)
+
+
+def test_student_timeline(session):
+    store = FaceStore("s1")
+    for tid, rows in by_student(session).items():
+        result = store.student(tid, points=1000)
+        assert result["track_id"] == tid
+        check_summary(result["summary"], rows)
+        assert result["timeline"]["t"] == pytest.approx([ts for ts, _ in rows])
+        assert result["timeline"]["engagement"] == pytest.approx(
+            [f["engagement"] for _, f in rows], abs=1e-5)
+        assert result["timeline"]["emotion"] == [f["emotion"] for _, f in rows]
+        assert sum(result["mean_probs"].values()) == pytest.approx(1.0, abs=1e-5)
+
+    assert len(store.student(1, points=5)["timeline"]["t"]) == 5
+    assert store.student(99) is None
+
+
+def test_live_session_without_index(workdir):
+    # session chưa đóng: chưa có index / summary, dựng từ cột track
+    writer, recorded = simulate_session("live", close=False)
+    writer.face_writer.table.flush()
+    try:
+        students = FaceStore("live").students()
+        for tid, rows in by_student(recorded).items():
+            check_summary(students[str(tid)], rows)
+    finally:
+        writer.close()
+
+
+def test_missing_session(workdir):
+    with pytest.raises(FileNotFoundError):
+        FaceStore("nope")
@@ -0,0 +1,65 @@
+import numpy as np
+
+from backend.models.face_tracker import FaceTracker
+
+
+class FakeDetector:
+    """Trả box theo kịch bản: boxes_at(frame_no) -> list (x, y, w, h)."""
+
+    def __init__(self, boxes_at):
+        self.boxes_at = boxes_at
+        self.calls = 0
+
+    def detect(self, frame):
+        self.calls += 1
+        return self.boxes_at(self.calls)
+
+
+FRAME = np.zeros((480, 640, 3), dtype=np.uint8)
+
+
+def two_moving_faces(n):
+    # mặt trái đi sang phải, mặt phải đi xuống; thứ tự detection đảo mỗi frame
+    boxes = [(50 + 4 * n, 100, 80, 80), (400, 60 + 3 * n, 90, 90)]
+    return boxes if n % 2 else boxes[::-1]
+
+
+def ids_by_side(tracks):
+    return {("left" if box[0] < 320 else "right"): tid for tid, box in tracks}
+
+
+def test_ids_stable_across_frames():
+    tracker = FaceTracker(FakeDetector(two_moving_faces), detect_every=1)
+
+    first = ids_by_side(tracker.track(FRAME))
+    assert len(set(first.values())) == 2
+
+    for _ in range(30):
+        assert ids_by_side(tracker.track(FRAME)) == first
+    assert tracker.stats()["active_tracks"] == 2
+
+
+def test_ids_stable_between_detections():
+    detector = FakeDetector(lambda n: [(100 + 2 * n, 100, 80, 80)])
+    tracker = FaceTracker(detector, detect_every=5)
+
+    ids = {tid for _ in range(20) for tid, _ in tracker.track(FRAME)}
+    assert ids == {1}
+    # chỉ detect mỗi 5 frame, các frame giữa dùng box dự đoán
+    assert detector.calls == 4
+
+
+def test_lost_face_gets_new_id():
+    def scene(n):
+        if n <= 3:
+            return [(100, 100, 80, 80)]
+        if n <= 6:
+            return []
+        return [(100, 100, 80, 80)]
+
+    tracker = FaceTracker(FakeDetector(scene), detect_every=1, max_misses=2)
+    seen = [[tid for tid, _ in tracker.track(FRAME)] for _ in range(8)]
+
+    assert seen[:3] == [[1], [1], [1]]
+    assert seen[3:6] == [[], [], []]
+    assert seen[6:] == [[2], [2]]
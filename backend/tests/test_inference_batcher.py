@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from backend.models.inference_batcher import InferenceBatcher
+
+
+class TaggingModel:
+    """Kết quả mỗi crop = (crop, nhãn) để kiểm tra trả đúng caller; ghi lại cỡ từng batch."""
+
+    labels = ["a", "b"]
+
+    def __init__(self, fail_on=None):
+        self.batch_sizes = []
+        self.fail_on = fail_on
+        self._lock = threading.Lock()
+
+    def predict_batch(self, crops):
+        with self._lock:
+            self.batch_sizes.append(len(crops))
+        if self.fail_on is not None and self.fail_on in crops:
+            raise RuntimeError("bad crop")
+        return [({"crop": c}, "a") for c in crops]
+
+
+def test_results_routed_to_their_caller():
+    model = TaggingModel()
+    batcher = InferenceBatcher(model, window_ms=50, max_batch=64)
+    start = threading.Barrier(8)
+    results, errors = {}, []
+
+    def worker(caller):
+        crops = [f"{caller}-{i}" for i in range(caller % 3 + 1)]
+        start.wait()
+        try:
+            results[caller] = (crops, batcher.predict_batch(crops))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.shutdown()
+
+    assert not errors
+    for crops, out in results.values():
+        assert [probs["crop"] for probs, _ in out] == crops
+
+    # các caller đồng thời được gom chung (ít lần forward hơn số request)
+    stats = batcher.stats()
+    assert stats["requests"] == 8
+    assert stats["crops"] == sum(len(c) for c, _ in results.values())
+    assert len(model.batch_sizes) < 8
+
+
+def test_max_batch_splits_requests():
+    model = TaggingModel()
+    batcher = InferenceBatcher(model, window_ms=50, max_batch=4)
+    out = []
+    threads = [threading.Thread(target=lambda i=i: out.append(batcher.predict_batch([i, i + 100, i + 200])))
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.shutdown()
+
+    assert max(model.batch_sizes) <= 4
+    assert sorted(r[0][0]["crop"] for r in out) == [0, 1, 2, 3]
+
+
+def test_error_raised_in_caller_and_predict_single():
+    batcher = InferenceBatcher(TaggingModel(fail_on="bad"), window_ms=1, max_batch=8)
+    try:
+        with pytest.raises(RuntimeError):
+            batcher.predict_batch(["bad"])
+        assert batcher.predict("ok") == ({"crop": "ok"}, "a")
+        assert batcher.predict_batch([]) == []
+    finally:
+        batcher.shutdown()
+
+    # sau shutdown: gọi thẳng model
+    assert batcher.predict("late") == ({"crop": "late"}, "a")
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from backend.analysis import rescoring
+from backend.analysis.smoothing import EngagementSmoother
+from backend.core.config import SMOOTHING_ALPHA
+from backend.storage.log_writer import load_log
+
+
+def test_ema_matches_engagement_smoother():
+    values = np.random.default_rng(1).random(200)
+    smoother = EngagementSmoother()
+    expected = [smoother.update(v) for v in values]
+
+    np.testing.assert_allclose(rescoring.smooth(values, "ema", SMOOTHING_ALPHA), expected, atol=1e-12)
+    assert len(rescoring.smooth([], "ema")) == 0
+
+
+def test_segments_smoothed_independently():
+    probs = np.random.default_rng(3).dirichlet(np.ones(len(rescoring.EMOTION_LABELS)), size=60)
+    raw, smoothed = rescoring.rescore_arrays(probs, segments=[30, 30])
+
+    np.testing.assert_allclose(smoothed[:30], rescoring.smooth(raw[:30]))
+    np.testing.assert_allclose(smoothed[30:], rescoring.smooth(raw[30:]))
+    with pytest.raises(ValueError):
+        rescoring.smooth(probs[:, 0], "kalman")
+
+
+def test_default_weights_reproduce_log(session):
+    """Face store + trọng số mặc định -> đúng log pipeline đã ghi."""
+    log = load_log("s1")
+    frame = rescoring.rescore_frame("s1")
+
+    assert len(frame) == len(log)
+    assert frame["faces"].tolist() == [len(faces) for _, faces in session]
+    assert frame["emotion"].tolist() == log["emotion"].tolist()
+    np.testing.assert_allclose(frame["timestamp"], log["timestamp"])
+    np.testing.assert_allclose(frame["eng_raw"], log["eng_raw"], atol=1e-5)
+    np.testing.assert_allclose(frame["eng_smooth"], log["eng_smooth"], atol=1e-5)
+
+
+def test_rescore_sessions_missing_face_store(session):
+    result = rescoring.rescore_sessions(["s1", "nope"], weights={"happy": 1.0}, points=10)
+    first, missing = result["sessions"]
+
+    assert first["frames"] == len(session)
+    assert len(first["timeline"]["t"]) <= 10
+    assert missing == {"session_id": "nope", "error": "face_store_not_found"}
@@ -0,0 +1,97 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.analysis import timeline
+from backend.analysis.timeline import TimelineIndex
+from backend.storage.log_writer import LOG_COLUMNS, load_log, open_log_writer
+
+QUERIES = [
+    dict(points=5),
+    dict(points=500),
+    dict(start=0.5, end=3.0, points=7, agg="max"),
+    dict(start=1.0, end=2.0, points=3, agg="min"),
+]
+
+
+def random_log(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    emotions = np.array(["happy", "sad", "neutral", "fear"])
+    # emotion mới xuất hiện giữa chừng -> cột emotion phải được chèn vào mọi tầng
+    pool = np.where(np.arange(rows) < rows // 3, rng.integers(0, 2, rows), rng.integers(0, 4, rows))
+    return pd.DataFrame({
+        "timestamp": 1000.0 + 0.1 * np.arange(rows),
+        "emotion": emotions[pool],
+        "eng_raw": rng.random(rows),
+        "eng_smooth": rng.random(rows),
+    }, columns=LOG_COLUMNS)
+
+
+def assert_same_index(a, b):
+    assert a.emotions == b.emotions
+    assert a.t0 == b.t0
+    assert len(a.levels) == len(b.levels)
+    for la, lb in zip(a.levels, b.levels):
+        for key in la:
+            np.testing.assert_allclose(la[key], lb[key], err_msg=key)
+    for q in QUERIES:
+        assert a.query(**q) == b.query(**q)
+
+
+def test_incremental_matches_full_build():
+    df = random_log(500)
+    full = TimelineIndex.build(df, None, factor=4)
+
+    index = TimelineIndex.build(df.iloc[:0], None, factor=4)
+    cuts = [0, 1, 2, 9, 9, 40, 41, 130, 300, 499, 500]
+    for a, b in zip(cuts, cuts[1:]):
+        index.extend(df.iloc[a:b], None, b, factor=4)
+        assert_same_index(index, TimelineIndex.build(df.iloc[:b], None, factor=4))
+
+    assert_same_index(index, full)
+    assert index.offset == 500
+
+
+def test_query_validation():
+    index = TimelineIndex.build(random_log(50), None)
+    with pytest.raises(ValueError):
+        index.query(agg="median")
+    result = index.query(points=10)
+    assert sum(result["count"]) == 50
+    assert 0 < len(result["t"]) <= 10
+
+
+def test_live_session_then_sidecar(workdir, monkeypatch):
+    monkeypatch.setattr(timeline, "_cache", OrderedDict())
+    df = random_log(300, seed=1)
+    writer = open_log_writer("s1", fmt="csv")
+
+    for start in range(0, 300, 70):
+        for row in df.iloc[start:start + 70].itertuples(index=False):
+            writer.write(*row)
+        writer.writer.f.flush()
+        index = timeline.get_index("s1")
+        assert_same_index(index, TimelineIndex.build(load_log("s1"), None))
+        # đang ghi: không ghi sidecar
+        assert not os.path.exists(timeline.index_path("s1"))
+    writer.close()
+
+    timeline.get_index("s1")
+    assert not os.path.exists(timeline.index_path("s1"))   # log không đổi từ lần trước
+
+    # log đổi sau khi đóng -> extend từ cache rồi ghi sidecar
+    with open("output/logs/s1.csv", "a") as f:
+        f.write("1100.0,angry,0.5,0.2\n")
+    index = timeline.get_index("s1")
+    full = TimelineIndex.build(load_log("s1"), None)
+    assert_same_index(index, full)
+    assert_same_index(TimelineIndex.load(timeline.index_path("s1")), full)
+
+    # process mới: đọc sidecar, không dựng lại
+    timeline._cache.clear()
+    assert timeline.get_index("s1").offset == index.offset
+    assert timeline.query_timeline("s1", points=20)["count"] == full.query(points=20)["count"]
+    assert timeline.query_timeline("nope") == {"session_id": "nope", "error": "log_not_found"}
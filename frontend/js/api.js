@@ -29,11 +29,16 @@ async function callAPI(endpoint, options = {}) {
 // ============================
 // REALTIME FRAME ANALYSIS
 // ============================
-async function analyzeFrame(blob) {
+async function analyzeFrame(blob, sessionId = null) {
     const formData = new FormData();
     formData.append("frame", blob, "frame.jpg");
 
-    return await callAPI("/analyze_frame", {
+    let url = "/analyze_frame";
+    if (sessionId) {
+        url += `?session_id=${encodeURIComponent(sessionId)}`;
+    }
+
+    return await callAPI(url, {
         method: "POST",
         body: formData
     });
@@ -41,6 +46,49 @@ async function analyzeFrame(blob) {
 
 
 
+// ============================
+// REALTIME UPLOAD CONFIG
+// ============================
+// độ phân giải / chất lượng JPEG server muốn nhận ({upload_max_width, jpeg_quality, ...})
+async function getRtConfig() {
+    return await callAPI("/rt_config");
+}
+
+
+
+// ============================
+// REALTIME STREAMING (WebSocket /ws/analyze)
+// ============================
+// handlers: { onOpen, onResult(data), onClose }
+function openAnalyzeSocket(sessionId = null, handlers = {}) {
+    let url = API_BASE.replace(/^http/, "ws") + "/ws/analyze";
+    if (sessionId) {
+        url += `?session_id=${encodeURIComponent(sessionId)}`;
+    }
+
+    let socket;
+    try {
+        socket = new WebSocket(url);
+    } catch (err) {
+        console.error("❌ WebSocket failed:", err);
+        if (handlers.onClose) setTimeout(handlers.onClose, 0);
+        return null;
+    }
+
+    socket.onopen = () => handlers.onOpen && handlers.onOpen();
+    socket.onmessage = (event) => {
+        try {
+            handlers.onResult && handlers.onResult(JSON.parse(event.data));
+        } catch (err) {
+            console.error("❌ WebSocket message error:", err);
+        }
+    };
+    socket.onclose = () => handlers.onClose && handlers.onClose();
+    return socket;
+}
+
+
+
 // ============================
 // SESSION CONTROL (Video/Webcam pipeline cũ)
 // ============================
@@ -55,8 +103,12 @@ async function startSession(mode = "webcam", videoPath = "") {
 }
 
 
-async function stopSession() {
-    return await callAPI("/stop", { method: "GET" });
+async function stopSession(sessionId = null) {
+    let url = "/stop";
+    if (sessionId) {
+        url += `?session_id=${encodeURIComponent(sessionId)}`;
+    }
+    return await callAPI(url, { method: "GET" });
 }
 
 
@@ -68,8 +120,12 @@ async function rtStartSession() {
     return await callAPI("/rt_start", { method: "GET" });
 }
 
-async function rtStopSession() {
-    return await callAPI("/rt_stop", { method: "GET" });
+async function rtStopSession(sessionId = null) {
+    let url = "/rt_stop";
+    if (sessionId) {
+        url += `?session_id=${encodeURIComponent(sessionId)}`;
+    }
+    return await callAPI(url, { method: "GET" });
 }
 
 
@@ -83,11 +139,33 @@ async function getAnalytics(sessionId) {
 
 
 
+// ============================
+// TIMELINE QUERY (zoom theo khoảng thời gian, đã gộp sẵn ở backend)
+// ============================
+// opts: { start, end (giây từ đầu session), points, agg: "mean" | "min" | "max" }
+async function getTimeline(sessionId, opts = {}) {
+    const params = new URLSearchParams();
+    for (const key of ["start", "end", "points", "agg"]) {
+        if (opts[key] !== undefined && opts[key] !== null) {
+            params.append(key, opts[key]);
+        }
+    }
+    const query = params.toString();
+    return await callAPI(`/sessions/${sessionId}/timeline${query ? "?" + query : ""}`);
+}
+
+
+
 // ============================
 // GET SESSION CHARTS
 // ============================
-async function getCharts(sessionId) {
-    return await callAPI(`/sessions/${sessionId}/charts`);
+// biểu đồ được vẽ nền: status "pending" -> gọi lại sau, "ready" -> có ảnh
+async function getCharts(sessionId, wait = 0) {
+    let url = `/sessions/${sessionId}/charts`;
+    if (wait) {
+        url += `?wait=${wait}`;
+    }
+    return await callAPI(url);
 }
 
 
@@ -97,9 +175,12 @@ async function getCharts(sessionId) {
 // ============================
 // export {
 //     analyzeFrame,
+//     getRtConfig,
+//     openAnalyzeSocket,
 //     startSession,
 //     stopSession,
 //     getAnalytics,
+//     getTimeline,
 //     getCharts,
 //     rtStartSession,
 //     rtStopSession
@@ -10,6 +10,19 @@ let stream = null;
 let running = false;
 let intervalId = null;
 let isProcessing = false; // tránh call /analyze_frame chồng nhau
+let rtSessionId = null;   // mỗi dashboard 1 session realtime riêng
+
+// WebSocket: gửi frame liên tục, server chỉ xử lý frame mới nhất.
+// Nếu không kết nối được thì quay về POST /analyze_frame mỗi 600ms.
+let ws = null;
+const WS_FRAME_INTERVAL = 100;   // ms giữa 2 frame gửi qua websocket
+const HTTP_FRAME_INTERVAL = 600; // ms, chế độ HTTP (quá nhanh sẽ lag)
+
+// kích thước / chất lượng frame gửi lên: chỉ lấy từ GET /rt_config (RT_UPLOAD_* ở
+// backend config); chưa lấy được thì gửi nguyên khung, chất lượng JPEG mặc định của browser
+let uploadMaxWidth = null;
+let uploadQuality = undefined;
+let uploadScale = 1;      // kích thước video / kích thước frame đã gửi (để vẽ box)
 
 
 // Đồng bộ kích thước canvas với video (để vẽ box không lệch)
@@ -29,7 +42,14 @@ function resizeOverlayToVideo() {
 async function startCamera() {
     try {
         // báo backend bắt đầu 1 session realtime (mở file CSV)
-        await rtStartSession();
+        const rt = await rtStartSession();
+        rtSessionId = rt ? rt.session_id : null;
+
+        const cfg = await getRtConfig();
+        if (cfg) {
+            uploadMaxWidth = cfg.upload_max_width || null;
+            uploadQuality = cfg.jpeg_quality || undefined;
+        }
 
         stream = await navigator.mediaDevices.getUserMedia({ video: true });
         video.srcObject = stream;
@@ -41,8 +61,7 @@ async function startCamera() {
             resizeOverlayToVideo();
         };
 
-        // chạy mỗi 600ms (quá nhanh sẽ lag)
-        intervalId = setInterval(captureFrame, 600);
+        startStreaming();
     } catch (err) {
         console.error("Cannot start camera:", err);
     }
@@ -56,6 +75,13 @@ async function stopCamera() {
     running = false;
 
     if (intervalId) clearInterval(intervalId);
+    intervalId = null;
+
+    if (ws) {
+        ws.onclose = null;
+        ws.close();
+        ws = null;
+    }
 
     if (stream) {
         stream.getTracks().forEach((t) => t.stop());
@@ -70,13 +96,69 @@ async function stopCamera() {
     document.getElementById("currentFaces").textContent = "0";
 
     // báo backend đóng session realtime + sinh report từ CSV
-    const summary = await rtStopSession();
+    const summary = await rtStopSession(rtSessionId);
+    rtSessionId = null;
     console.log("Realtime session summary:", summary);
 }
 
 
 // =========================
-// CAPTURE FRAME + SEND TO BACKEND
+// STREAMING: WEBSOCKET (ưu tiên) / HTTP (dự phòng)
+// =========================
+function startStreaming() {
+    if (intervalId) clearInterval(intervalId);
+
+    ws = openAnalyzeSocket(rtSessionId, {
+        onOpen: () => {
+            intervalId = setInterval(sendFrameWs, WS_FRAME_INTERVAL);
+        },
+        onResult: (data) => renderResult(data),
+        onClose: () => {
+            // mất websocket -> quay về HTTP
+            ws = null;
+            if (!running) return;
+            if (intervalId) clearInterval(intervalId);
+            intervalId = setInterval(captureFrame, HTTP_FRAME_INTERVAL);
+        },
+    });
+}
+
+
+// Chụp frame hiện tại của video -> blob jpeg, thu nhỏ về uploadMaxWidth
+function grabFrame(callback) {
+    const vw = video.videoWidth;
+    const vh = video.videoHeight;
+    const scale = uploadMaxWidth ? Math.min(1, uploadMaxWidth / vw) : 1;
+
+    const temp = document.createElement("canvas");
+    temp.width = Math.round(vw * scale);
+    temp.height = Math.round(vh * scale);
+
+    const tctx = temp.getContext("2d");
+    tctx.drawImage(video, 0, 0, temp.width, temp.height);
+    uploadScale = vw / temp.width;
+
+    temp.toBlob(callback, "image/jpeg", uploadQuality);
+}
+
+
+function sendFrameWs() {
+    if (!running || !ws || ws.readyState !== WebSocket.OPEN) return;
+    if (video.videoWidth === 0 || video.videoHeight === 0) return;
+
+    // frame trước còn chưa gửi hết -> bỏ frame này
+    if (ws.bufferedAmount > 0) return;
+
+    grabFrame((blob) => {
+        if (blob && ws && ws.readyState === WebSocket.OPEN) {
+            ws.send(blob);
+        }
+    });
+}
+
+
+// =========================
+// CAPTURE FRAME + SEND TO BACKEND (HTTP)
 // =========================
 async function captureFrame() {
     if (!running) return;
@@ -85,72 +167,73 @@ async function captureFrame() {
 
     isProcessing = true;
 
-    const temp = document.createElement("canvas");
-    temp.width = video.videoWidth;
-    temp.height = video.videoHeight;
+    grabFrame(async (blob) => {
+        try {
+            const data = await analyzeFrame(blob, rtSessionId);
+            renderResult(data);
+        } finally {
+            isProcessing = false;
+        }
+    });
+}
 
-    const tctx = temp.getContext("2d");
-    tctx.drawImage(video, 0, 0);
-
-    temp.toBlob(
-        async (blob) => {
-            try {
-                const data = await analyzeFrame(blob);
-
-                // vẽ khung
-                drawOverlay(data);
-
-                const engSpan = document.getElementById("currentEngagement");
-                const facesSpan = document.getElementById("currentFaces");
-
-                // KHÔNG có mặt nào
-                if (!data || !data.faces || data.faces.length === 0) {
-                    engSpan.textContent = "0.00";
-                    facesSpan.textContent = "0";
-                    updateGauge(0);
-                    return;
-                }
-
-                const faces = data.faces;
-                const n = faces.length;
-
-                // ===== 1. Tính engagement trung bình =====
-                let sumEng = 0;
-                faces.forEach((f) => {
-                    sumEng += f.engagement || 0;
-                });
-                const avgEng = sumEng / n;
-
-                // ===== 2. Tính probs (emotion) trung bình =====
-                const aggProbs = {};
-                faces.forEach((f) => {
-                    const probs = f.probs || {};
-                    for (const emo in probs) {
-                        if (!aggProbs[emo]) aggProbs[emo] = 0;
-                        aggProbs[emo] += probs[emo] / n;
-                    }
-                });
-
-                // ===== 3. Cập nhật số lên dashboard trước =====
-                engSpan.textContent = avgEng.toFixed(2);
-                facesSpan.textContent = String(n);
-
-                // ===== 4. Rồi mới cập nhật chart (nếu chart có lỗi thì số vẫn đúng) =====
-                try {
-                    updateGauge(avgEng);
-                    updateLineChart(avgEng);
-                    updateRadar(aggProbs);
-                    updateHeatmap({ probs: aggProbs });
-                } catch (e) {
-                    console.error("Chart update error:", e);
-                }
-            } finally {
-                isProcessing = false;
-            }
-        },
-        "image/jpeg",
-        0.6 // nén mạnh hơn chút để gửi nhanh hơn
-    );
+
+// =========================
+// HIỂN THỊ KẾT QUẢ 1 FRAME (dùng chung cho HTTP / WebSocket)
+// =========================
+function renderResult(data) {
+    // server đang bận / frame bị bỏ -> giữ nguyên khung cũ
+    if (data && (data.status === "busy" || data.status === "dropped")) {
+        return;
+    }
+
+    // vẽ khung
+    drawOverlay(data);
+
+    const engSpan = document.getElementById("currentEngagement");
+    const facesSpan = document.getElementById("currentFaces");
+
+    // KHÔNG có mặt nào
+    if (!data || !data.faces || data.faces.length === 0) {
+        engSpan.textContent = "0.00";
+        facesSpan.textContent = "0";
+        updateGauge(0);
+        return;
+    }
+
+    const faces = data.faces;
+    const n = faces.length;
+
+    // ===== 1. Tính engagement trung bình =====
+    let sumEng = 0;
+    faces.forEach((f) => {
+        sumEng += f.engagement || 0;
+    });
+    const avgEng = sumEng / n;
+
+    // ===== 2. Tính probs (emotion) trung bình =====
+    const aggProbs = {};
+    faces.forEach((f) => {
+        const probs = f.probs || {};
+        for (const emo in probs) {
+            if (!aggProbs[emo]) aggProbs[emo] = 0;
+            aggProbs[emo] += probs[emo] / n;
+        }
+    });
+
+    // ===== 3. Cập nhật số lên dashboard trước =====
+    engSpan.textContent = avgEng.toFixed(2);
+    facesSpan.textContent = String(n);
+
+    // ===== 4. Rồi mới cập nhật chart (nếu chart có lỗi thì số vẫn đúng) =====
+    try {
+        updateGauge(avgEng);
+        updateLineChart(avgEng);
+        updateRadar(aggProbs);
+        updateHeatmap({ probs: aggProbs });
+    } catch (e) {
+        console.error("Chart update error:", e);
+    }
 }
 
 
@@ -166,7 +249,12 @@ function drawOverlay(data) {
     ctx.font = "16px Arial";
 
     data.faces.forEach((face) => {
-        const { id, x, y, w, h, emotion, engagement } = face;
+        const { id, emotion, engagement } = face;
+        // box theo toạ độ frame đã gửi -> đổi về kích thước video
+        const x = face.x * uploadScale;
+        const y = face.y * uploadScale;
+        const w = face.w * uploadScale;
+        const h = face.h * uploadScale;
 
         // Bounding box
         ctx.strokeStyle = "lime";
@@ -106,6 +106,25 @@ function updateLineChart(value) {
     lineChart.update();
 }
 
+// Vẽ lại line chart từ timeline của 1 session đã lưu.
+// Backend chỉ trả tối đa `points` điểm cho khoảng [start, end] nên
+// session dài vài giờ vẫn không làm treo dashboard.
+async function loadTimeline(sessionId, start = null, end = null, points = 500) {
+    const data = await getTimeline(sessionId, { start, end, points, agg: "mean" });
+    if (!data || data.error) return null;
+
+    const labels = data.t.map((sec) => new Date((data.t0 + sec) * 1000).toLocaleTimeString());
+
+    // giữ nguyên mảng để lineChart vẫn trỏ tới engagementData / timeLabels
+    timeLabels.length = 0;
+    engagementData.length = 0;
+    timeLabels.push(...labels);
+    engagementData.push(...data.value);
+
+    lineChart.update();
+    return data;
+}
+
 
 // =====================
 //  RADAR CHART (Emotion Overview)